@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The node's modules import each other from src, as in the tests
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,146 @@
+import json
+import sys
+from argparse import ArgumentParser
+
+from bench.cluster import TOPOLOGIES, Cluster
+from bench.runner import (BENCHMARKS, Settings, compare, machine,
+    run_benchmarks)
+
+def run(args):
+    names = args.only.split(',') if args.only else None
+    unknown = [name for name in names or [] if name not in BENCHMARKS]
+    if unknown:
+        print(f'Unknown benchmarks: {", ".join(unknown)}', file=sys.stderr)
+        return 2
+
+    settings = Settings(
+        blocks=args.blocks,
+        transactions=args.transactions,
+        signatures=args.signatures,
+        searches=args.searches,
+        mempool=args.mempool,
+        seed=args.seed)
+    try:
+        results = run_benchmarks(settings, names, args.warmup, args.repeat,
+            log=lambda line: print(line, file=sys.stderr))
+    finally:
+        settings.close()
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+def run_compare(args):
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+
+    if baseline['settings'] != current['settings']:
+        print('Warning: the results were taken with different settings',
+            file=sys.stderr)
+
+    rows = compare(baseline, current, args.threshold)
+    for name, old, new, ratio, status in rows:
+        old = '-' if old is None else f'{old * 1e6:.1f}'
+        new = '-' if new is None else f'{new * 1e6:.1f}'
+        ratio = '-' if ratio is None else f'{ratio:.2f}x'
+        print(f'{name:<18} {old:>12} {new:>12} us/op {ratio:>8}  {status}')
+    return 1 if any(row[4] == 'regression' for row in rows) else 0
+
+def run_cluster(args):
+    runs = []
+    for size in (int(size) for size in args.nodes.split(',')):
+        cluster = Cluster(size, args.topology, args.degree, args.seed,
+            args.peer_workers)
+        try:
+            result = cluster.run(args.blocks, args.transactions, args.miners,
+                args.timeout)
+        finally:
+            cluster.close()
+        result['topology'] = args.topology
+        runs.append(result)
+
+        propagation = result['propagation'] or {}
+        convergence = result['convergence']
+        print(f"{size:>5} nodes  {result['blocks_per_second'] or 0:8.2f} "
+            f"blocks/s  {result['transactions']['per_second'] or 0:9.1f} "
+            f"tx/s  propagation {propagation.get('median', 0) * 1000:8.1f} ms"
+            f"  convergence "
+            f"{'-' if convergence is None else f'{convergence * 1000:.1f} ms'}"
+            f"  unreached {result['unreached']}", file=sys.stderr)
+
+    output = json.dumps({'meta': machine(), 'runs': runs}, indent=2,
+        sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Doubloon benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    runner = commands.add_parser('run', help='run the benchmarks')
+    runner.add_argument('--blocks', default=50, type=int,
+        help='blocks in the synthetic chain')
+    runner.add_argument('--transactions', default=20, type=int,
+        help='transactions per synthetic block')
+    runner.add_argument('--signatures', default=50, type=int,
+        help='signed transactions to verify')
+    runner.add_argument('--searches', default=4, type=int,
+        help='proof searches per run')
+    runner.add_argument('--mempool', default=10000, type=int,
+        help='transactions in the synthetic mempool')
+    runner.add_argument('--seed', default=0, type=int,
+        help='seed of the synthetic data')
+    runner.add_argument('--warmup', default=1, type=int,
+        help='untimed runs of each benchmark')
+    runner.add_argument('--repeat', default=5, type=int,
+        help='timed runs of each benchmark')
+    runner.add_argument('--only',
+        help=f'comma separated benchmarks, from {", ".join(BENCHMARKS)}')
+    runner.add_argument('-o', '--output',
+        help='file to write the json results to, stdout if not given')
+    runner.set_defaults(func=run)
+
+    comparer = commands.add_parser('compare',
+        help='compare results against a saved baseline')
+    comparer.add_argument('baseline', help='json results of the baseline')
+    comparer.add_argument('current', help='json results to check')
+    comparer.add_argument('-t', '--threshold', default=0.1, type=float,
+        help='relative slowdown flagged as a regression')
+    comparer.set_defaults(func=run_compare)
+
+    clusters = commands.add_parser('cluster',
+        help='load a cluster of in-process nodes')
+    clusters.add_argument('--nodes', default='4,16,64',
+        help='comma separated cluster sizes to run')
+    clusters.add_argument('--topology', default='random', choices=TOPOLOGIES,
+        help='how the nodes are linked')
+    clusters.add_argument('--degree', default=4, type=int,
+        help='links per node of the random topology')
+    clusters.add_argument('--blocks', default=10, type=int,
+        help='mining rounds')
+    clusters.add_argument('--transactions', default=100, type=int,
+        help='transactions sent per round')
+    clusters.add_argument('--miners', default=1, type=int,
+        help='nodes mining at once in each round')
+    clusters.add_argument('--timeout', default=30, type=float,
+        help='most seconds a round waits for the cluster')
+    clusters.add_argument('--peer-workers', default=4, type=int,
+        help='peer request threads of each node')
+    clusters.add_argument('--seed', default=0, type=int,
+        help='seed of the topology and load')
+    clusters.add_argument('-o', '--output',
+        help='file to write the json results to, stdout if not given')
+    clusters.set_defaults(func=run_cluster)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
@@ -0,0 +1,303 @@
+from random import Random
+from time import sleep, time
+
+from app import REQUEST_SECONDS, create_app
+from block import Block
+from blockchain import Blockchain
+from keypool import KeyPool
+from miner import Miner
+from peer import PeerClient
+from validator import ChainValidator
+from verifier import Verifier
+
+from bench.peers import connect
+from bench.synthetic import signed_transactions
+
+TOPOLOGIES = ('full', 'ring', 'star', 'random')
+
+def topology(name, size, degree = 4, rng = None):
+    """
+    Picks the links between the nodes of a cluster
+
+    :param name: <str> one of TOPOLOGIES. A random topology is a ring with
+    random links added until every node has at least degree of them.
+    :param size: <int> number of nodes
+    :param degree: (Optional) <int> links per node of a random topology
+    :param rng: (Optional) <Random> random source of a random topology
+    :return: <set> (i, j) links between node positions, with i < j
+    """
+    if name not in TOPOLOGIES:
+        raise ValueError(f'Unknown topology {name}')
+
+    links = set()
+    if name == 'full':
+        links = {(i, j) for i in range(size) for j in range(i + 1, size)}
+    elif name == 'star':
+        links = {(0, i) for i in range(1, size)}
+    elif size > 1:
+        links = {tuple(sorted((i, (i + 1) % size))) for i in range(size)}
+
+    if name == 'random':
+        rng = rng or Random(0)
+        degrees = [0] * size
+        for i, j in links:
+            degrees[i] += 1
+            degrees[j] += 1
+        for i in range(size):
+            others = [j for j in range(size) if j != i and
+                tuple(sorted((i, j))) not in links]
+            rng.shuffle(others)
+            while degrees[i] < degree and others:
+                j = others.pop()
+                links.add(tuple(sorted((i, j))))
+                degrees[i] += 1
+                degrees[j] += 1
+    return links
+
+def adopt_genesis(blockchain, genesis):
+    """
+    Swaps the genesis block of a fresh blockchain, so that nodes created
+    apart share their first block.
+
+    :param blockchain: <Blockchain> a blockchain holding only its genesis
+    :param genesis: <Block> the sealed genesis block to use
+    """
+    with blockchain.lock:
+        for index in blockchain.indexes:
+            index.revert(blockchain.chain[0])
+        del blockchain.chain[0:]
+        blockchain.chain.append(genesis)
+        for index in blockchain.indexes:
+            index.apply(genesis)
+
+def summarize(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        'min': values[0],
+        'median': values[len(values) // 2],
+        'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+        'max': values[-1]
+    }
+
+class Cluster(object):
+    """
+    Nodes running side by side in this process, reaching each other through
+    an in-process adapter instead of the network. Each node is a full app
+    with its own chain, mempool and peers, but the worker pools that only
+    burn CPU (signature checks, chain validation and wallet keys) are
+    shared, and each node mines serially, so a cluster of hundreds of nodes
+    does not start hundreds of process pools.
+    """
+    def __init__(self, size, name = 'ring', degree = 4, seed = 0,
+        peer_workers = 4):
+        self.size = size
+        self.rng = Random(seed)
+        self.seed = seed
+        self.addresses = [f'node{i}:80' for i in range(size)]
+
+        self.verifier = Verifier()
+        self.validator = ChainValidator()
+        self.key_pool = KeyPool()
+
+        self.apps = []
+        genesis = None
+        for address in self.addresses:
+            blockchain = Blockchain()
+            blockchain.address = address
+            blockchain.miner = Miner(workers=1)
+            blockchain.peer_client.close()
+            blockchain.peer_client = PeerClient(peer_workers)
+            blockchain.verifier = self.verifier
+            blockchain.validator = self.validator
+            if genesis is None:
+                genesis = Block.from_dict(blockchain.chain[0].dict).seal()
+            else:
+                adopt_genesis(blockchain, genesis)
+            self.apps.append(create_app(blockchain, self.key_pool))
+        self.adapter = connect(dict(zip(self.addresses, self.apps)))
+
+        self.links = topology(name, size, degree, self.rng)
+        neighbours = [[] for _ in range(size)]
+        for i, j in self.links:
+            neighbours[i].append(f'http://{self.addresses[j]}')
+            neighbours[j].append(f'http://{self.addresses[i]}')
+        for app, peers in zip(self.apps, neighbours):
+            if peers:
+                app.test_client().post('/peers/register',
+                    json={'peers': peers})
+
+    def tips(self):
+        """
+        Grabs the tip of every node
+
+        :return: <list> (index, hash) of each node's last block
+        """
+        tips = []
+        for app in self.apps:
+            with app.blockchain.lock:
+                tip = app.blockchain.last_block
+                tips.append((tip.index, tip.hash))
+        return tips
+
+    def submit(self, transactions):
+        """
+        Sends signed transactions to random nodes, one batch per node
+
+        :param transactions: <list> (transaction dict, signature) pairs
+        :return: <int> number of transactions accepted
+        """
+        batches = {}
+        for transaction, signature in transactions:
+            batch = batches.setdefault(self.rng.randrange(self.size), [])
+            batch.append(dict(transaction, signature=signature))
+
+        accepted = 0
+        for position, batch in batches.items():
+            response = self.apps[position].test_client().post(
+                '/transactions/batch', json={'transactions': batch})
+            accepted += response.get_json()['accepted']
+        return accepted
+
+    def mine(self, positions, timeout):
+        """
+        Mines on the given nodes at the same time, through /mine
+
+        :param positions: <list> <int> positions of the mining nodes
+        :param timeout: <float> most seconds to wait for the jobs
+        :return: <float> time the first block was mined, or None if none was
+        """
+        jobs = []
+        for position in positions:
+            app = self.apps[position]
+            job_id = app.test_client().get('/mine').get_json()['job']['id']
+            jobs.append(app.mining.get(job_id))
+
+        for job in jobs:
+            job.wait(timeout)
+        mined = [job.finished for job in jobs if job.block is not None]
+        return min(mined) if mined else None
+
+    def wait(self, done, since, timeout, poll = 0.001):
+        """
+        Polls the tips of the nodes until done(tips) holds
+
+        :param done: <callable> called with the list of tips
+        :param since: <float> time the wait is measured from
+        :param timeout: <float> most seconds to wait
+        :param poll: (Optional) <float> seconds between polls
+        :return: <float> seconds from since until done held, or None
+        """
+        deadline = time() + timeout
+        while True:
+            if done(self.tips()):
+                return time() - since
+            if time() > deadline:
+                return None
+            sleep(poll)
+
+    def run(self, blocks, transactions = 0, miners = 1, timeout = 30,
+        grace = 1):
+        """
+        Drives the cluster through rounds of transaction and mining load.
+        Each round sends transactions to random nodes, mines on random
+        nodes, and waits for every node to reach the new height. Once the
+        load stops, the cluster is given a grace period to agree on a
+        single tip. Nodes keep the first of equally long branches they
+        see, so a tie left by competing miners is broken with one more
+        block, and convergence is then timed from that block.
+
+        :param blocks: <int> number of rounds
+        :param transactions: (Optional) <int> transactions sent per round
+        :param miners: (Optional) <int> nodes mining at once in each round
+        :param timeout: (Optional) <float> most seconds a round may wait
+        :param grace: (Optional) <float> seconds to wait for agreement
+        before breaking a tie
+        :return: <dict> the measurements
+        """
+        signed = signed_transactions(blocks * transactions, self.seed) \
+            if transactions else []
+        messages = count_requests()
+
+        submitted = accepted = 0
+        submit_seconds = 0
+        propagation = []
+        unreached = 0
+
+        start = time()
+        for round in range(blocks):
+            batch = signed[round * transactions:(round + 1) * transactions]
+            submit_start = time()
+            accepted += self.submit(batch)
+            submit_seconds += time() - submit_start
+            submitted += len(batch)
+
+            height = max(index for index, _ in self.tips()) + 1
+            mined = self.mine(self.rng.sample(range(self.size),
+                min(miners, self.size)), timeout)
+            delay = None
+            if mined is not None:
+                delay = self.wait(
+                    lambda tips: min(index for index, _ in tips) >= height,
+                    mined, timeout)
+            if delay is None:
+                unreached += 1
+            else:
+                propagation.append(delay)
+        load_seconds = time() - start
+
+        agreed = lambda tips: len(set(tips)) == 1
+        convergence = self.wait(agreed, time(), grace)
+        tiebreak = convergence is None
+        if tiebreak:
+            mined = self.mine([0], timeout)
+            if mined is not None:
+                convergence = self.wait(agreed, mined, timeout)
+
+        messages = {route: total - messages.get(route, 0)
+            for route, total in count_requests().items()
+            if total > messages.get(route, 0)}
+        tips = self.tips()
+        return {
+            'nodes': self.size,
+            'links': len(self.links),
+            'rounds': blocks,
+            'miners': miners,
+            'seconds': load_seconds,
+            'blocks_per_second': blocks / load_seconds if load_seconds else None,
+            'transactions': {
+                'submitted': submitted,
+                'accepted': accepted,
+                'per_second':
+                    accepted / submit_seconds if submit_seconds else None
+            },
+            'propagation': summarize(propagation),
+            'unreached': unreached,
+            'convergence': convergence,
+            'tiebreak': tiebreak,
+            'height': min(index for index, _ in tips),
+            'messages': messages,
+            'announcements_per_block':
+                messages.get('/blocks/receive', 0) / blocks if blocks else None
+        }
+
+    def close(self):
+        # The verifier and validator are shared, and closing them twice is
+        # harmless
+        for app in self.apps:
+            app.blockchain.close()
+        self.key_pool.close()
+
+def count_requests():
+    """
+    Counts the requests served so far in this process, by route
+
+    :return: <dict> route to number of requests
+    """
+    counts = {}
+    for name, labels, value in REQUEST_SECONDS.samples():
+        if name.endswith('_count'):
+            route = dict(labels)['route']
+            counts[route] = counts.get(route, 0) + value
+    return counts
@@ -0,0 +1,310 @@
+import gc
+import json
+import os
+import platform
+import statistics
+from time import perf_counter, time
+
+import codec
+import constant
+from app import create_app
+from block import Block
+from blockchain import Blockchain
+from cache import ResponseCache
+from transaction import Transaction, verification_cache
+from verifier import Verifier
+
+from bench.peers import connect
+from bench.synthetic import build_chain, build_mempool, signed_transactions
+from bench.synthetic import close_miner
+
+# Every benchmark takes the run settings and returns a case: run(state) is
+# timed, setup() builds a fresh state for each repetition outside the
+# timing and cleanup(state) releases it, teardown() releases what the case
+# itself holds once its runs are done, and ops is how many operations one
+# run performs.
+BENCHMARKS = {}
+
+def benchmark(name):
+    def register(build):
+        BENCHMARKS[name] = build
+        return build
+    return register
+
+@benchmark('proof_of_work')
+def bench_proof_of_work(settings):
+    blockchain = Blockchain()
+    prevs = list(range(settings.searches))
+
+    def run(state):
+        for prev in prevs:
+            blockchain.proof_of_work(prev)
+    return {'run': run, 'ops': len(prevs),
+        'teardown': blockchain.close}
+
+@benchmark('block_hash')
+def bench_block_hash(settings):
+    blocks = [block.dict for block in settings.chain().chain]
+
+    def run(state):
+        for block in blocks:
+            Block.from_dict(block).seal()
+    return {'run': run, 'ops': len(blocks)}
+
+@benchmark('verify_signature')
+def bench_verify_signature(settings):
+    items = settings.signed()
+
+    def run(state):
+        for transaction, signature in items:
+            Transaction.from_dict(transaction).verify_signature(signature)
+    return {'run': run, 'setup': verification_cache.clear, 'ops': len(items)}
+
+@benchmark('verify_many')
+def bench_verify_many(settings):
+    items = settings.signed()
+    verifier = Verifier()
+
+    def run(state):
+        verifier.verify_many(items)
+    return {'run': run, 'setup': verification_cache.clear, 'ops': len(items),
+        'teardown': verifier.close}
+
+def bench_chain(settings, format):
+    app = create_app(settings.chain())
+    client = app.test_client()
+
+    def setup():
+        app.response_cache = ResponseCache(
+            constant.RESPONSE_CACHE_BYTES,
+            constant.RESPONSE_CACHE_ENTRY_BYTES)
+
+    def run(state):
+        client.get(f'/chain?format={format}').get_data()
+    return {'run': run, 'setup': setup, 'ops': len(app.blockchain.chain),
+        'teardown': app.key_pool.close}
+
+@benchmark('chain_json')
+def bench_chain_json(settings):
+    return bench_chain(settings, 'json')
+
+@benchmark('chain_ndjson')
+def bench_chain_ndjson(settings):
+    return bench_chain(settings, 'ndjson')
+
+@benchmark('chain_binary')
+def bench_chain_binary(settings):
+    return bench_chain(settings, 'binary')
+
+@benchmark('chain_cached')
+def bench_chain_cached(settings):
+    app = create_app(settings.chain())
+    client = app.test_client()
+
+    def run(state):
+        client.get('/chain?format=binary').get_data()
+    return {'run': run, 'ops': len(app.blockchain.chain),
+        'teardown': app.key_pool.close}
+
+def bench_decode(settings, encode, decode):
+    payloads = [encode(block) for block in settings.chain().chain]
+
+    def run(state):
+        for payload in payloads:
+            decode(payload)
+    return {'run': run, 'ops': len(payloads)}
+
+# How fast a peer reads each streamed /chain format back into blocks, which
+# decides the order of constant.CHAIN_ACCEPT
+@benchmark('decode_binary')
+def bench_decode_binary(settings):
+    return bench_decode(settings, codec.encode_block, codec.decode_block)
+
+@benchmark('decode_ndjson')
+def bench_decode_ndjson(settings):
+    return bench_decode(settings, lambda block: block.serialized,
+        lambda line: Block.from_dict(json.loads(line)))
+
+@benchmark('resolve')
+def bench_resolve(settings):
+    peer = create_app(settings.chain())
+
+    def setup():
+        node = create_app(Blockchain())
+        connect({'node:80': node, 'peer:80': peer})
+        node.blockchain.add_peer('http://peer:80')
+        return node
+
+    def cleanup(node):
+        node.blockchain.close()
+        node.key_pool.close()
+
+    def run(node):
+        if not node.blockchain.resolve():
+            raise RuntimeError('resolve did not take the peer chain')
+    return {'run': run, 'setup': setup, 'cleanup': cleanup,
+        'ops': len(peer.blockchain.chain), 'teardown': peer.key_pool.close}
+
+@benchmark('mempool_select')
+def bench_mempool_select(settings):
+    mempool = build_mempool(settings.mempool, settings.seed)
+
+    def run(state):
+        mempool.select(constant.MAX_BLOCK_TRANSACTIONS)
+    return {'run': run, 'ops': 1}
+
+class Settings(object):
+    """
+    Sizes of the synthetic data, shared by the benchmarks. The chain and
+    the signed transactions are built once and reused.
+    """
+    def __init__(self, blocks = 50, transactions = 20, signatures = 50,
+        searches = 4, mempool = 10000, seed = 0):
+        self.blocks = blocks
+        self.transactions = transactions
+        self.signatures = signatures
+        self.searches = searches
+        self.mempool = mempool
+        self.seed = seed
+
+        self.__chain = None
+        self.__signed = None
+
+    def chain(self):
+        if self.__chain is None:
+            self.__chain = build_chain(self.blocks, self.transactions,
+                self.seed)
+        return self.__chain
+
+    def close(self):
+        """
+        Closes the synthetic chain, if it was built, and the miner that
+        mined it.
+        """
+        if self.__chain is not None:
+            self.__chain.close()
+            self.__chain = None
+        close_miner()
+
+    def signed(self):
+        if self.__signed is None:
+            self.__signed = signed_transactions(self.signatures, self.seed)
+        return self.__signed
+
+    @property
+    def dict(self):
+        return {
+            'blocks': self.blocks,
+            'transactions': self.transactions,
+            'signatures': self.signatures,
+            'searches': self.searches,
+            'mempool': self.mempool,
+            'seed': self.seed
+        }
+
+def measure(case, warmup, repeat):
+    """
+    Times a case, dropping the warmup runs
+
+    :param case: <dict> the case, as returned by a benchmark
+    :param warmup: <int> runs before the timed ones
+    :param repeat: <int> timed runs
+    :return: <list> <float> seconds of each timed run
+    """
+    times = []
+    for run in range(warmup + repeat):
+        state = case['setup']() if case.get('setup') else None
+        gc.collect()
+        try:
+            start = perf_counter()
+            case['run'](state)
+            elapsed = perf_counter() - start
+        finally:
+            if case.get('cleanup'):
+                case['cleanup'](state)
+        if run >= warmup:
+            times.append(elapsed)
+    return times
+
+def summarize(times, ops):
+    median = statistics.median(times)
+    return {
+        'repeat': len(times),
+        'ops': ops,
+        'min': min(times),
+        'median': median,
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0,
+        'per_op': median / ops,
+        'ops_per_second': ops / median if median else None
+    }
+
+def run_benchmarks(settings, names = None, warmup = 1, repeat = 5, log = None):
+    """
+    Runs the benchmarks and gathers machine-readable results
+
+    :param settings: <Settings> sizes of the synthetic data
+    :param names: (Optional) <list> benchmarks to run, all by default
+    :param warmup: (Optional) <int> untimed runs of each benchmark
+    :param repeat: (Optional) <int> timed runs of each benchmark
+    :param log: (Optional) <callable> called with a line per benchmark
+    :return: <dict> the results
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        case = BENCHMARKS[name](settings)
+        try:
+            results[name] = summarize(measure(case, warmup, repeat),
+                case['ops'])
+        finally:
+            if case.get('teardown'):
+                case['teardown']()
+        if log:
+            log(f"{name:<18} {results[name]['median'] * 1000:10.3f} ms "
+                f"({results[name]['per_op'] * 1e6:.1f} us/op)")
+
+    return {
+        'meta': machine(),
+        'settings': settings.dict,
+        'warmup': warmup,
+        'results': results
+    }
+
+def machine():
+    return {
+        'time': time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+def compare(baseline, current, threshold):
+    """
+    Compares the time per operation of two result sets
+
+    :param baseline: <dict> saved results
+    :param current: <dict> new results
+    :param threshold: <float> relative slowdown flagged as a regression,
+    such as 0.1 for 10%
+    :return: <list> (name, baseline, current, ratio, status) rows, status
+    being 'regression', 'improvement', 'ok', 'new' or 'missing'
+    """
+    rows = []
+    old, new = baseline['results'], current['results']
+    for name in list(old) + [name for name in new if name not in old]:
+        if name not in new:
+            rows.append((name, old[name]['per_op'], None, None, 'missing'))
+            continue
+        if name not in old:
+            rows.append((name, None, new[name]['per_op'], None, 'new'))
+            continue
+
+        ratio = new[name]['per_op'] / old[name]['per_op']
+        status = 'ok'
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 - threshold:
+            status = 'improvement'
+        rows.append((name, old[name]['per_op'], new[name]['per_op'], ratio,
+            status))
+    return rows
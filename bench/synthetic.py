@@ -0,0 +1,110 @@
+from binascii import hexlify
+from random import Random
+
+from blockchain import Blockchain
+from mempool import Mempool
+from miner import Miner
+from wallet import new_key
+
+# Proofs only depend on the previous proof, so the proofs of a synthetic
+# chain are the same every time and are mined once per process
+_proofs = {}
+_miner = None
+
+def make_addresses(count, rng):
+    return ['%064x' % rng.getrandbits(256) for _ in range(count)]
+
+def make_transactions(count, rng, addresses):
+    """
+    Creates unsigned transactions between random addresses
+
+    :param count: <int> number of transactions
+    :param rng: <Random> seeded random source
+    :param addresses: <list> <str> addresses to pick from
+    :return: <list> the transaction dicts
+    """
+    return [{
+        'sender': rng.choice(addresses),
+        'receiver': rng.choice(addresses),
+        'amount': rng.randint(1, 1000)
+    } for _ in range(count)]
+
+def build_mempool(count, seed = 0, accounts = 100):
+    """
+    Creates a mempool holding synthetic transactions
+
+    :param count: <int> number of transactions
+    :param seed: (Optional) <int> random seed
+    :param accounts: (Optional) <int> number of distinct addresses
+    :return: <Mempool> the mempool
+    """
+    rng = Random(seed)
+    mempool = Mempool(max_count=count + 1)
+    for transaction in make_transactions(count, rng,
+        make_addresses(accounts, rng)):
+        mempool.add(transaction)
+    return mempool
+
+def build_chain(blocks, transactions, seed = 0, accounts = 100, path = None):
+    """
+    Creates a blockchain of synthetic blocks with valid proofs
+
+    :param blocks: <int> number of blocks after the genesis block
+    :param transactions: <int> transactions per block
+    :param seed: (Optional) <int> random seed
+    :param accounts: (Optional) <int> number of distinct addresses
+    :param path: (Optional) <str> file to store the chain in
+    :return: <Blockchain> the blockchain
+    """
+    rng = Random(seed)
+    addresses = make_addresses(accounts, rng)
+    blockchain = Blockchain(path)
+    for _ in range(blocks):
+        for transaction in make_transactions(transactions, rng, addresses):
+            blockchain.mempool.add(transaction)
+        blockchain.add_block(proof_for(blockchain.last_block.proof))
+    return blockchain
+
+def proof_for(prev):
+    """
+    Grabs the proof following prev, mining it the first time.
+
+    :param prev: <int> the previous proof
+    :return: <int> the proof
+    """
+    global _miner
+    if prev not in _proofs:
+        if _miner is None:
+            _miner = Miner()
+        _proofs[prev] = _miner.search(prev)
+    return _proofs[prev]
+
+def close_miner():
+    """
+    Shuts down the miner proof_for mines with, if it was started. The
+    proofs found stay cached.
+    """
+    global _miner
+    if _miner is not None:
+        _miner.close()
+        _miner = None
+
+def signed_transactions(count, seed = 0):
+    """
+    Creates transactions signed by one fresh key, each with a different
+    amount so none of them share a verification cache entry.
+
+    :param count: <int> number of transactions
+    :param seed: (Optional) <int> random seed
+    :return: <list> (transaction dict, signature) pairs
+    """
+    rng = Random(seed)
+    key = new_key()
+    sender = hexlify(key.publickey().exportKey(format='DER')).decode()
+    signature = hexlify(key.exportKey(format='DER')).decode()
+    receivers = make_addresses(10, rng)
+    return [({
+        'sender': sender,
+        'receiver': rng.choice(receivers),
+        'amount': amount
+    }, signature) for amount in range(1, count + 1)]
@@ -1,48 +1,247 @@
+import json
+from time import perf_counter
 from uuid import uuid4
-from flask import Flask, jsonify, request
+from flask import (Blueprint, Flask, Response, current_app, g, jsonify,
+    request)
+from werkzeug.local import LocalProxy
 
-import blockchain
+import codec
 import wallet
 import constant
+import metrics
+from cache import ResponseCache, make_etag
+from blockchain import (Blockchain, BLOCK_ACCEPTED, BLOCK_ORPHAN,
+    BLOCK_INVALID)
+from jobs import MiningJobs, JOB_RUNNING, JOB_MINED
+from keypool import KeyPool
+from profiler import SamplingProfiler
 
-# Node instantiation
-app = Flask(__name__)
-node_address = str(uuid4()).replace('-', '')
+# Routes of a node, served by every app create_app makes
+node = Blueprint('node', __name__)
 
-# Blockchain instantiation
-blockchain = blockchain.Blockchain()
+# State of the node serving the current request
+blockchain = LocalProxy(lambda: current_app.blockchain)
+key_pool = LocalProxy(lambda: current_app.key_pool)
+response_cache = LocalProxy(lambda: current_app.response_cache)
+mining = LocalProxy(lambda: current_app.mining)
+profiler = SamplingProfiler()
 
-@app.route('/mine', methods=['GET'])
+def create_app(chain = None, pool = None):
+    """
+    Creates a node: an app serving a blockchain. Nodes share nothing but
+    the process-wide metrics and profiler, so several can run side by side
+    in one process.
+
+    :param chain: (Optional) <Blockchain> the blockchain to serve, a new
+    in-memory one by default
+    :param pool: (Optional) <KeyPool> the key pool for new wallets, which
+    starts filling right away
+    :return: <Flask> the app
+    """
+    app = Flask(__name__)
+    app.blockchain = chain or Blockchain()
+    app.key_pool = KeyPool() if pool is None else pool
+    app.key_pool.fill()
+    app.response_cache = ResponseCache(
+        constant.RESPONSE_CACHE_BYTES, 
+        constant.RESPONSE_CACHE_ENTRY_BYTES)
+    app.node_address = str(uuid4()).replace('-', '')
+    app.mining = MiningJobs(app.blockchain, app.node_address)
+    app.register_blueprint(node)
+    return app
+
+# Metrics read from the node when they are collected
+REQUEST_SECONDS = metrics.histogram('doubloon_request_seconds',
+    'Time to handle a request, up to the first byte of streamed bodies')
+metrics.gauge('doubloon_chain_length', 'Blocks in the chain',
+    lambda: len(blockchain.chain))
+metrics.gauge('doubloon_mempool_transactions', 'Pending transactions',
+    lambda: len(blockchain.mempool))
+metrics.gauge('doubloon_mempool_bytes', 'Size of the pending transactions',
+    lambda: blockchain.mempool.size)
+metrics.gauge('doubloon_peers', 'Registered peers',
+    lambda: len(blockchain.peers))
+
+@node.before_app_request
+def start_timer():
+    g.start = perf_counter()
+
+@node.after_app_request
+def record_request(response):
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(perf_counter() - g.start, route=rule,
+        method=request.method, status=response.status_code)
+    return response
+
+def cached_response(etag):
+    """
+    Answers a request from the response cache: 304 if the client already
+    holds the entity tag, the cached body if there is one.
+
+    :param etag: <str> the entity tag of the response
+    :return: <Response> the response, or None if it has to be built
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        entry = response_cache.get(etag)
+        if entry is None:
+            return None
+        body, mimetype, headers = entry
+        response = Response(body, mimetype=mimetype, headers=headers)
+    response.set_etag(etag)
+    return response
+
+def cached_json(key, build):
+    """
+    Serves a json response keyed on everything it depends on, so it is
+    built and encoded once for as long as the key holds.
+
+    :param key: <tuple> what the response depends on
+    :param build: <callable> returns the response body
+    :return: <Response> the response
+    """
+    etag = make_etag(*key)
+    response = cached_response(etag)
+    if response is None:
+        body = json.dumps(build()).encode()
+        response_cache.put(etag, body, 'application/json')
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+    return response
+
+def stream_chain(blocks, key = None, current = None, **fields):
+    """
+    Streams blocks as a json document holding the given fields and a chain
+    list, one serialized block at a time, so the full chain is never built
+    in memory. Clients asking for NDJSON get one block per line instead,
+    and clients asking for the binary encoding get length-prefixed blocks;
+    both send the fields as X- headers.
+
+    Given a key, the response gets an ETag and its encoded body is cached
+    as it streams, so an unchanged chain is only encoded once.
+
+    :param blocks: <iterable> the blocks to send
+    :param key: (Optional) <tuple> what the response depends on
+    :param current: (Optional) <callable> tells once the body is streamed
+    whether the key still holds, so a body the chain changed under is
+    not cached
+    :return: <Response> the streamed response
+    """
+    formats = {'json': 'application/json', 'ndjson': constant.NDJSON, 
+        'binary': constant.BINARY}
+    mimetype = formats.get(request.args.get('format')) or \
+        request.accept_mimetypes.best_match(list(formats.values()), 
+            'application/json')
+
+    etag = None
+    if key is not None:
+        etag = make_etag(mimetype, *key)
+        response = cached_response(etag)
+        if response is not None:
+            response.vary.add('Accept')
+            return response
+
+    def generate():
+        if mimetype == constant.BINARY:
+            for block in blocks:
+                yield codec.encode_record(block)
+            return
+
+        if mimetype == constant.NDJSON:
+            for block in blocks:
+                yield block.serialized + b'\n'
+            return
+
+        head = ''.join(f'{json.dumps(k)}: {json.dumps(v)}, ' 
+            for k, v in fields.items())
+        yield ('{' + head + '"chain": [').encode()
+        separator = b''
+        for block in blocks:
+            yield separator + block.serialized
+            separator = b', '
+        yield b']}'
+
+    headers = {}
+    if mimetype != 'application/json':
+        headers = {f'X-{k.capitalize()}': str(v) for k, v in fields.items()}
+
+    body = generate()
+    if etag is not None:
+        body = response_cache.tee(etag, body, mimetype, headers, current)
+    response = Response(body, mimetype=mimetype, headers=headers)
+    if etag is not None:
+        response.set_etag(etag)
+    response.vary.add('Accept')
+    return response
+
+@node.route('/mine', methods=['GET'])
 def mine():
-    last_blk = blockchain.last_block
-    last_proof = last_blk.proof
-    proof = blockchain.proof_of_work(last_proof)
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return 'Invalid wait', 400
+
+    job, started = mining.start()
+    if wait > 0:
+        job.wait(min(wait, constant.MAX_MINE_WAIT))
 
-    blockchain.add_transaction(
-        constant.MINER_KEY, 
-        node_address, 
-        constant.MINER_REWARD, 
-        "")
+    if job.status == JOB_MINED:
+        blk = job.block
+        response = {
+            'message': 'New block mined!',
+            'job': job.dict,
+            'index': blk['index'],
+            'transactions': blk['transactions'],
+            'proof': blk['proof'],
+            'previous_hash': blk['prev_hash']
+        }
+        return jsonify(response), 201
 
-    prev_hash = last_blk.hash
-    blk = blockchain.add_block(proof, prev_hash)
+    if job.status != JOB_RUNNING:
+        response = {'message': f'Mining {job.status}', 'job': job.dict}
+        return jsonify(response), 409
 
     response = {
-        'message': 'New block mined!',
-        'index': blk['index'],
-        'transactions': blk['transactions'],
-        'proof': blk['proof'],
-        'previous_hash': blk['prev_hash']
+        'message': 'Mining started' if started else 'Mining in progress',
+        'job': job.dict
     }
+    return jsonify(response), 202, {'Location': f'/mine/jobs/{job.id}'}
 
-    return jsonify(response), 201
+@node.route('/mine/jobs', methods=['GET'])
+def get_mining_jobs():
+    response = {'jobs': [job.dict for job in mining.jobs()]}
+    return jsonify(response), 200
+
+@node.route('/mine/jobs/<job_id>', methods=['GET'])
+def get_mining_job(job_id):
+    job = mining.get(job_id)
+    if job is None:
+        return 'Unknown mining job', 404
+    return jsonify(job.dict), 200
+
+@node.route('/mine/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_mining_job(job_id):
+    job = mining.cancel(job_id)
+    if job is None:
+        return 'Unknown mining job', 404
+    return jsonify(job.dict), 202 if job.status == JOB_RUNNING else 200
 
-@app.route('/transactions/get', methods=['GET'])
+@node.route('/transactions/get', methods=['GET'])
 def get_transactions():
-    response = {'transactions': blockchain.current_transactions}
+    start = max(request.args.get('start', 0, type=int), 0)
+    limit = min(
+        request.args.get('limit', constant.MAX_PAGE_SIZE, type=int),
+        constant.MAX_PAGE_SIZE)
+
+    response = {
+        'transactions': blockchain.mempool.page(start, max(limit, 0)),
+        'start': start,
+        'total': len(blockchain.mempool)
+    }
     return jsonify(response), 200
 
-@app.route('/transactions/new', methods=['POST'])
+@node.route('/transactions/new', methods=['POST'])
 def new_transaction():
     body = request.get_json()
     required_params = ['sender', 'receiver', 'amount', 'signature']
@@ -66,43 +265,115 @@ def new_transaction():
                     f'Transaction will be appended to block {result}'}
         return jsonify(response), 201
 
-@app.route('/chain', methods=['GET'])
-def get_chain():
-    chain = []
-    for block in blockchain.chain:
-        chain.append(block.dict)
+@node.route('/transactions/batch', methods=['POST'])
+def new_transactions():
+    body = request.get_json()
+    required_params = ['sender', 'receiver', 'amount', 'signature']
+
+    try:
+        transactions = body['transactions']
+        if not isinstance(transactions, list):
+            return 'Missing valid list of transactions', 400
+    except (TypeError, KeyError):
+        return 'Missing valid list of transactions', 400
+
+    if len(transactions) > constant.MAX_BATCH_TRANSACTIONS:
+        return 'Too many transactions', 413
+
+    well_formed = [
+        isinstance(t, dict) and all(e in t for e in required_params) 
+        for t in transactions
+    ]
+    added = iter(blockchain.add_transactions([
+        (t['sender'], t['receiver'], t['amount'], t['signature']) 
+        for t, ok in zip(transactions, well_formed) if ok
+    ]))
+
+    results = []
+    for ok in well_formed:
+        result = next(added) if ok else None
+        if result is None:
+            results.append({'message': 'Missing parameters'})
+        elif result < 0:
+            results.append({'message': 'Invalid transaction'})
+        else:
+            results.append({'message': 
+                f'Transaction will be appended to block {result}'})
+        results[-1]['accepted'] = result is not None and result >= 0
+
     response = {
-        'chain': chain,
-        'length': len(blockchain.chain)
+        'results': results,
+        'accepted': sum(result['accepted'] for result in results)
     }
     return jsonify(response), 200
 
-@app.route('/chain/resolve', methods=['GET'])
+@node.route('/chain', methods=['GET'])
+def get_chain():
+    start = request.args.get('start', 1, type=int)
+    limit = request.args.get('limit', type=int)
+
+    tip = request.args.get('tip')
+    if tip is not None:
+        block = blockchain.find_block(tip)
+        if block is None:
+            return 'Unknown block', 404
+        start = block.index + 1
+
+    chain = current_app.blockchain
+    with chain.lock:
+        tip = chain.last_block.hash
+        length = len(chain.chain)
+        blocks = chain.blocks_from(start, limit, length)
+    key = ('chain', tip, start, limit)
+    return stream_chain(blocks, key, lambda: chain.last_block.hash == tip,
+        length=length)
+
+@node.route('/headers', methods=['GET'])
+def get_headers():
+    start = request.args.get('start', 1, type=int)
+    limit = min(
+        request.args.get('limit', constant.MAX_HEADERS, type=int),
+        constant.MAX_HEADERS)
+
+    def build():
+        headers = []
+        for block in blockchain.blocks_from(start, limit):
+            headers.append(block.header)
+        return {
+            'headers': headers,
+            'length': len(blockchain.chain)
+        }
+
+    with blockchain.lock:
+        key = ('headers', blockchain.last_block.hash, start, limit)
+        return cached_json(key, build)
+
+@node.route('/chain/resolve', methods=['GET'])
 def consensus():
     is_chain_replaced = blockchain.resolve()
-    chain = []
-    for block in blockchain.chain:
-        chain.append(block.dict)
-
-    response = {
-        'message': '',
-        'chain': chain
-    }
 
+    message = ''
     if is_chain_replaced:
-        response['message'] = 'Chain has been replaced!'
+        message = 'Chain has been replaced!'
     else:
-        response['message'] = 'Chain is authoritative'
-    return jsonify(response), 200
+        message = 'Chain is authoritative'
+    return stream_chain(blockchain.blocks_from(1), message=message)
 
-@app.route('/peers/get', methods=['GET'])
+@node.route('/peers/get', methods=['GET'])
 def get_peers():
-    response = {
-        'peers': list(blockchain.peers)
-    }
-    return jsonify(response), 200
+    def build():
+        return {
+            'peers': list(blockchain.peers),
+            'health': blockchain.peer_client.report(blockchain.peers)
+        }
+
+    # Latencies move on every round, so the response is only rebuilt when
+    # the peers or the set of healthy ones change
+    healthy = blockchain.peer_client.healthy_peers()
+    key = ('peers', blockchain.peers_version, healthy)
+    return cached_json(key, build)
 
-@app.route('/peers/register', methods=['POST'])
+@node.route('/peers/register', methods=['POST'])
 def register_peers():
     body = request.get_json()
     original_size = len(blockchain.peers)
@@ -131,9 +402,157 @@ def register_peers():
     }
     return jsonify(response), status_code
 
-@app.route('/wallet/new', methods=['GET'])
+@node.route('/balance/<address>', methods=['GET'])
+def get_balance(address):
+    response = {
+        'address': address,
+        'balance': blockchain.balances.get(address)
+    }
+    return jsonify(response), 200
+
+@node.route('/balance', methods=['POST'])
+def get_balances():
+    body = request.get_json()
+
+    try:
+        addresses = body['addresses']
+        if not isinstance(addresses, list) or not all(
+            isinstance(address, str) for address in addresses):
+            return 'Missing valid list of addresses', 400
+    except (TypeError, KeyError):
+        return 'Missing valid list of addresses', 400
+
+    response = {
+        'balances': {
+            address: blockchain.balances.get(address) 
+            for address in addresses
+        }
+    }
+    return jsonify(response), 200
+
+@node.route('/transactions/<transaction_id>', methods=['GET'])
+def get_transaction(transaction_id):
+    occurrences = blockchain.find_transaction(transaction_id)
+    if not occurrences:
+        return 'Unknown transaction', 404
+
+    response = {
+        'id': transaction_id,
+        'transaction': occurrences[0][2],
+        'locations': [
+            {'block': index, 'offset': offset} 
+            for index, offset, _ in occurrences
+        ]
+    }
+    return jsonify(response), 200
+
+@node.route('/transactions/<transaction_id>/proof', methods=['GET'])
+def get_transaction_proof(transaction_id):
+    index = request.args.get('block', type=int)
+    proof = blockchain.transaction_proof(transaction_id, index)
+    if proof is None:
+        return 'Unknown transaction', 404
+
+    response = {'id': transaction_id, **proof}
+    return jsonify(response), 200
+
+@node.route('/blocks/receive', methods=['POST'])
+def receive_block():
+    body = request.get_json()
+
+    try:
+        block = body['block']
+        if not isinstance(block, dict):
+            return 'Missing valid block', 400
+    except (TypeError, KeyError):
+        return 'Missing valid block', 400
+
+    status = blockchain.receive_block(block, body.get('peer'))
+    codes = {
+        BLOCK_ACCEPTED: 201,
+        BLOCK_ORPHAN: 202,
+        BLOCK_INVALID: 400
+    }
+    response = {'message': f'Block {status}', 'status': status}
+    return jsonify(response), codes.get(status, 200)
+
+@node.route('/blocks/<block_hash>', methods=['GET'])
+def get_block(block_hash):
+    block = blockchain.find_block(block_hash)
+    if block is None:
+        return 'Unknown block', 404
+    return jsonify(block.dict), 200
+
+@node.route('/address/<address>/transactions', methods=['GET'])
+def get_address_transactions(address):
+    start = max(request.args.get('start', 0, type=int), 0)
+    limit = min(
+        request.args.get('limit', constant.MAX_PAGE_SIZE, type=int),
+        constant.MAX_PAGE_SIZE)
+
+    occurrences, total = blockchain.address_transactions(address, start, 
+        max(limit, 0))
+    response = {
+        'address': address,
+        'transactions': [
+            {'block': index, 'offset': offset, 'transaction': transaction} 
+            for index, offset, transaction in occurrences
+        ],
+        'start': start,
+        'total': total
+    }
+    return jsonify(response), 200
+
+@node.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.registry.render(),
+        mimetype='text/plain; version=0.0.4')
+
+@node.route('/profile', methods=['GET'])
+def get_profile():
+    headers = {
+        'X-Running': str(profiler.running),
+        'X-Samples': str(profiler.samples)
+    }
+    return Response(profiler.render(), mimetype='text/plain',
+        headers=headers)
+
+@node.route('/profile', methods=['POST'])
+def set_profile():
+    body = request.get_json()
+
+    try:
+        enabled = body['enabled']
+        interval = body.get('interval')
+        if not isinstance(enabled, bool) or not (interval is None or
+            isinstance(interval, (int, float)) and 0 < interval <= 10):
+            return 'Missing valid profiler settings', 400
+    except (TypeError, KeyError, AttributeError):
+        return 'Missing valid profiler settings', 400
+
+    if enabled:
+        if body.get('clear'):
+            profiler.clear()
+        profiler.start(interval)
+    else:
+        profiler.stop()
+
+    response = {'running': profiler.running, 'interval': profiler.interval}
+    return jsonify(response), 200
+
+def keys_pending():
+    response = {'message': 'Wallet keys are being generated, try again'}
+    return jsonify(response), 503, {
+        'Retry-After': str(constant.KEY_POOL_RETRY_AFTER)}
+
+@node.route('/wallet/new', methods=['GET'])
 def new_wallet():
-    wallet_dict = wallet.Wallet(uuid4()).dict
+    keys = key_pool.take()
+    if keys is None:
+        return keys_pending()
+
+    key, = keys
+    wallet_dict = wallet.Wallet(uuid4(), key).dict
 
     response = {
         'notice': 'Remember to save your keys in a secure location!',
@@ -142,6 +561,40 @@ def new_wallet():
     }
     return jsonify(response), 201
 
+@node.route('/wallet/batch', methods=['POST'])
+def new_wallets():
+    body = request.get_json()
+
+    try:
+        count = body['count']
+        if type(count) is not int or count < 1:
+            return 'Missing valid count of wallets', 400
+    except (TypeError, KeyError):
+        return 'Missing valid count of wallets', 400
+
+    if count > min(constant.MAX_BULK_WALLETS, key_pool.size):
+        return 'Too many wallets', 413
+
+    keys = key_pool.take(count)
+    if keys is None:
+        return keys_pending()
+
+    wallets = []
+    for key in keys:
+        wallet_dict = wallet.Wallet(uuid4(), key).dict
+        wallets.append({
+            'private_key': wallet_dict['private_key'],
+            'public_key': wallet_dict['public_key']
+        })
+
+    response = {
+        'notice': 'Remember to save your keys in a secure location!',
+        'wallets': wallets
+    }
+    return jsonify(response), 201
+
+app = create_app()
+
 if __name__ == '__main__':
     from argparse import ArgumentParser
 
@@ -157,6 +610,14 @@ if __name__ == '__main__':
         default=8081, 
         type=int, 
         help='port to run service')
+    parser.add_argument(
+        '-d', 
+        '--data', 
+        help='file to persist the chain in, kept in memory if not given')
     args = parser.parse_args()
 
+    if args.data:
+        app = create_app(Blockchain(args.data), app.key_pool)
+
+    app.blockchain.address = f'{args.host}:{args.port}'
     app.run(host=args.host, port=args.port)
\ No newline at end of file
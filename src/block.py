@@ -1,37 +1,182 @@
 import hashlib
 import json
-from time import time
+from time import perf_counter, time
+from types import MappingProxyType
+
+import metrics
+from merkle import merkle_root
+from transaction import TRANSACTION_FIELDS, Transaction
+
+SEAL_SECONDS = metrics.histogram('doubloon_block_seal_seconds',
+    'Time to serialize a block and compute its Merkle root and hash')
+
+def hash_header(index, timestamp, proof, prev_hash, root):
+    """
+    Creates an SHA-256 block hash from the header fields. The transactions
+    are covered through the Merkle root, so the cost does not grow with
+    them.
+
+    :return: <str> hash
+    """
+    header = {
+        'index': index,
+        'timestamp': timestamp,
+        'proof': proof,
+        'prev_hash': prev_hash,
+        'merkle_root': root
+    }
+    header_json = json.dumps(header, sort_keys=True)
+    return hashlib.sha256(header_json.encode()).hexdigest()
 
 class Block(object):
-    def __init__(self, index, transactions, proof, prev_hash):
+    __slots__ = ('index', 'timestamp', 'transactions', 'proof', 'prev_hash',
+        '_sealed', '_serialized', '_merkle_root', '_hash')
+
+    def __init__(self, index, transactions, proof, prev_hash, timestamp = None):
         self.index = index
-        self.timestamp = time()
+        self.timestamp = time() if timestamp is None else timestamp
         self.transactions = transactions
         self.proof = proof
         self.prev_hash = prev_hash
 
+        self._sealed = False
+
+    @classmethod
+    def from_dict(cls, block_dict):
+        """
+        Rebuilds a block from its json-friendly representation
+
+        :param block_dict: <dict> the block, as returned by Block.dict
+        :return: <Block> the unsealed block
+        """
+        return cls(
+            block_dict['index'],
+            block_dict['transactions'],
+            block_dict['proof'],
+            block_dict['prev_hash'],
+            block_dict['timestamp'])
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_sealed', False):
+            raise AttributeError(f'Block {self.index} is sealed')
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if self._sealed:
+            raise AttributeError(f'Block {self.index} is sealed')
+        object.__delattr__(self, name)
+
+    def seal(self):
+        """
+        Freezes the block. The transactions are copied into a tuple of
+        read-only mappings, the canonical serialization, the Merkle root and
+        the hash are computed once and kept, and any further change to the
+        block raises an error.
+
+        A transaction with missing or unknown fields raises a ValueError, as
+        its id, and so the block hash, would not cover all of it.
+
+        :return: <Block> the sealed block
+        """
+        if self._sealed:
+            return self
+
+        start = perf_counter()
+        for position, tx in enumerate(self.transactions):
+            if set(tx) != TRANSACTION_FIELDS:
+                raise ValueError(f'Transaction {position} of block '
+                    f'{self.index} does not have exactly the fields '
+                    f'{", ".join(sorted(TRANSACTION_FIELDS))}')
+        self.transactions = tuple(MappingProxyType(dict(tx))
+            for tx in self.transactions)
+        self._serialized = self.__serialize()
+        self._merkle_root = self.__merkle_root()
+        self._hash = self.__hash(self._merkle_root)
+        self._sealed = True
+        SEAL_SECONDS.observe(perf_counter() - start)
+        return self
+
+    @property
+    def sealed(self):
+        return self._sealed
+
     @property
     def hash(self):
         """
-        Creates an SHA-256 block hash
+        Creates an SHA-256 block hash over the header. Sealed blocks return
+        the hash computed when they were sealed.
 
-        :param block: <dict> block
         :return: <str> hash
         """
-        block_json = json.dumps(self.dict, sort_keys=True)
-        return hashlib.sha256(block_json.encode()).hexdigest()
+        if self._sealed:
+            return self._hash
+        return self.__hash(self.__merkle_root())
+
+    @property
+    def merkle_root(self):
+        """
+        Grabs the Merkle root of the block's transaction ids
+
+        :return: <str> hex root
+        """
+        if self._sealed:
+            return self._merkle_root
+        return self.__merkle_root()
+
+    @property
+    def transaction_ids(self):
+        return [Transaction.from_dict(tx).id for tx in self.transactions]
+
+    @property
+    def serialized(self):
+        """
+        Grabs the canonical json serialization of the whole block
+
+        :return: <bytes> the serialized block
+        """
+        if self._sealed:
+            return self._serialized
+        return self.__serialize()
+
+    @property
+    def header(self):
+        """
+        Grabs the block's header, which is enough to check the block hash,
+        the chain links and the proofs without the transactions
+
+        :return: <dict> for the header
+        """
+        return {
+            'index': self.index,
+            'hash': self.hash,
+            'timestamp': self.timestamp,
+            'prev_hash': self.prev_hash,
+            'proof': self.proof,
+            'merkle_root': self.merkle_root
+        }
 
     @property
     def dict(self):
         """
-        Grabs a json-friendly representation of the block
+        Grabs a json-friendly representation of the block. The transactions
+        are copies, so changing them leaves the block as it is.
 
         :return: <dict> for the block
         """
         return {
             'index': self.index,
             'timestamp': self.timestamp,
-            'transactions': self.transactions,
+            'transactions': [dict(tx) for tx in self.transactions],
             'proof': self.proof,
             'prev_hash': self.prev_hash
-        }
\ No newline at end of file
+        }
+
+    def __serialize(self):
+        return json.dumps(self.dict, sort_keys=True).encode()
+
+    def __merkle_root(self):
+        return merkle_root(self.transaction_ids)
+
+    def __hash(self, root):
+        return hash_header(self.index, self.timestamp, self.proof,
+            self.prev_hash, root)
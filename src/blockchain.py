@@ -1,39 +1,224 @@
-import hashlib
-import requests
+import json
+from collections import OrderedDict
+from threading import Lock, RLock, Thread
+from time import monotonic
 from uuid import uuid4
 from urllib.parse import urlparse
 
+import requests
+
+import codec
 import constant
+import miner
+from peer import PeerClient
 from transaction import Transaction
 from block import Block
+from merkle import merkle_proof
+from store import ChainStore
+from compact import CompactChain
+from index import BalanceIndex, LookupIndex, SnapshotWriter
+from index import load_snapshot, snapshot_state
+from mempool import Mempool
+from tree import BlockTree
+from verifier import Verifier
+from validator import ChainValidator
+
+# Outcomes of receive_block
+BLOCK_ACCEPTED = 'accepted'
+BLOCK_KNOWN = 'known'
+BLOCK_ORPHAN = 'orphan'
+BLOCK_STALE = 'stale'
+BLOCK_INVALID = 'invalid'
+
+def well_formed(block):
+    """
+    Checks the fields of a received block have the types of a mined one.
+    Its proof can only be checked against its parent, but a block that
+    could not even be mined is refused before it is kept anywhere.
+
+    :param block: <Block> the sealed block
+    :return: <bool> true if well formed, false otherwise
+    """
+    if type(block.index) is not int or block.index < 2:
+        return False
+    if type(block.proof) is not int or block.proof < 0:
+        return False
+    prev_hash = block.prev_hash
+    return (type(prev_hash) is str and len(prev_hash) == 64 and
+        prev_hash.strip('0123456789abcdef') == '')
 
 class Blockchain(object):
-    def __init__(self):
-        self.chain = []
-        self.current_transactions = []
+    def __init__(self, path = None):
+        self.address = None
+        self.lock = RLock()
+        self.chain = ChainStore(path) if path else CompactChain()
+        self.mempool = Mempool()
         self.peers = set()
+        self.peers_version = 0
+        self.miner = miner.Miner()
+        self.peer_client = PeerClient()
+        self.verifier = Verifier()
+        self.validator = ChainValidator()
 
-        self.add_block(prev_hash = 1, proof = 100)
+        self.balances = BalanceIndex()
+        self.lookup = LookupIndex()
+        self.indexes = [self.balances, self.lookup, self.mempool]
+        self.snapshot_path = path + '.indexes' if path else None
+        self.snapshot_interval = constant.INDEX_SNAPSHOT_INTERVAL
+        self.__snapshots = SnapshotWriter(self.snapshot_path)
 
-    def add_block(self, proof, prev_hash = None):
+        self.tree = BlockTree(constant.FORK_DEPTH)
+        self.__orphans = OrderedDict()
+        self.__syncs = {}
+        self.__syncs_lock = Lock()
+        self.__etags = OrderedDict()
+        self.__etags_lock = Lock()
+
+        if not self.chain:
+            self.add_block(prev_hash = 1, proof = 100)
+        else:
+            for i in range(self.__restore_indexes(), len(self.chain)):
+                self.__apply(self.chain[i])
+
+    def add_block(self, proof, prev_hash = None, transactions = None):
         """
-        Creates a new block in the chain.
+        Creates a new block in the chain from the highest priority pending
+        transactions. The block is sealed before it is appended, so its hash
+        is computed only once.
 
         :param proof: <int> proof passed by the PoW algorithm.
         :param prev_hash: (Optional) <str> previous block hash
+        :param transactions: (Optional) <list> the transaction dicts of the
+        block, picked from the mempool by default
         :return: <dict> representation of the new block
         """
-        new_block = Block(
-            len(self.chain) + 1, 
-            self.current_transactions, 
-            proof, 
-            prev_hash or self.last_block.hash)
+        with self.lock:
+            if transactions is None:
+                transactions = self.mempool.select(
+                    constant.MAX_BLOCK_TRANSACTIONS)
+            new_block = Block(
+                len(self.chain) + 1, 
+                transactions, 
+                proof, 
+                prev_hash or self.last_block.hash).seal()
 
-        self.current_transactions = []
-
-        self.chain.append(new_block)
+            self.chain.append(new_block)
+            self.__apply(new_block)
         return new_block.dict
 
+    def receive_block(self, block_dict, peer = None):
+        """
+        Takes a block announced by a peer. A block extending our tip is
+        checked against it alone and appended, then passed on to the other
+        peers. A block on a side branch is kept in the block tree, and the
+        chain switches to that branch once it is the longest. A block whose
+        parent we do not know is kept as an orphan until the parent
+        arrives. If the announcing peer is registered, its gap is filled by
+        syncing with that peer in the background, and a tip reached that
+        way is announced in turn.
+
+        :param block_dict: <dict> the block, as returned by Block.dict
+        :param peer: (Optional) <str> address of the announcing peer
+        :return: <str> one of the BLOCK_ outcomes
+        """
+        try:
+            block = Block.from_dict(block_dict).seal()
+        except (KeyError, TypeError, ValueError):
+            return BLOCK_INVALID
+        if not well_formed(block):
+            return BLOCK_INVALID
+
+        with self.lock:
+            # An orphan longer than our chain starts a sync, unless its
+            # parent was such an orphan and already started one
+            parent = self.__orphans.get(block.prev_hash)
+            gap = block.index > len(self.chain) and (parent is None or
+                parent[0].index <= len(self.chain))
+            status = self.__receive(block)
+            if status == BLOCK_ACCEPTED or status == BLOCK_STALE:
+                self.__connect_orphans()
+
+        if status == BLOCK_ACCEPTED:
+            self.announce(block, exclude=peer)
+        elif status == BLOCK_ORPHAN and gap and peer in self.peers:
+            self.__start_sync(peer)
+        return status
+
+    def wait_for_syncs(self, timeout = None):
+        """
+        Waits for the background syncs started by receive_block
+
+        :param timeout: (Optional) <float> most seconds to wait for each
+        """
+        with self.__syncs_lock:
+            threads = list(self.__syncs.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    def wait_for_snapshot(self, timeout = None):
+        """
+        Waits for the index snapshot being written in the background, if any
+
+        :param timeout: (Optional) <float> most seconds to wait
+        """
+        self.__snapshots.wait(timeout)
+
+    def close(self):
+        """
+        Shuts the node down: waits for background syncs and the snapshot
+        being written, stops the miner, verifier and validator pools and the
+        peer connections, and closes the store if the chain is stored.
+        """
+        self.wait_for_syncs()
+        self.wait_for_snapshot()
+        self.miner.close()
+        self.peer_client.close()
+        self.verifier.close()
+        self.validator.close()
+        if isinstance(self.chain, ChainStore):
+            self.chain.close()
+
+    def __start_sync(self, peer):
+        """
+        Syncs with a peer in the background, unless a sync with it is
+        already running.
+
+        :param peer: <str> address of the peer
+        """
+        with self.__syncs_lock:
+            if peer in self.__syncs:
+                return
+            thread = self.__syncs[peer] = Thread(target=self.__sync_from,
+                args=(peer,), daemon=True)
+        thread.start()
+
+    def __sync_from(self, peer):
+        try:
+            # A tip reached by syncing is passed on too, or the peers only
+            # linked through this node would never hear of it
+            if self.__resolve_from([peer]):
+                self.announce(self.last_block, exclude=peer)
+        finally:
+            with self.__syncs_lock:
+                del self.__syncs[peer]
+
+    def announce(self, block, exclude = None):
+        """
+        Pushes a block to every peer in the background.
+
+        :param block: <Block> the sealed block
+        :param exclude: (Optional) <str> address of a peer to skip, such as
+        the one that sent us the block
+        """
+        body = {'block': block.dict, 'peer': self.address}
+
+        def send(peer):
+            response = self.peer_client.post(peer, '/blocks/receive',
+                json=body)
+            return response.status_code < 500 or None
+
+        self.peer_client.broadcast(self.peers - {exclude}, send)
+
     def add_transaction(self, sender, receiver, amount, signature):
         """
         Constructs a new transaction to proceed to next mined Block.
@@ -42,16 +227,45 @@ class Blockchain(object):
         :param receiver: <str> address key of the receiver
         :param amount: <int> transaction amount
         :param signature: the private key signature of the sender
-        :return: <index> block index to hold this transaction
+        :return: <index> block index to hold this transaction, or -1 if it
+        is invalid, already pending or does not fit in the mempool
+        """
+        return self.add_transactions([(sender, receiver, amount, signature)])[0]
+
+    def add_transactions(self, transactions):
+        """
+        Constructs many new transactions at once. Their signatures are
+        verified together on the verifier's worker pool.
+
+        :param transactions: <list> (sender, receiver, amount, signature)
+        tuples
+        :return: <list> for each transaction, the block index to hold it or
+        -1, as for add_transaction
         """
-        transaction = Transaction(sender, receiver, amount)
+        pending = []
+        for sender, receiver, amount, signature in transactions:
+            transaction = Transaction(sender, receiver, amount)
+            # Pending duplicates are rejected before any RSA work
+            if transaction.id in self.mempool:
+                pending.append((transaction, None, False))
+            elif sender == constant.MINER_KEY:
+                pending.append((transaction, None, True))
+            else:
+                pending.append((transaction, signature, None))
 
-        if sender == constant.MINER_KEY or transaction.verify_signature(
-            signature):
-            self.current_transactions.append(transaction.dict)
-            return len(self.chain) + 1
+        verified = iter(self.verifier.verify_many([
+            (transaction.dict, signature) 
+            for transaction, signature, valid in pending if valid is None]))
 
-        return -1
+        results = []
+        for transaction, _, valid in pending:
+            if valid is None:
+                valid = next(verified)
+            if valid and self.mempool.add(transaction.dict):
+                results.append(len(self.chain) + 1)
+            else:
+                results.append(-1)
+        return results
 
     def add_peer(self, address):
         """
@@ -62,88 +276,485 @@ class Blockchain(object):
         """
         url = urlparse(address)
         if url.netloc:
-            self.peers.add(url.netloc)
+            if url.netloc not in self.peers:
+                self.peers.add(url.netloc)
+                self.peers_version += 1
             return True
         return False
 
     def resolve(self):
         """
-        Replaces chain with longest one in the network.
+        Replaces chain with longest one in the network. All healthy peers
+        are asked at the same time, so a round takes about as long as the
+        slowest of them. Only headers are exchanged until the common
+        ancestor with a longer chain is found, and only the blocks after it
+        are downloaded.
 
         :return: <bool> true if the current chain is replaced, false if the 
         chain is authoritative
         """
-        result = None
+        return self.__resolve_from(self.peers)
 
-        min_length = len(self.chain)
+    def blocks_from(self, start, limit = None, length = None):
+        """
+        Iterates over the blocks from a given index onwards, one at a time.
+        The range is fixed when this is called, so a response streamed
+        after the lock is released holds the blocks its headers promise.
 
-        for peer in self.peers:
-            response = requests.get(f'http://{peer}/chain')
+        :param start: <int> index of the first block to return
+        :param limit: (Optional) <int> maximum number of blocks to return
+        :param length: (Optional) <int> chain length to stop at, the
+        current one by default
+        :return: <generator> the blocks
+        """
+        stop = len(self.chain) if length is None else length
+        if limit is not None:
+            stop = min(stop, start - 1 + limit)
+        return self.__blocks(max(start - 1, 0), stop)
 
-            if response.status_code == 200:
-                length = response.json()['length']
-                chain = response.json()['chain']
+    def find_block(self, block_hash):
+        """
+        Looks up a block by its hash.
 
-                if length > min_length and self.__is_valid_chain(chain):
-                    min_length = length
-                    result = chain
+        :param block_hash: <str> hash of the block
+        :return: <Block> the block, or None if it is not in the chain
+        """
+        index = self.lookup.block_index(block_hash)
+        if index is None:
+            return None
+        return self.chain[index - 1]
 
-        if result:
-            self.chain = result
-            return True
-        return False
+    def find_transaction(self, transaction_id):
+        """
+        Looks up the blocks holding a transaction.
+
+        :param transaction_id: <str> id of the transaction
+        :return: <list> (block index, offset, transaction) of every
+        occurrence of the transaction
+        """
+        return [self.__located(location) 
+            for location in self.lookup.transaction_locations(transaction_id)]
+
+    def transaction_proof(self, transaction_id, index = None):
+        """
+        Builds the Merkle inclusion proof of a transaction, which together
+        with the block header shows the transaction is in the chain.
+
+        :param transaction_id: <str> id of the transaction
+        :param index: (Optional) <int> index of the block holding it, the
+        first such block by default
+        :return: <dict> the header and proof, or None if the transaction is
+        not in the block or the chain
+        """
+        for block_index, offset in self.lookup.transaction_locations(
+            transaction_id):
+            if index is None or block_index == index:
+                block = self.chain[block_index - 1]
+                return {
+                    'header': block.header,
+                    'offset': offset,
+                    'proof': merkle_proof(block.transaction_ids, offset)
+                }
+        return None
 
-    def proof_of_work(self, prev):
+    def address_transactions(self, address, start = 0, limit = None):
+        """
+        Grabs a page of the transactions an address sends or receives, in
+        chain order.
+
+        :param address: <str> the address
+        :param start: (Optional) <int> position of the first transaction
+        :param limit: (Optional) <int> maximum number of transactions
+        :return: <tuple> list of (block index, offset, transaction) and the
+        total number of transactions of the address
+        """
+        locations, total = self.lookup.address_locations(address, start, 
+            limit)
+        return [self.__located(location) for location in locations], total
+
+    def proof_of_work(self, prev, generation = None):
         """
         Simple proof of work algorithm:
         - given a previous proof x, let x' be the current proof
         - finds a current proof x' such that hash(xx') has 4 trailing zeros
 
+        The search runs on the miner's worker pool and can be cancelled with
+        miner.cancel(), e.g. when a peer's block arrives first.
+
         :param prev: <int> the previous proof
-        :return: <int> the current proof
+        :param generation: (Optional) <int> miner generation read before
+        the search was prepared, see Miner.search
+        :return: <int> the current proof, or None if mining was cancelled
         """
-        nonce = 0
-        while not self.__is_valid_proof(prev, nonce):
-            nonce += 1
-        return nonce
+        return self.miner.search(prev, generation)
+
+    @property
+    def current_transactions(self):
+        return self.mempool.page()
 
     @property
     def last_block(self):
         return self.chain[-1]
 
+    def __resolve_from(self, peers):
+        """
+        Replaces the chain with the longest valid one among the given
+        peers, as in resolve. Only the probe for the fork point runs under
+        the peer round's deadline. The headers and blocks after the fork
+        are then fetched from the longest chain first, each request with
+        its own timeout, so catching up on a long chain is not cut short,
+        and a failed download does not back the peer off.
+
+        :param peers: <iterable> addresses of the peers to ask
+        :return: <bool> true if the current chain is replaced
+        """
+        responses = self.peer_client.map(peers, self.__probe_peer)
+        candidates = sorted(((length, peer, fork, headers)
+            for peer, (length, fork, headers) in responses.items()
+            if length > len(self.chain)), key=lambda c: c[0], reverse=True)
+
+        for length, peer, fork, headers in candidates:
+            try:
+                blocks = self.__fetch_branch(peer, fork, length, headers)
+            except (requests.RequestException, KeyError, TypeError,
+                ValueError):
+                blocks = None
+            if blocks:
+                self.miner.cancel()
+                return self.__replace_chain(blocks)
+        return False
+
+    def __receive(self, block):
+        """
+        Checks a received block against its parent. A block extending our
+        tip is appended, one on a side branch goes to the block tree, and
+        the chain switches to that branch once it is the longest.
+
+        :param block: <Block> the sealed block
+        :return: <str> one of the BLOCK_ outcomes
+        """
+        if (self.__find(block.hash) is not None or
+            block.hash in self.__orphans):
+            return BLOCK_KNOWN
+
+        tip = self.last_block
+        parent = self.__find(block.prev_hash)
+        if parent is None:
+            if block.index <= tip.index:
+                return BLOCK_STALE
+            self.__add_orphan(block)
+            return BLOCK_ORPHAN
+
+        if (block.index != parent.index + 1 or
+            not miner.is_valid_proof(parent.proof, block.proof)):
+            return BLOCK_INVALID
+
+        if parent.hash == tip.hash:
+            self.miner.cancel()
+            self.chain.append(block)
+            self.__apply(block)
+            self.tree.prune(block.index)
+            return BLOCK_ACCEPTED
+
+        self.tree.add(block)
+        if block.index <= tip.index:
+            return BLOCK_STALE
+        if not self.__switch(self.tree.branch(block)):
+            # The branch no longer reaches the chain, so the blocks below
+            # it have to be fetched again
+            self.tree.remove(block.hash)
+            self.__add_orphan(block)
+            return BLOCK_ORPHAN
+        self.miner.cancel()
+        return BLOCK_ACCEPTED
+
+    def __find(self, block_hash):
+        """
+        Looks up a block in the chain or on a side branch.
+        """
+        index = self.lookup.block_index(block_hash)
+        if index is not None:
+            return self.chain[index - 1]
+        return self.tree.get(block_hash)
+
+    def __add_orphan(self, block):
+        """
+        Keeps a block whose parent we do not have yet, dropping expired
+        orphans and the oldest ones past the limit.
+        """
+        now = monotonic()
+        self.__orphans[block.hash] = (block, now)
+        while self.__orphans:
+            _, received = next(iter(self.__orphans.values()))
+            if (len(self.__orphans) <= constant.ORPHAN_LIMIT and
+                now - received < constant.ORPHAN_TTL):
+                break
+            self.__orphans.popitem(last=False)
+
+    def __connect_orphans(self):
+        """
+        Takes in the orphans whose parent is now known, one after the other.
+        """
+        connected = True
+        while connected:
+            connected = False
+            for block_hash, (block, _) in list(self.__orphans.items()):
+                if self.__find(block.prev_hash) is not None:
+                    del self.__orphans[block_hash]
+                    self.__receive(block)
+                    connected = True
+
+    def __probe_peer(self, peer):
+        """
+        Finds where a peer's chain forks from ours by walking back from our
+        tip over its headers, doubling the step each time.
+
+        :param peer: <str> address of the peer
+        :return: <tuple> the peer's chain length, the index of the last
+        block we share and the headers fetched so far, with no fork if the
+        peer is not ahead of us, or None if the peer failed to answer
+        """
+        length = len(self.chain)
+        back = 1
+        while True:
+            start = max(1, length - back + 1)
+            body = self.__get_json(peer, '/headers', start=start)
+            if body is None:
+                return None
+            if body['length'] <= length:
+                # The peer is fine, just not ahead of us
+                return body['length'], None, []
+            headers = body['headers']
+            if not headers:
+                return None
+            if headers[0]['hash'] == self.chain[start - 1].hash or start == 1:
+                break
+            back *= 2
+
+        fork = start - 1
+        for header in headers:
+            index = header['index']
+            if index > length or header['hash'] != self.chain[index - 1].hash:
+                break
+            fork = index
+        return body['length'], fork, headers
+
+    def __fetch_branch(self, peer, fork, length, headers):
+        """
+        Validates a peer's headers after the fork and downloads only those
+        blocks.
+
+        :param peer: <str> address of the peer
+        :param fork: <int> index of the last block we share with the peer
+        :param length: <int> the peer's chain length
+        :param headers: <list> headers already fetched by the probe
+        :return: <list> the peer's sealed blocks after the fork, or None if
+        the peer failed to answer or sent an invalid chain
+        """
+        if fork > len(self.chain):
+            return None
+        headers = self.__get_headers(peer, fork + 1, length, headers)
+        anchor = [self.chain[fork - 1].header] if fork else []
+        if headers is None or not self.validator.validate(anchor + headers):
+            return None
+
+        blocks = self.__get_blocks(peer, headers)
+        if blocks is None:
+            return None
+        self.validator.remember(headers)
+        return blocks
+
+    def __get_headers(self, peer, start, length, headers):
+        """
+        Pages through a peer's headers until its tip.
+
+        :param peer: <str> address of the peer
+        :param start: <int> index of the first header wanted
+        :param length: <int> the peer's chain length
+        :param headers: <list> headers already fetched from start on
+        :return: <list> the headers from start to the tip, or None
+        """
+        headers = [header for header in headers if header['index'] >= start]
+        while len(headers) < length - start + 1:
+            body = self.__get_json(peer, '/headers',
+                start=start + len(headers))
+            if body is None or not body['headers']:
+                return None
+            headers.extend(body['headers'])
+        return headers
+
+    def __get_blocks(self, peer, headers):
+        """
+        Streams the blocks for the given headers from a peer and checks each
+        block hashes to its header as it arrives.
+
+        :param peer: <str> address of the peer
+        :param headers: <list> validated headers of the wanted blocks
+        :return: <list> the sealed blocks, or None if the peer's blocks do
+        not match its headers
+        """
+        blocks = []
+        while len(blocks) < len(headers):
+            response = self.peer_client.get(peer, '/chain',
+                params={'start': headers[len(blocks)]['index']},
+                headers={'Accept': constant.CHAIN_ACCEPT},
+                stream=True)
+            with response:
+                if response.status_code != 200:
+                    return None
+
+                received = len(blocks)
+                for block in self.__read_blocks(response):
+                    if len(blocks) == len(headers):
+                        break
+                    block.seal()
+                    if block.hash != headers[len(blocks)]['hash']:
+                        return None
+                    blocks.append(block)
+                if len(blocks) == received:
+                    return None
+        return blocks
+
     @staticmethod
-    def __is_valid_chain(chain):
+    def __read_blocks(response):
+        """
+        Reads blocks off a /chain response one by one, in whichever format
+        the peer picked: the binary encoding, NDJSON, or for older peers a
+        single json document.
+
+        :param response: <Response> the streamed /chain response
+        :return: <generator> the unsealed blocks
         """
-        Determines a given blockchain is valid
+        content_type = response.headers.get('Content-Type', '')
+        if content_type.startswith(constant.BINARY):
+            yield from codec.iter_records(response.iter_content(
+                constant.STREAM_CHUNK_SIZE))
+        elif content_type.startswith(constant.NDJSON):
+            for line in response.iter_lines():
+                if line:
+                    yield Block.from_dict(json.loads(line))
+        else:
+            for blk in response.json()['chain']:
+                yield Block.from_dict(blk)
 
-        :param chain: <list> a blockchain
-        :return: <bool> true if valid, false otherwise
+    def __get_json(self, peer, path, **params):
         """
-        block_ptr = chain[0]
-        current_index = 1
-        while current_index < len(chain):
-            curr_block = chain[current_index]
+        Sends a GET request to a peer and parses its json response. The
+        request is conditional on the ETag of the peer's last answer to it,
+        so an unchanged answer is neither sent again nor parsed.
+
+        :param peer: <str> address of the peer
+        :param path: <str> path to request
+        :return: <dict> the response body, or None if the request failed
+        """
+        key = (peer, path, tuple(sorted(params.items())))
+        with self.__etags_lock:
+            cached = self.__etags.get(key)
+
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        response = self.peer_client.get(peer, path, params=params,
+            headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        if response.status_code != 200:
+            return None
+
+        body = response.json()
+        etag = response.headers.get('ETag')
+        if etag:
+            with self.__etags_lock:
+                self.__etags[key] = (etag, body)
+                self.__etags.move_to_end(key)
+                while len(self.__etags) > constant.PEER_ETAGS:
+                    self.__etags.popitem(last=False)
+        return body
 
-            if curr_block.prev_hash != block_ptr.hash:
+    def __replace_chain(self, blocks):
+        """
+        Replaces every block after the fork point with the given blocks, so
+        that a persisted chain only rewrites what changed.
+
+        :param blocks: <list> the new sealed blocks after the fork
+        :return: <bool> true if replaced, false if our chain changed in the
+        meantime so that the blocks no longer make it longer
+        """
+        with self.lock:
+            if blocks[0].index - 1 + len(blocks) <= len(self.chain):
                 return False
-            
-            if __is_valid_proof(block_ptr.proof, curr_block.proof):
+            if not self.__switch(blocks):
                 return False
+            self.__connect_orphans()
+        return True
+
+    def __switch(self, blocks):
+        """
+        Reorganizes the chain onto the given blocks by undoing and replaying
+        only the blocks after the fork, so a reorganization costs the depth
+        of the fork. The blocks switched away from are kept in the tree.
+
+        :param blocks: <list> the new sealed blocks after the fork
+        :return: <bool> true if switched, false if the first block does not
+        follow our block at the fork
+        """
+        fork = blocks[0].index - 1
+        if fork > len(self.chain) or (fork and
+            self.chain[fork - 1].hash != blocks[0].prev_hash):
+            return False
 
-            block_ptr = curr_block
-            current_index += 1
+        for i in range(len(self.chain) - 1, fork - 1, -1):
+            block = self.chain[i]
+            self.__revert(block)
+            if not isinstance(block, Block):
+                block = Block.from_dict(block.dict).seal()
+            self.tree.add(block)
+
+        del self.chain[fork:]
+        for block in blocks:
+            self.tree.remove(block.hash)
+            self.chain.append(block)
+            self.__apply(block)
+        self.tree.prune(len(self.chain))
         return True
 
-    @staticmethod
-    def __is_valid_proof(prev, nonce):
+    def __blocks(self, first, stop):
+        for i in range(first, stop):
+            # The chain may have been cut by a reorganization meanwhile
+            if i >= len(self.chain):
+                return
+            yield self.chain[i]
+
+    def __located(self, location):
+        index, offset = location
+        return index, offset, dict(self.chain[index - 1].transactions[offset])
+
+    def __restore_indexes(self):
         """
-        Validates a proof by checking if the hash of the previous and the 
-        current contain 4 trailing zeros
+        Loads the indexes saved next to the store, if they were saved for a
+        block still in the chain.
 
-        :param prev: <int> previous proof
-        :param nonce: <int> current proof
-        :return: <bool> True if correct, false otherwise
+        :return: <int> number of blocks the loaded indexes cover
         """
-        guess = f'{prev}{nonce}'.encode()
-        hash_guess = hashlib.sha256(guess).hexdigest()
-        return hash_guess[-4:] == '0000'
\ No newline at end of file
+        if self.snapshot_path is None:
+            return 0
+        snapshot = load_snapshot(self.snapshot_path)
+        if (snapshot is None or not 0 < snapshot['height'] <= len(self.chain)
+            or self.chain[snapshot['height'] - 1].hash != snapshot['hash']):
+            return 0
+
+        self.balances.balances = snapshot['balances']
+        self.lookup.blocks = snapshot['blocks']
+        self.lookup.transactions = snapshot['transactions']
+        self.lookup.addresses = snapshot['addresses']
+        return snapshot['height']
+
+    def __apply(self, block):
+        for index in self.indexes:
+            index.apply(block)
+        if (self.snapshot_path is not None and
+            block.index % self.snapshot_interval == 0):
+            self.__snapshots.save(snapshot_state(block.index, block.hash,
+                self.balances, self.lookup))
+
+    def __revert(self, block):
+        for index in self.indexes:
+            index.revert(block)
\ No newline at end of file
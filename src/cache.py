@@ -0,0 +1,81 @@
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+def make_etag(*key):
+    """
+    Creates an entity tag from everything a response depends on
+
+    :return: <str> the tag, without quotes
+    """
+    return hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+
+class ResponseCache(object):
+    """
+    Encoded responses kept in memory by entity tag, so an unchanged
+    response is neither rebuilt nor re-serialized. Tags are derived from
+    the chain tip or the peer set, so a change simply stops a tag from
+    being asked for and its entry ages out. The least recently used
+    entries are evicted past max_bytes, and bodies larger than
+    max_entry_bytes are not kept at all.
+    """
+    def __init__(self, max_bytes, max_entry_bytes):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.size = 0
+
+        self.__entries = OrderedDict()
+        self.__lock = Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, etag):
+        """
+        Grabs a cached response
+
+        :param etag: <str> the entity tag
+        :return: <tuple> the body, mimetype and headers, or None on a miss
+        """
+        with self.__lock:
+            entry = self.__entries.get(etag)
+            if entry is not None:
+                self.__entries.move_to_end(etag)
+            return entry
+
+    def put(self, etag, body, mimetype, headers = None):
+        if len(body) > self.max_entry_bytes:
+            return
+
+        with self.__lock:
+            if etag in self.__entries:
+                return
+            self.__entries[etag] = (body, mimetype, headers or {})
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _, _) = self.__entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def tee(self, etag, chunks, mimetype, headers = None, current = None):
+        """
+        Passes the chunks of a streamed body through while keeping a copy,
+        which is cached once the stream completes within max_entry_bytes.
+
+        :param etag: <str> the entity tag
+        :param chunks: <iterable> <bytes> the body
+        :param current: (Optional) <callable> asked once the stream
+        completes whether the tag still describes what was streamed; the
+        copy is dropped if not
+        :return: <generator> the same chunks
+        """
+        kept = []
+        size = 0
+        for chunk in chunks:
+            yield chunk
+            if kept is not None:
+                size += len(chunk)
+                kept.append(chunk)
+                if size > self.max_entry_bytes:
+                    kept = None
+        if kept is not None and (current is None or current()):
+            self.put(etag, b''.join(kept), mimetype, headers)
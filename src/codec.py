@@ -0,0 +1,331 @@
+import json
+import struct
+
+from block import Block
+
+# Compact binary encoding of blocks and transactions, used on the wire and
+# in the chain store.
+#
+#   block       := version:u8 index:u64 timestamp:value proof:value
+#                  prev_hash:value table count:u32 transaction*
+#   table       := hexes:u32 size:u32{hexes} raw_bytes values:u32 value*
+#   transaction := sender:u32 receiver:u32 kind:u8 amount:i64
+#   value       := tag:u8 payload
+#
+# The distinct senders and receivers of a block are written once, in a
+# table, and transactions are fixed-width records pointing into it, so a
+# whole block of transactions unpacks in one pass. The table holds the hex
+# strings, such as DER keys and hashes, first and back to back as raw
+# bytes, so they are turned back into hex with a single call, followed by
+# the other values. An amount is held in the record itself when it is a
+# 64-bit int or a float, and points into the table otherwise.
+#
+# Values keep their json type exactly, so a decoded block serializes, and so
+# hashes, the same as the original. Version 1 blocks, which spelled out
+# every value of every transaction, are still decoded.
+VERSION = 2
+
+RECORD_LENGTH = struct.Struct('>I')
+BLOCK_HEAD = struct.Struct('>BQ')
+COUNT = struct.Struct('>I')
+INT = struct.Struct('>q')
+FLOAT = struct.Struct('>d')
+TRANSACTION = struct.Struct('>IIBq')
+
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_STR = 5
+TAG_HEX = 6
+TAG_JSON = 7
+
+# How a transaction record holds its amount
+AMOUNT_INT = 0
+AMOUNT_FLOAT = 1
+AMOUNT_VALUE = 2
+
+INT_MIN = -2 ** 63
+INT_MAX = 2 ** 63 - 1
+
+def encode_block(block):
+    """
+    Encodes a block in the binary format
+
+    :param block: <Block> the block
+    :return: <bytes> the encoded block
+    """
+    parts = [BLOCK_HEAD.pack(VERSION, block.index)]
+    for value in (block.timestamp, block.proof, block.prev_hash):
+        parts.append(_encode_value(value))
+
+    # Hex strings, and the encoding of other values, to their position in
+    # their part of the table
+    hexes = {}
+    values = {}
+    keys = {}
+    def intern(value):
+        key = keys.get(value) if type(value) is str else None
+        if key is None:
+            if type(value) is str and _is_hex(value):
+                key = (hexes, value)
+            else:
+                key = (values, _encode_value(value))
+            if type(value) is str:
+                keys[value] = key
+        table, item = key
+        table.setdefault(item, len(table))
+        return key
+
+    rows = []
+    for transaction in block.transactions:
+        amount = transaction['amount']
+        if type(amount) is int and INT_MIN <= amount <= INT_MAX:
+            kind = AMOUNT_INT
+        elif type(amount) is float:
+            kind, amount = AMOUNT_FLOAT, INT.unpack(FLOAT.pack(amount))[0]
+        else:
+            kind, amount = AMOUNT_VALUE, intern(amount)
+        rows.append((intern(transaction['sender']),
+            intern(transaction['receiver']), kind, amount))
+
+    # Ids are only final once both parts of the table are known
+    def position(key):
+        table, item = key
+        if table is hexes:
+            return hexes[item]
+        return len(hexes) + values[item]
+
+    raw = [bytes.fromhex(value) for value in hexes]
+    parts.append(COUNT.pack(len(raw)))
+    parts.append(struct.pack(f'>{len(raw)}I', *map(len, raw)))
+    parts.extend(raw)
+    parts.append(COUNT.pack(len(values)))
+    parts.extend(values)
+
+    parts.append(COUNT.pack(len(rows)))
+    for sender, receiver, kind, amount in rows:
+        if kind == AMOUNT_VALUE:
+            amount = position(amount)
+        parts.append(TRANSACTION.pack(position(sender), position(receiver),
+            kind, amount))
+    return b''.join(parts)
+
+def decode_block(data):
+    """
+    Decodes a block from the binary format
+
+    :param data: <bytes> the encoded block
+    :return: <Block> the unsealed block
+    """
+    data = memoryview(data)
+    version, index = _unpack(BLOCK_HEAD, data, 0)
+    if version != VERSION and version != 1:
+        raise ValueError(f'Unsupported block encoding version {version}')
+
+    offset = BLOCK_HEAD.size
+    timestamp, offset = _decode_value(data, offset)
+    proof, offset = _decode_value(data, offset)
+    prev_hash, offset = _decode_value(data, offset)
+
+    if version == 1:
+        transactions = _decode_transactions_v1(data, offset)
+    else:
+        transactions = _decode_transactions(data, offset)
+    return Block(index, transactions, proof, prev_hash, timestamp)
+
+def _decode_transactions(data, offset):
+    values, offset = _decode_table(data, offset)
+
+    count, = _unpack(COUNT, data, offset)
+    offset += COUNT.size
+    end = offset + count * TRANSACTION.size
+    if end > len(data):
+        raise ValueError('Truncated transactions')
+
+    try:
+        return [{
+            'sender': values[sender],
+            'receiver': values[receiver],
+            'amount': amount if kind == AMOUNT_INT else
+                _decode_amount(values, kind, amount)
+        } for sender, receiver, kind, amount in TRANSACTION.iter_unpack(
+            data[offset:end])]
+    except IndexError:
+        raise ValueError('Unknown value in transaction')
+
+def _decode_amount(values, kind, amount):
+    if kind == AMOUNT_VALUE:
+        # The id is signed, and values[-1] would quietly pick the last value
+        if not 0 <= amount < len(values):
+            raise ValueError('Unknown value in transaction')
+        return values[amount]
+    if kind == AMOUNT_FLOAT:
+        return FLOAT.unpack(INT.pack(amount))[0]
+    raise ValueError(f'Unknown amount kind {kind}')
+
+def _decode_table(data, offset):
+    """
+    Decodes the table of values a block's transactions point into
+
+    :return: <tuple> the values, and the offset after the table
+    """
+    count, = _unpack(COUNT, data, offset)
+    offset += COUNT.size
+    if offset + count * COUNT.size > len(data):
+        raise ValueError('Truncated table')
+    sizes = struct.unpack_from(f'>{count}I', data, offset)
+    offset += count * COUNT.size
+    end = offset + sum(sizes)
+    if end > len(data):
+        raise ValueError('Truncated value')
+
+    values = []
+    text = data[offset:end].hex()
+    position = 0
+    for size in sizes:
+        values.append(text[position:position + 2 * size])
+        position += 2 * size
+    offset = end
+
+    count, = _unpack(COUNT, data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        value, offset = _decode_value(data, offset)
+        values.append(value)
+    return values, offset
+
+def _decode_transactions_v1(data, offset):
+    count, = _unpack(COUNT, data, offset)
+    offset += COUNT.size
+    strings = {}
+    transactions = []
+    for _ in range(count):
+        sender, offset = _decode_value(data, offset, strings)
+        receiver, offset = _decode_value(data, offset, strings)
+        amount, offset = _decode_value(data, offset, strings)
+        transactions.append({
+            'sender': sender,
+            'receiver': receiver,
+            'amount': amount
+        })
+    return transactions
+
+def encode_record(block):
+    """
+    Encodes a block prefixed by its length, for streams of blocks
+
+    :param block: <Block> the block
+    :return: <bytes> the length-prefixed block
+    """
+    data = encode_block(block)
+    return RECORD_LENGTH.pack(len(data)) + data
+
+def iter_records(chunks):
+    """
+    Splits a stream of length-prefixed records back into blocks.
+
+    :param chunks: <iterable> <bytes> chunks of the stream, of any size
+    :return: <generator> the unsealed blocks
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        offset = 0
+        while len(buffer) - offset >= RECORD_LENGTH.size:
+            size, = RECORD_LENGTH.unpack_from(buffer, offset)
+            end = offset + RECORD_LENGTH.size + size
+            if end > len(buffer):
+                break
+            yield decode_block(bytes(buffer[offset + RECORD_LENGTH.size:end]))
+            offset = end
+        del buffer[:offset]
+
+    if buffer:
+        raise ValueError('Truncated block stream')
+
+def _encode_value(value):
+    if value is None:
+        return bytes((TAG_NONE,))
+    if value is True or value is False:
+        return bytes((TAG_TRUE if value else TAG_FALSE,))
+    if type(value) is int and INT_MIN <= value <= INT_MAX:
+        return bytes((TAG_INT,)) + INT.pack(value)
+    if type(value) is float:
+        return bytes((TAG_FLOAT,)) + FLOAT.pack(value)
+
+    if type(value) is str:
+        if _is_hex(value):
+            tag, raw = TAG_HEX, bytes.fromhex(value)
+        else:
+            tag, raw = TAG_STR, value.encode()
+    else:
+        tag, raw = TAG_JSON, json.dumps(value, sort_keys=True).encode()
+    return bytes((tag,)) + COUNT.pack(len(raw)) + raw
+
+def _decode_value(data, offset, strings = None):
+    if offset >= len(data):
+        raise ValueError('Truncated value')
+    tag = data[offset]
+    offset += 1
+    if tag == TAG_NONE:
+        return None, offset
+    if tag == TAG_FALSE or tag == TAG_TRUE:
+        return tag == TAG_TRUE, offset
+    if tag == TAG_INT:
+        return _unpack(INT, data, offset)[0], offset + INT.size
+    if tag == TAG_FLOAT:
+        return _unpack(FLOAT, data, offset)[0], offset + FLOAT.size
+
+    size, = _unpack(COUNT, data, offset)
+    start = offset + COUNT.size
+    end = start + size
+    if end > len(data):
+        raise ValueError('Truncated value')
+    raw = data[start:end]
+
+    # Repeated keys decode to the same string object once
+    if strings is not None and (tag == TAG_HEX or tag == TAG_STR):
+        key = raw.tobytes()
+        value = strings.get(key)
+        if value is None or value[0] != tag:
+            value = strings[key] = (tag, _decode_string(tag, key))
+        return value[1], end
+
+    if tag == TAG_HEX or tag == TAG_STR:
+        return _decode_string(tag, raw), end
+    if tag == TAG_JSON:
+        return json.loads(str(raw, 'utf8')), end
+    raise ValueError(f'Unknown value tag {tag}')
+
+def _unpack(layout, data, offset):
+    """
+    Unpacks a fixed-size field, checking first that the data holds it, so
+    truncated input raises ValueError rather than struct.error.
+
+    :param layout: <Struct> the field layout
+    :param data: <memoryview> the encoded data
+    :param offset: <int> where the field starts
+    :return: <tuple> the unpacked values
+    """
+    if offset + layout.size > len(data):
+        raise ValueError('Truncated block')
+    return layout.unpack_from(data, offset)
+
+def _decode_string(tag, raw):
+    if tag == TAG_HEX:
+        return raw.hex()
+    return str(raw, 'utf8')
+
+def _is_hex(value):
+    """
+    Checks a string is lowercase hex of whole bytes, so it survives the
+    round trip through raw bytes unchanged.
+    """
+    if not value or len(value) % 2:
+        return False
+    try:
+        return bytes.fromhex(value).hex() == value
+    except ValueError:
+        return False
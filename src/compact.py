@@ -0,0 +1,390 @@
+import json
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from threading import Lock
+
+import constant
+from transaction import Transaction
+
+# Blocks that fit the columns are packed into typed arrays: proofs and
+# timestamps side by side, hashes, previous hashes and Merkle roots as
+# 32-byte fields, and transactions as ids into a table shared by the whole
+# chain. Blocks that do not fit, such as the genesis block whose previous
+# hash is 1, are kept whole.
+HASH_SIZE = 32
+PROOF_MAX = 2 ** 64 - 1
+
+class CompactChain(object):
+    """
+    In-memory chain of sealed blocks stored column by column instead of as
+    one object per block. It behaves like the list the Blockchain used:
+    len(), indexing, iteration, append and truncation through del chain[n:].
+    Reading a block returns a BlockView, which has the same API as a sealed
+    Block.
+
+    The canonical serialization of packed blocks is kept once built, up to
+    serialized_bytes of them, so streaming the chain again does not
+    serialize every block again.
+    """
+    def __init__(self, serialized_bytes = None):
+        self.__timestamps = array('d')
+        self.__proofs = array('Q')
+        self.__hashes = bytearray()
+        self.__prev_hashes = bytearray()
+        self.__roots = bytearray()
+        self.__offsets = array('Q', [0])
+        self.__transaction_ids = array('L')
+
+        self.__whole = {}
+
+        self.__table = []
+        self.__table_ids = {}
+        self.__table_counts = array('L')
+        self.__free_ids = []
+        self.__strings = {}
+        self.__string_counts = {}
+
+        self.serialized_bytes = (serialized_bytes or
+            constant.COMPACT_SERIALIZED_BYTES)
+        self.__serialized = OrderedDict()
+        self.__serialized_size = 0
+        self.__serialized_lock = Lock()
+        self.__generation = 0
+
+    def __len__(self):
+        return len(self.__proofs)
+
+    @property
+    def table_size(self):
+        """
+        Number of distinct transactions held in the shared table.
+        """
+        return len(self.__table_ids)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(len(self)))]
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('chain index out of range')
+
+        if key in self.__whole:
+            return self.__whole[key]
+        return BlockView(self, key)
+
+    def __delitem__(self, key):
+        if not isinstance(key, slice) or key.step or key.stop is not None:
+            raise TypeError('only del chain[n:] is supported')
+        self.truncate(key.indices(len(self))[0])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, block):
+        """
+        Appends a sealed block, packing it into the columns if it fits.
+
+        :param block: <Block> the sealed block to store
+        """
+        position = len(self)
+        rows = _rows(block.transactions)
+        packed = (rows is not None and
+            block.index == position + 1 and
+            type(block.timestamp) is float and
+            type(block.proof) is int and 0 <= block.proof <= PROOF_MAX and
+            _is_hash(block.prev_hash))
+
+        if packed:
+            self.__timestamps.append(block.timestamp)
+            self.__proofs.append(block.proof)
+            self.__prev_hashes += bytes.fromhex(block.prev_hash)
+            self.__transaction_ids.extend(self.__intern_rows(rows))
+        else:
+            self.__whole[position] = block
+            self.__timestamps.append(0)
+            self.__proofs.append(0)
+            self.__prev_hashes += bytes(HASH_SIZE)
+
+        self.__hashes += bytes.fromhex(block.hash)
+        self.__roots += bytes.fromhex(block.merkle_root)
+        self.__offsets.append(len(self.__transaction_ids))
+
+    def truncate(self, length):
+        """
+        Drops every block from position length onwards, along with the
+        transactions and strings no kept block refers to any more.
+
+        :param length: <int> number of blocks to keep
+        """
+        if length >= len(self):
+            return
+
+        with self.__serialized_lock:
+            self.__generation += 1
+            for position in [p for p in self.__serialized if p >= length]:
+                self.__serialized_size -= len(self.__serialized.pop(position))
+
+        for transaction_id in self.__transaction_ids[
+                self.__offsets[length]:]:
+            self.__release(transaction_id)
+        del self.__transaction_ids[self.__offsets[length]:]
+        del self.__offsets[length + 1:]
+        del self.__timestamps[length:]
+        del self.__proofs[length:]
+        del self.__hashes[length * HASH_SIZE:]
+        del self.__prev_hashes[length * HASH_SIZE:]
+        del self.__roots[length * HASH_SIZE:]
+        for position in [p for p in self.__whole if p >= length]:
+            del self.__whole[position]
+
+    def _timestamp(self, position):
+        return self.__timestamps[position]
+
+    def _proof(self, position):
+        return self.__proofs[position]
+
+    def _hash(self, position):
+        start = position * HASH_SIZE
+        return self.__hashes[start:start + HASH_SIZE].hex()
+
+    def _prev_hash(self, position):
+        start = position * HASH_SIZE
+        return self.__prev_hashes[start:start + HASH_SIZE].hex()
+
+    def _merkle_root(self, position):
+        start = position * HASH_SIZE
+        return self.__roots[start:start + HASH_SIZE].hex()
+
+    def _serialized(self, position):
+        """
+        Grabs the canonical json serialization of a packed block, building
+        it on first access.
+
+        :param position: <int> position of the block
+        :return: <bytes> the serialized block
+        """
+        with self.__serialized_lock:
+            data = self.__serialized.get(position)
+            generation = self.__generation
+        if data is not None:
+            return data
+
+        data = json.dumps(BlockView(self, position).dict,
+            sort_keys=True).encode()
+        with self.__serialized_lock:
+            # A block built while the chain was cut may be gone already
+            if generation == self.__generation and position < len(self):
+                if position not in self.__serialized:
+                    self.__serialized[position] = data
+                    self.__serialized_size += len(data)
+                while self.__serialized_size > self.serialized_bytes:
+                    _, dropped = self.__serialized.popitem(last=False)
+                    self.__serialized_size -= len(dropped)
+        return data
+
+    def _transaction_count(self, position):
+        return self.__offsets[position + 1] - self.__offsets[position]
+
+    def _transaction(self, position, offset):
+        transaction_id = self.__transaction_ids[
+            self.__offsets[position] + offset]
+        sender, receiver, amount = self.__table[transaction_id]
+        return {'sender': sender, 'receiver': receiver, 'amount': amount}
+
+    def __intern_rows(self, rows):
+        """
+        Grabs the table ids of a packed block's transactions, adding the
+        ones that are new. Keys and other strings are shared across the
+        table too. Every row counts the blocks referring to it, so
+        truncation can free it.
+
+        :param rows: <list> the (sender, receiver, amount) rows
+        :return: <list> the table ids
+        """
+        transaction_ids = []
+        for row in rows:
+            transaction_id = self.__table_ids.get(row)
+            if transaction_id is None:
+                row = tuple(self.__intern(value) for value in row)
+                if self.__free_ids:
+                    transaction_id = self.__free_ids.pop()
+                    self.__table[transaction_id] = row
+                    self.__table_counts[transaction_id] = 0
+                else:
+                    transaction_id = len(self.__table)
+                    self.__table.append(row)
+                    self.__table_counts.append(0)
+                self.__table_ids[row] = transaction_id
+            self.__table_counts[transaction_id] += 1
+            transaction_ids.append(transaction_id)
+        return transaction_ids
+
+    def __release(self, transaction_id):
+        """
+        Drops one reference to a table row, freeing the row and its strings
+        once no block refers to it.
+
+        :param transaction_id: <int> id of the row
+        """
+        self.__table_counts[transaction_id] -= 1
+        if self.__table_counts[transaction_id]:
+            return
+
+        row = self.__table[transaction_id]
+        del self.__table_ids[row]
+        self.__table[transaction_id] = None
+        self.__free_ids.append(transaction_id)
+        for value in row:
+            if type(value) is str:
+                self.__string_counts[value] -= 1
+                if not self.__string_counts[value]:
+                    del self.__string_counts[value]
+                    del self.__strings[value]
+
+    def __intern(self, value):
+        if type(value) is not str:
+            return value
+        self.__string_counts[value] = self.__string_counts.get(value, 0) + 1
+        return self.__strings.setdefault(value, value)
+
+class BlockView(object):
+    """
+    Lightweight, read-only view of a block packed in a CompactChain, with
+    the same API as a sealed Block.
+    """
+    __slots__ = ('__chain', '__position')
+
+    def __init__(self, chain, position):
+        self.__chain = chain
+        self.__position = position
+
+    def __eq__(self, other):
+        return isinstance(other, BlockView) and self.hash == other.hash
+
+    def __hash__(self):
+        return hash(self.hash)
+
+    @property
+    def index(self):
+        return self.__position + 1
+
+    @property
+    def timestamp(self):
+        return self.__chain._timestamp(self.__position)
+
+    @property
+    def proof(self):
+        return self.__chain._proof(self.__position)
+
+    @property
+    def prev_hash(self):
+        return self.__chain._prev_hash(self.__position)
+
+    @property
+    def transactions(self):
+        return _Transactions(self.__chain, self.__position)
+
+    @property
+    def merkle_root(self):
+        return self.__chain._merkle_root(self.__position)
+
+    @property
+    def transaction_ids(self):
+        return [Transaction.from_dict(tx).id for tx in self.transactions]
+
+    @property
+    def sealed(self):
+        return True
+
+    def seal(self):
+        return self
+
+    @property
+    def hash(self):
+        return self.__chain._hash(self.__position)
+
+    @property
+    def serialized(self):
+        return self.__chain._serialized(self.__position)
+
+    @property
+    def header(self):
+        return {
+            'index': self.index,
+            'hash': self.hash,
+            'timestamp': self.timestamp,
+            'prev_hash': self.prev_hash,
+            'proof': self.proof,
+            'merkle_root': self.merkle_root
+        }
+
+    @property
+    def dict(self):
+        return {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'transactions': list(self.transactions),
+            'proof': self.proof,
+            'prev_hash': self.prev_hash
+        }
+
+class _Transactions(Sequence):
+    """
+    The transactions of a packed block, built from the shared table only
+    when they are read.
+    """
+    __slots__ = ('__chain', '__position')
+
+    def __init__(self, chain, position):
+        self.__chain = chain
+        self.__position = position
+
+    def __len__(self):
+        return self.__chain._transaction_count(self.__position)
+
+    def __getitem__(self, offset):
+        if isinstance(offset, slice):
+            return [self[i] for i in range(*offset.indices(len(self)))]
+        if offset < 0:
+            offset += len(self)
+        if not 0 <= offset < len(self):
+            raise IndexError('transaction index out of range')
+        return self.__chain._transaction(self.__position, offset)
+
+def _rows(transactions):
+    """
+    Turns a block's transactions into table rows, without touching the
+    table, so a block that does not pack leaves it as it was.
+
+    :param transactions: <iterable> the transaction dicts
+    :return: <list> the (sender, receiver, amount) rows, or None if a
+    transaction does not fit the table
+    """
+    rows = []
+    for transaction in transactions:
+        if len(transaction) != 3:
+            return None
+        try:
+            row = tuple(transaction[key]
+                for key in ('sender', 'receiver', 'amount'))
+            hash(row)
+        except (KeyError, TypeError):
+            return None
+        rows.append(row)
+    return rows
+
+def _is_hash(value):
+    """
+    Checks a value is a lowercase hex SHA-256 hash, which packs into 32
+    bytes and unpacks to the same string.
+    """
+    if type(value) is not str or len(value) != 2 * HASH_SIZE:
+        return False
+    try:
+        return bytes.fromhex(value).hex() == value
+    except ValueError:
+        return False
@@ -1,2 +1,89 @@
 MINER_KEY = "BLOCKCHAIN MINER"
-MINER_REWARD = 1
\ No newline at end of file
+MINER_REWARD = 1
+
+# Trailing zero hex digits a proof hash needs
+PROOF_DIFFICULTY = 4
+
+# Mining, see miner.py. None uses every core on the host.
+MINER_WORKERS = None
+MINER_CHUNK_SIZE = 20000
+MINER_CHECK_INTERVAL = 1024
+
+# Finished mining jobs kept for status requests, see jobs.py
+MINING_JOB_HISTORY = 100
+
+# Most seconds /mine waits for its job to finish when asked to
+MAX_MINE_WAIT = 60
+
+# Peer requests, see peer.py. Timeouts and backoff are in seconds.
+PEER_WORKERS = 16
+PEER_TIMEOUT = (3.05, 10)
+PEER_DEADLINE = 30
+PEER_BACKOFF = 1
+PEER_BACKOFF_MAX = 300
+
+# Most headers served by a single /headers request
+MAX_HEADERS = 2000
+
+# Blocks announced by peers before their parent, kept until it arrives
+ORPHAN_LIMIT = 256
+ORPHAN_TTL = 120
+
+# A stored chain saves its balance and lookup indexes every so many
+# blocks, so a restart only replays the blocks after the last snapshot
+INDEX_SNAPSHOT_INTERVAL = 256
+
+# Serialized blocks of the in-memory chain kept for streaming, in bytes,
+# see compact.py
+COMPACT_SERIALIZED_BYTES = 64 * 1024 * 1024
+
+# Side branches kept for reorganizations, in blocks below the tip
+FORK_DEPTH = 100
+
+# Content types of streamed /chain responses: one json block per line, or
+# length-prefixed binary blocks (see codec.py). Peers ask for binary first,
+# as it is both smaller and faster to decode (see the decode_ benchmarks).
+NDJSON = 'application/x-ndjson'
+BINARY = 'application/x-doubloon-block'
+CHAIN_ACCEPT = f'{BINARY}, {NDJSON};q=0.9, application/json;q=0.5'
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Encoded responses cached by ETag, and ETags remembered for peers
+RESPONSE_CACHE_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_ENTRY_BYTES = 8 * 1024 * 1024
+PEER_ETAGS = 1024
+
+# Sampling profiler, see profiler.py
+PROFILER_INTERVAL = 0.01
+PROFILER_MAX_STACKS = 10000
+
+# Most items served by a single page of a paged endpoint
+MAX_PAGE_SIZE = 1000
+
+# Mempool limits, see mempool.py, and the most transactions in one block
+MEMPOOL_MAX_COUNT = 50000
+MEMPOOL_MAX_BYTES = 64 * 1024 * 1024
+MAX_BLOCK_TRANSACTIONS = 5000
+
+# Signature checks, see verifier.py. None uses every core on the host.
+VERIFIER_WORKERS = None
+VERIFIER_CHUNK_SIZE = 64
+MAX_BATCH_TRANSACTIONS = 10000
+
+# Parsed RSA keys and signature verification results kept in memory
+KEY_CACHE_SIZE = 1024
+VERIFICATION_CACHE_SIZE = 100000
+
+# Chain validation, see validator.py. None uses every core on the host.
+VALIDATOR_WORKERS = None
+VALIDATOR_CHUNK_SIZE = 10000
+VALIDATOR_CHECKPOINTS = 4096
+
+# RSA keys generated ahead of time for new wallets, see keypool.py. A bulk
+# request can never take more keys than the pool holds, and one the pool
+# cannot cover yet is told to come back after KEY_POOL_RETRY_AFTER seconds.
+KEY_POOL_SIZE = 64
+KEY_POOL_WORKERS = 2
+KEY_POOL_RETRY_AFTER = 1
+KEY_POOL_NICENESS = 10
+MAX_BULK_WALLETS = 64
@@ -0,0 +1,274 @@
+import json
+import os
+from numbers import Number
+from threading import Lock, Thread
+
+import constant
+from transaction import Transaction
+
+def snapshot_state(height, block_hash, balances, lookup):
+    """
+    Copies the indexes as of a block, so they can be written out while the
+    chain moves on. Only the dicts and location lists are copied; the keys
+    and locations themselves are never changed in place.
+
+    :param height: <int> index of the last block the indexes cover
+    :param block_hash: <str> hash of that block
+    :param balances: <BalanceIndex> the balances
+    :param lookup: <LookupIndex> the lookup maps
+    :return: <dict> the snapshot
+    """
+    return {
+        'height': height,
+        'hash': block_hash,
+        'balances': dict(balances.balances),
+        'blocks': dict(lookup.blocks),
+        'transactions': {key: list(locations)
+            for key, locations in lookup.transactions.items()},
+        'addresses': {key: list(locations)
+            for key, locations in lookup.addresses.items()}
+    }
+
+def write_snapshot(path, state):
+    """
+    Writes a snapshot as json, replacing the file atomically so a crash
+    leaves either the old snapshot or the new one.
+
+    :param path: <str> file to write
+    :param state: <dict> the snapshot, as returned by snapshot_state
+    """
+    temp = path + '.tmp'
+    with open(temp, 'w') as file:
+        json.dump(state, file)
+    os.replace(temp, path)
+
+def save_snapshot(path, height, block_hash, balances, lookup):
+    """
+    Writes the indexes as of a block to a file right away
+
+    :param path: <str> file to write
+    :param height: <int> index of the last block the indexes cover
+    :param block_hash: <str> hash of that block
+    :param balances: <BalanceIndex> the balances
+    :param lookup: <LookupIndex> the lookup maps
+    """
+    write_snapshot(path, snapshot_state(height, block_hash, balances, lookup))
+
+def load_snapshot(path):
+    """
+    Reads the indexes written by write_snapshot. The file is plain json, so
+    a tampered one can at worst yield wrong indexes, never run code.
+
+    :param path: <str> file to read
+    :return: <dict> the snapshot, or None if there is no readable one
+    """
+    try:
+        with open(path) as file:
+            state = json.load(file)
+        return {
+            'height': int(state['height']),
+            'hash': str(state['hash']),
+            'balances': dict(state['balances']),
+            'blocks': dict(state['blocks']),
+            'transactions': _locations(state['transactions']),
+            'addresses': _locations(state['addresses'])
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _locations(locations):
+    return {key: [(index, offset) for index, offset in entries]
+        for key, entries in locations.items()}
+
+class SnapshotWriter(object):
+    """
+    Writes index snapshots from a background thread, so the chain lock is
+    never held for the disk. Only the latest snapshot handed over is
+    written; one superseded before its turn is skipped.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.__pending = None
+        self.__thread = None
+        self.__lock = Lock()
+
+    def save(self, state):
+        """
+        Hands a snapshot over to be written
+
+        :param state: <dict> the snapshot, as returned by snapshot_state
+        """
+        with self.__lock:
+            self.__pending = state
+            if self.__thread is None:
+                self.__thread = Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+
+    def wait(self, timeout = None):
+        """
+        Waits for the snapshots handed over so far to be written
+
+        :param timeout: (Optional) <float> most seconds to wait
+        """
+        with self.__lock:
+            thread = self.__thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def __run(self):
+        while True:
+            with self.__lock:
+                state, self.__pending = self.__pending, None
+                if state is None:
+                    self.__thread = None
+                    return
+            try:
+                write_snapshot(self.path, state)
+            except (OSError, TypeError, ValueError):
+                # A missing snapshot only means a longer replay on restart
+                pass
+
+class BalanceIndex(object):
+    """
+    Account balances kept up to date block by block. Every block added to
+    the chain is applied, and every block dropped by a chain replacement is
+    reverted, so a lookup never has to scan the chain.
+    """
+    def __init__(self):
+        self.balances = {}
+
+    def apply(self, block):
+        """
+        Moves the amounts of a block's transactions between accounts.
+
+        :param block: <Block> the block added to the chain
+        """
+        for transaction in block.transactions:
+            self.__transfer(transaction, 1)
+
+    def revert(self, block):
+        """
+        Undoes apply for a block dropped from the chain.
+
+        :param block: <Block> the block removed from the chain
+        """
+        for transaction in reversed(block.transactions):
+            self.__transfer(transaction, -1)
+
+    def get(self, address):
+        """
+        Grabs the balance of an address
+
+        :param address: <str> the address
+        :return: <int> the balance, 0 for unknown addresses
+        """
+        return self.balances.get(address, 0)
+
+    def __transfer(self, transaction, sign):
+        amount = transaction['amount']
+        if not isinstance(amount, Number) or isinstance(amount, bool):
+            return
+
+        sender = transaction['sender']
+        if sender != constant.MINER_KEY:
+            self.__add(sender, -sign * amount)
+        self.__add(transaction['receiver'], sign * amount)
+
+    def __add(self, address, amount):
+        if not isinstance(address, str):
+            return
+        balance = self.balances.get(address, 0) + amount
+        if balance:
+            self.balances[address] = balance
+        else:
+            self.balances.pop(address, None)
+
+
+class LookupIndex(object):
+    """
+    Hash maps from block hash to block index, from transaction id to where
+    the transaction sits in the chain, and from address to the transactions
+    it sends or receives, all kept in chain order.
+
+    Identical transactions, such as repeated mining rewards, share an id, so
+    a transaction id maps to every location it occurs at.
+    """
+    def __init__(self):
+        self.blocks = {}
+        self.transactions = {}
+        self.addresses = {}
+
+    def apply(self, block):
+        """
+        Indexes a block and its transactions.
+
+        :param block: <Block> the block added to the chain
+        """
+        self.blocks[block.hash] = block.index
+        for offset, transaction in enumerate(block.transactions):
+            location = (block.index, offset)
+            transaction_id = Transaction.from_dict(transaction).id
+            self.transactions.setdefault(transaction_id, []).append(location)
+            for address in self.__addresses(transaction):
+                self.addresses.setdefault(address, []).append(location)
+
+    def revert(self, block):
+        """
+        Undoes apply for a block dropped from the chain. Blocks are reverted
+        from the tip down, so their locations are always the last ones in
+        each list.
+
+        :param block: <Block> the block removed from the chain
+        """
+        self.blocks.pop(block.hash, None)
+        for transaction in reversed(block.transactions):
+            transaction_id = Transaction.from_dict(transaction).id
+            self.__pop(self.transactions, transaction_id)
+            for address in self.__addresses(transaction):
+                self.__pop(self.addresses, address)
+
+    def block_index(self, block_hash):
+        """
+        Grabs the index of the block with the given hash
+
+        :param block_hash: <str> hash of the block
+        :return: <int> the block index, or None if it is not in the chain
+        """
+        return self.blocks.get(block_hash)
+
+    def transaction_locations(self, transaction_id):
+        """
+        Grabs where a transaction sits in the chain
+
+        :param transaction_id: <str> id of the transaction
+        :return: <list> (block index, offset) of every occurrence
+        """
+        return list(self.transactions.get(transaction_id, ()))
+
+    def address_locations(self, address, start = 0, limit = None):
+        """
+        Grabs a page of the transactions an address sends or receives
+
+        :param address: <str> the address
+        :param start: (Optional) <int> position of the first transaction
+        :param limit: (Optional) <int> maximum number of transactions
+        :return: <tuple> (block index, offset) of the transactions on the
+        page and the total number of transactions of the address
+        """
+        locations = self.addresses.get(address, [])
+        stop = None if limit is None else start + limit
+        return locations[start:stop], len(locations)
+
+    @staticmethod
+    def __addresses(transaction):
+        addresses = []
+        for address in (transaction['sender'], transaction['receiver']):
+            if isinstance(address, str) and address not in addresses:
+                addresses.append(address)
+        return addresses
+
+    @staticmethod
+    def __pop(locations, key):
+        locations[key].pop()
+        if not locations[key]:
+            del locations[key]
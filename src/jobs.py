@@ -0,0 +1,202 @@
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+from time import time
+from uuid import uuid4
+
+import constant
+import metrics
+from block import Block
+from transaction import Transaction
+
+# States of a mining job
+JOB_RUNNING = 'running'
+JOB_MINED = 'mined'
+JOB_CANCELLED = 'cancelled'
+JOB_FAILED = 'failed'
+
+JOBS = metrics.counter('doubloon_mining_jobs_total',
+    'Mining jobs finished, by outcome')
+RETARGETS = metrics.counter('doubloon_mining_retargets_total',
+    'Searches restarted because a new tip arrived')
+
+class MiningJob(object):
+    """
+    A search for the next block running in the background. Its fields are
+    only written by the thread running it, apart from cancelled, which
+    MiningJobs.cancel sets from a request thread.
+    """
+    def __init__(self):
+        self.id = str(uuid4()).replace('-', '')
+        self.status = JOB_RUNNING
+        self.created = time()
+        self.finished = None
+        self.target = None
+        self.retargets = 0
+        self.transactions = 0
+        self.block = None
+        self.error = None
+
+        self.cancelled = False
+        self.__done = Event()
+
+    @property
+    def done(self):
+        return self.__done.is_set()
+
+    def wait(self, timeout = None):
+        """
+        Waits for the job to finish
+
+        :param timeout: (Optional) <float> most seconds to wait
+        :return: <bool> true if the job is finished
+        """
+        return self.__done.wait(timeout)
+
+    def finish(self, status, block = None, error = None):
+        self.block = block
+        self.error = error
+        self.finished = time()
+        self.status = status
+        JOBS.inc(outcome=status)
+        self.__done.set()
+
+    @property
+    def dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'created': self.created,
+            'finished': self.finished,
+            'target': self.target,
+            'retargets': self.retargets,
+            'transactions': self.transactions,
+            'block': self.block,
+            'error': self.error
+        }
+
+class MiningJobs(object):
+    """
+    Mines blocks in the background, one job at a time, so a request only
+    starts or joins a job and the node keeps serving while the miner's
+    worker pool searches.
+
+    Each attempt snapshots the tip and the highest priority pending
+    transactions when it starts; the block holds that snapshot, so
+    transactions arriving during the search stay in the mempool for the
+    next block. When a new tip arrives the miner is cancelled and the job
+    starts a new attempt on top of it.
+    """
+    def __init__(self, blockchain, address, history = None):
+        self.blockchain = blockchain
+        self.address = address
+        self.history = history or constant.MINING_JOB_HISTORY
+        self.current = None
+
+        self.__jobs = OrderedDict()
+        self.__lock = Lock()
+
+    def start(self):
+        """
+        Starts a mining job, or joins the one already running
+
+        :return: <tuple> the job, and true if it was started by this call
+        """
+        with self.__lock:
+            if self.current is not None:
+                return self.current, False
+            job = self.current = MiningJob()
+            self.__jobs[job.id] = job
+            while len(self.__jobs) > self.history:
+                self.__jobs.popitem(last=False)
+
+        Thread(target=self.__run, args=(job,), daemon=True).start()
+        return job, True
+
+    def get(self, job_id):
+        return self.__jobs.get(job_id)
+
+    def jobs(self):
+        """
+        Grabs the jobs kept, newest first
+
+        :return: <list> <MiningJob> the jobs
+        """
+        with self.__lock:
+            return list(reversed(self.__jobs.values()))
+
+    def cancel(self, job_id):
+        """
+        Cancels a running job. It finishes once the miner notices, without
+        adding a block.
+
+        :param job_id: <str> id of the job
+        :return: <MiningJob> the job, or None if it is unknown
+        """
+        job = self.get(job_id)
+        if job is not None and not job.done:
+            job.cancelled = True
+            self.blockchain.miner.cancel()
+        return job
+
+    def __run(self, job):
+        block = None
+        outcome = {'status': JOB_FAILED}
+        try:
+            block = self.__mine(job)
+            if block is None:
+                outcome = {'status': JOB_CANCELLED}
+            else:
+                outcome = {'status': JOB_MINED, 'block': block}
+        except Exception as e:
+            outcome['error'] = str(e)
+        finally:
+            # The job stops being current as it finishes, so a request woken
+            # by it starts a new job instead of joining this one
+            with self.__lock:
+                self.current = None
+                job.finish(**outcome)
+
+        if block is not None:
+            self.blockchain.announce(Block.from_dict(block))
+
+    def __mine(self, job):
+        """
+        Searches for the next block until one is added on the current tip,
+        starting over whenever the tip moves.
+
+        :param job: <MiningJob> the job
+        :return: <dict> the block mined, or None if the job was cancelled
+        """
+        blockchain = self.blockchain
+        reward = Transaction(constant.MINER_KEY, self.address,
+            constant.MINER_REWARD).dict
+
+        while not job.cancelled:
+            # The generation is read first, so a tip arriving from here on
+            # cancels the search below instead of going unnoticed
+            generation = blockchain.miner.generation.value
+            with blockchain.lock:
+                tip = blockchain.last_block
+                target, prev = tip.hash, tip.proof
+                pending = blockchain.mempool.select(
+                    constant.MAX_BLOCK_TRANSACTIONS - 1)
+            snapshot = [(Transaction.from_dict(transaction).id, transaction)
+                for transaction in pending]
+            job.target = target
+            job.transactions = len(snapshot)
+
+            proof = blockchain.proof_of_work(prev, generation)
+            if job.cancelled:
+                return None
+
+            with blockchain.lock:
+                if proof is not None and blockchain.last_block.hash == target:
+                    # Transactions evicted during the search are left out
+                    transactions = [reward] + [transaction
+                        for transaction_id, transaction in snapshot
+                        if transaction_id in blockchain.mempool]
+                    return blockchain.add_block(proof, target, transactions)
+
+            job.retargets += 1
+            RETARGETS.inc()
+        return None
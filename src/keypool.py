@@ -0,0 +1,87 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue
+from threading import RLock
+
+from Crypto.PublicKey.RSA import importKey
+
+import constant
+from wallet import new_key
+
+def lower_priority():
+    """
+    Runs key generation below the node's own priority, so filling the
+    pool does not slow down the requests it serves.
+    """
+    if hasattr(os, 'nice'):
+        os.nice(constant.KEY_POOL_NICENESS)
+
+def generate_key():
+    """
+    Generates a keypair inside a worker process.
+
+    :return: <bytes> the DER encoded private key
+    """
+    return new_key().exportKey(format='DER')
+
+class KeyPool(object):
+    """
+    Keeps freshly generated RSA keypairs ready for new wallets. Keys are
+    generated on a pool of worker processes and the pool is refilled in
+    the background as keys are taken, so handing out a key never waits on
+    key generation: a request the pool cannot cover yet is turned down.
+    """
+    def __init__(self, size = None, workers = None):
+        self.size = size or constant.KEY_POOL_SIZE
+        self.workers = workers or constant.KEY_POOL_WORKERS
+
+        self.__keys = Queue()
+        self.__pending = 0
+        self.__lock = RLock()
+        self.__executor = None
+
+    def __len__(self):
+        return self.__keys.qsize()
+
+    def take(self, count = 1):
+        """
+        Hands out keys from the pool, all of them or none.
+
+        :param count: (Optional) <int> number of keys
+        :return: <list> <RSAobj> the private keys, or None if the pool does
+        not hold count keys yet
+        """
+        with self.__lock:
+            if self.__keys.qsize() < count:
+                keys = None
+            else:
+                keys = [self.__keys.get_nowait() for _ in range(count)]
+        self.fill()
+        return keys and [importKey(key) for key in keys]
+
+    def fill(self):
+        """
+        Starts generating keys until the pool holds size of them.
+        """
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ProcessPoolExecutor(self.workers,
+                    initializer=lower_priority)
+
+            missing = self.size - self.__keys.qsize() - self.__pending
+            for _ in range(missing):
+                self.__pending += 1
+                future = self.__executor.submit(generate_key)
+                future.add_done_callback(self.__generated)
+
+    def close(self):
+        with self.__lock:
+            if self.__executor is not None:
+                self.__executor.shutdown(wait=False, cancel_futures=True)
+                self.__executor = None
+
+    def __generated(self, future):
+        with self.__lock:
+            self.__pending -= 1
+        if not future.cancelled() and future.exception() is None:
+            self.__keys.put(future.result())
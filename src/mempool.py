@@ -0,0 +1,191 @@
+import heapq
+import json
+from collections import deque
+from itertools import count, islice
+from math import isfinite
+from numbers import Number
+from threading import RLock
+
+import constant
+from transaction import Transaction
+
+class Mempool(object):
+    """
+    Pending transactions waiting for a block, deduplicated by transaction
+    id and bounded in both count and size. When full, the lowest priority
+    transactions are evicted first.
+
+    The priority of a transaction is its amount, and mining rewards always
+    come first. Blocks are assembled in priority order, while the
+    transactions of a single sender keep the order they arrived in.
+
+    The mempool follows the chain like the other indexes: transactions are
+    dropped when a block holding them is applied, and come back when that
+    block is reverted.
+
+    It is safe to share between threads: requests add transactions while
+    mining jobs select them and blocks remove them.
+    """
+    def __init__(self, max_count = None, max_bytes = None):
+        self.max_count = max_count or constant.MEMPOOL_MAX_COUNT
+        self.max_bytes = max_bytes or constant.MEMPOOL_MAX_BYTES
+        self.size = 0
+
+        self.__entries = {}
+        self.__senders = {}
+        self.__evictions = []
+        self.__sequence = count()
+        self.__lock = RLock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, transaction_id):
+        return transaction_id in self.__entries
+
+    def add(self, transaction):
+        """
+        Admits a transaction, evicting lower priority ones if the pool is
+        full.
+
+        :param transaction: <dict> the transaction
+        :return: <bool> true if it was admitted, false if it is a duplicate
+        or has a lower priority than everything that would be evicted
+        """
+        transaction_id = Transaction.from_dict(transaction).id
+        with self.__lock:
+            if transaction_id in self.__entries:
+                return False
+
+            entry = _Entry(transaction_id, transaction, next(self.__sequence))
+            while (len(self.__entries) + 1 > self.max_count or
+                self.size + entry.size > self.max_bytes):
+                lowest = self.__lowest()
+                if lowest is None or lowest.key > entry.key:
+                    return False
+                self.__remove(lowest.id)
+
+            self.__entries[transaction_id] = entry
+            self.__senders.setdefault(entry.sender, deque()).append(entry)
+            heapq.heappush(self.__evictions, (entry.key, transaction_id))
+            self.size += entry.size
+            return True
+
+    def remove(self, transaction_ids):
+        """
+        Drops transactions from the pool, ignoring unknown ids.
+
+        :param transaction_ids: <iterable> ids of the transactions
+        """
+        with self.__lock:
+            for transaction_id in transaction_ids:
+                if transaction_id in self.__entries:
+                    self.__remove(transaction_id)
+
+    def select(self, limit = None):
+        """
+        Picks the transactions for the next block, highest priority first
+        but in arrival order for each sender.
+
+        :param limit: (Optional) <int> maximum number of transactions
+        :return: <list> the transaction dicts
+        """
+        with self.__lock:
+            heads = []
+            for queue in self.__senders.values():
+                heads.append((queue[0].rank, 0, queue))
+            heapq.heapify(heads)
+
+            selected = []
+            while heads and (limit is None or len(selected) < limit):
+                _, position, queue = heapq.heappop(heads)
+                selected.append(queue[position].transaction)
+                if position + 1 < len(queue):
+                    heapq.heappush(heads,
+                        (queue[position + 1].rank, position + 1, queue))
+            return selected
+
+    def page(self, start = 0, limit = None):
+        """
+        Grabs a page of the pending transactions in arrival order
+
+        :param start: (Optional) <int> position of the first transaction
+        :param limit: (Optional) <int> maximum number of transactions
+        :return: <list> the transaction dicts
+        """
+        stop = None if limit is None else start + limit
+        with self.__lock:
+            entries = islice(self.__entries.values(), start, stop)
+            return [entry.transaction for entry in entries]
+
+    def apply(self, block):
+        self.remove(Transaction.from_dict(transaction).id
+            for transaction in block.transactions)
+
+    def revert(self, block):
+        with self.__lock:
+            for transaction in block.transactions:
+                if transaction['sender'] != constant.MINER_KEY:
+                    self.add(dict(transaction))
+
+    def __lowest(self):
+        """
+        Grabs the entry to evict next, skipping heap items of transactions
+        that already left the pool.
+
+        :return: <_Entry> the lowest priority entry, or None if empty
+        """
+        while self.__evictions:
+            _, transaction_id = self.__evictions[0]
+            if transaction_id in self.__entries:
+                return self.__entries[transaction_id]
+            heapq.heappop(self.__evictions)
+        return None
+
+    def __remove(self, transaction_id):
+        entry = self.__entries.pop(transaction_id)
+        queue = self.__senders[entry.sender]
+        queue.remove(entry)
+        if not queue:
+            del self.__senders[entry.sender]
+        self.size -= entry.size
+
+        # Drop the heap items of removed transactions once they dominate
+        if len(self.__evictions) > 2 * len(self.__entries) + 64:
+            self.__evictions = [(e.key, e.id) for e in self.__entries.values()]
+            heapq.heapify(self.__evictions)
+
+class _Entry(object):
+    __slots__ = ('id', 'transaction', 'sender', 'sequence', 'size',
+        'priority')
+
+    def __init__(self, transaction_id, transaction, sequence):
+        self.id = transaction_id
+        self.transaction = transaction
+        self.sender = str(transaction['sender'])
+        self.sequence = sequence
+        self.size = len(json.dumps(transaction))
+
+        amount = transaction['amount']
+        if self.sender == constant.MINER_KEY:
+            self.priority = float('inf')
+        elif (isinstance(amount, Number) and not isinstance(amount, bool) and
+            isfinite(amount)):
+            self.priority = amount
+        else:
+            self.priority = 0
+
+    @property
+    def key(self):
+        """
+        Eviction order: lowest priority first, newest first among equals.
+        """
+        return (self.priority, -self.sequence)
+
+    @property
+    def rank(self):
+        """
+        Block assembly order: highest priority first, oldest first among
+        equals.
+        """
+        return (-self.priority, self.sequence)
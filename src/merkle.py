@@ -0,0 +1,81 @@
+import hashlib
+
+# Merkle trees over transaction ids. Inner nodes hash a 0x01 prefix and
+# their two children, so an inner node can never pass as a transaction id,
+# which hashes json text. A node without a sibling moves up a level
+# unchanged rather than being paired with itself.
+NODE_PREFIX = b'\x01'
+EMPTY_ROOT = hashlib.sha256(b'').hexdigest()
+
+def merkle_root(leaves):
+    """
+    Computes the Merkle root of a list of leaves
+
+    :param leaves: <list> <str> hex hashes, such as transaction ids
+    :return: <str> hex root, EMPTY_ROOT for no leaves
+    """
+    if not leaves:
+        return EMPTY_ROOT
+
+    level = [bytes.fromhex(leaf) for leaf in leaves]
+    while len(level) > 1:
+        level = _parent_level(level)
+    return level[0].hex()
+
+def merkle_proof(leaves, position):
+    """
+    Builds the inclusion proof of one leaf: the sibling hashes on its path
+    to the root, from the bottom up.
+
+    :param leaves: <list> <str> hex hashes, such as transaction ids
+    :param position: <int> position of the leaf to prove
+    :return: <list> of {'hash': <str>, 'side': 'left' | 'right'}
+    """
+    if not 0 <= position < len(leaves):
+        raise IndexError('leaf position out of range')
+
+    proof = []
+    level = [bytes.fromhex(leaf) for leaf in leaves]
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append({
+                'hash': level[sibling].hex(),
+                'side': 'left' if sibling < position else 'right'
+            })
+        level = _parent_level(level)
+        position //= 2
+    return proof
+
+def verify_proof(leaf, proof, root):
+    """
+    Determines a leaf is included under a Merkle root
+
+    :param leaf: <str> hex hash of the leaf
+    :param proof: <list> the proof, as returned by merkle_proof
+    :param root: <str> hex Merkle root
+    :return: <bool> true if valid, false otherwise
+    """
+    try:
+        node = bytes.fromhex(leaf)
+        for step in proof:
+            sibling = bytes.fromhex(step['hash'])
+            if step['side'] == 'left':
+                node = _hash_pair(sibling, node)
+            elif step['side'] == 'right':
+                node = _hash_pair(node, sibling)
+            else:
+                return False
+    except (KeyError, TypeError, ValueError):
+        return False
+    return node.hex() == root
+
+def _parent_level(level):
+    parents = [_hash_pair(level[i], level[i + 1])
+        for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        parents.append(level[-1])
+    return parents
+
+def _hash_pair(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
@@ -0,0 +1,156 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+
+# Latency buckets in seconds, from sub-millisecond hashing to slow syncs
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1,
+    5, 10, 30)
+
+class Counter(object):
+    """
+    A value that only goes up, such as a number of hashes or requests.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.__values = {}
+        self.__lock = Lock()
+
+    def inc(self, amount = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.__values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        with self.__lock:
+            return [(self.name, key, value)
+                for key, value in self.__values.items()]
+
+class Gauge(object):
+    """
+    A value read when the metrics are collected, such as the mempool size.
+    Reading it then costs nothing on the hot path.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, help, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self):
+        return [(self.name, (), self.read())]
+
+class Histogram(object):
+    """
+    Counts observations, such as latencies, into cumulative buckets.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets = None):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets or DEFAULT_BUCKETS)
+        self.__series = {}
+        self.__lock = Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        position = bisect_left(self.buckets, value)
+        with self.__lock:
+            series = self.__series.get(key)
+            if series is None:
+                series = self.__series[key] = [[0] * len(self.buckets), 0, 0]
+            if position < len(self.buckets):
+                series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes how long the block of a with statement takes
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        series = self.__series.get(tuple(sorted(labels.items())))
+        return 0 if series is None else series[2]
+
+    def samples(self):
+        samples = []
+        with self.__lock:
+            for key, (counts, total, observed) in self.__series.items():
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    samples.append((self.name + '_bucket',
+                        key + (('le', str(bound)),), cumulative))
+                samples.append((self.name + '_bucket', key + (('le', '+Inf'),),
+                    observed))
+                samples.append((self.name + '_sum', key, total))
+                samples.append((self.name + '_count', key, observed))
+        return samples
+
+class Registry(object):
+    """
+    The metrics of the node, rendered in the Prometheus text format.
+    """
+    def __init__(self):
+        self.__metrics = {}
+        self.__lock = Lock()
+
+    def register(self, metric):
+        """
+        Adds a metric, or grabs the one already registered under its name
+
+        :param metric: <Counter> | <Gauge> | <Histogram> the metric
+        :return: the registered metric
+        """
+        with self.__lock:
+            return self.__metrics.setdefault(metric.name, metric)
+
+    def get(self, name):
+        return self.__metrics.get(name)
+
+    def render(self):
+        """
+        Renders every metric in the Prometheus text exposition format
+
+        :return: <str> the metrics
+        """
+        lines = []
+        for metric in list(self.__metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                if labels:
+                    pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    name = f'{name}{{{pairs}}}'
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+def counter(name, help):
+    return registry.register(Counter(name, help))
+
+def gauge(name, help, read):
+    return registry.register(Gauge(name, help, read))
+
+def histogram(name, help, buckets = None):
+    return registry.register(Histogram(name, help, buckets))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
@@ -0,0 +1,190 @@
+import hashlib
+import os
+from collections import deque
+from itertools import count
+from multiprocessing import Pool, Value
+from time import perf_counter
+
+import constant
+import metrics
+
+HASHES = metrics.counter('doubloon_miner_hashes_total',
+    'Proof candidates hashed by the miner')
+SEARCH_SECONDS = metrics.histogram('doubloon_miner_search_seconds',
+    'Time spent searching for a proof, by outcome')
+
+# Search generation shared with the worker processes. Whenever it moves on,
+# every chunk still running for an older generation gives up.
+_generation = None
+
+def _init_worker(generation):
+    global _generation
+    _generation = generation
+
+# A proof is valid when the last PROOF_DIFFICULTY hex digits of its hash are
+# zeros, i.e. when the low 4 * PROOF_DIFFICULTY bits of the digest are clear.
+# Checking the raw digest bytes against that mask skips the hex conversion.
+_TARGET_BYTES = (constant.PROOF_DIFFICULTY + 1) // 2
+_TARGET_MASK = (1 << (4 * constant.PROOF_DIFFICULTY)) - 1
+
+def is_valid_proof(prev, nonce):
+    """
+    Validates a proof by checking if the hash of the previous and the
+    current contain PROOF_DIFFICULTY trailing zeros
+
+    :param prev: <int> previous proof
+    :param nonce: <int> current proof
+    :return: <bool> True if correct, false otherwise
+    """
+    digest = hashlib.sha256(f'{prev}{nonce}'.encode()).digest()
+    return not int.from_bytes(digest[-_TARGET_BYTES:], 'big') & _TARGET_MASK
+
+def search_range(prev, start, stop, generation, shared = None):
+    """
+    Scans the nonces in [start, stop) for the first valid proof.
+
+    The hash state of the fixed prev prefix is computed once and copied for
+    every nonce, and nonces are encoded a batch at a time.
+
+    :param prev: <int> the previous proof
+    :param start: <int> first nonce to try
+    :param stop: <int> nonce to stop before
+    :param generation: <int> search generation this chunk belongs to
+    :param shared: (Optional) <Value> generation counter to poll, defaults
+    to the one given to the worker process
+    :return: <int> the lowest valid nonce in the range, or None if there is
+    none or the search was cancelled
+    """
+    if shared is None:
+        shared = _generation
+    prefix = hashlib.sha256(str(prev).encode())
+    for batch in range(start, stop, constant.MINER_CHECK_INTERVAL):
+        if shared is not None and shared.value != generation:
+            return None
+        end = min(batch + constant.MINER_CHECK_INTERVAL, stop)
+        nonces = ' '.join(map(str, range(batch, end))).encode().split()
+        for offset, nonce in enumerate(nonces):
+            guess = prefix.copy()
+            guess.update(nonce)
+            if not int.from_bytes(guess.digest()[-_TARGET_BYTES:],
+                'big') & _TARGET_MASK:
+                return batch + offset
+    return None
+
+class Miner(object):
+    def __init__(self, workers = None, chunk_size = None):
+        self.workers = workers or constant.MINER_WORKERS or os.cpu_count()
+        self.chunk_size = chunk_size or constant.MINER_CHUNK_SIZE
+        self.generation = Value('L', 0)
+        self.__pool = None
+
+    def search(self, prev, generation = None):
+        """
+        Searches for the lowest valid proof following prev. The nonce space
+        is split into chunks which are handed out to the worker pool in
+        order, so the result is the same as a serial search from nonce 0.
+
+        :param prev: <int> the previous proof
+        :param generation: (Optional) <int> generation read before the
+        search was prepared, so a cancel in between is not missed. The
+        current generation by default.
+        :return: <int> the current proof, or None if the search was cancelled
+        """
+        if generation is None:
+            generation = self.generation.value
+        start = perf_counter()
+        result = self.__search(prev, generation)
+        SEARCH_SECONDS.observe(perf_counter() - start,
+            outcome='cancelled' if result is None else 'found')
+        return result
+
+    def __search(self, prev, generation):
+        """
+        Runs the search on the worker pool, or in the calling process with
+        a single worker, counting the hashes tried.
+
+        :param prev: <int> the previous proof
+        :param generation: <int> search generation
+        :return: <int> the current proof, or None if the search was cancelled
+        """
+        if self.workers == 1:
+            return self.__search_serial(prev, generation)
+
+        pool = self.__get_pool()
+        pending = deque()
+        starts = count(0, self.chunk_size)
+        try:
+            while True:
+                while len(pending) < self.workers * 2:
+                    start = next(starts)
+                    pending.append((start, pool.apply_async(search_range,
+                        (prev, start, start + self.chunk_size, generation))))
+
+                start, chunk = pending.popleft()
+                result = chunk.get()
+                if self.generation.value != generation:
+                    return None
+                self.__count(start, result)
+                if result is not None:
+                    return result
+        finally:
+            self.__advance(generation)
+
+    def cancel(self):
+        """
+        Cancels the search in progress, if any. The search returns None.
+        """
+        with self.generation.get_lock():
+            self.generation.value += 1
+
+    def close(self):
+        """
+        Shuts down the worker pool.
+        """
+        if self.__pool is not None:
+            self.__pool.terminate()
+            self.__pool.join()
+            self.__pool = None
+
+    def __search_serial(self, prev, generation):
+        """
+        Runs the search in the calling process, chunk by chunk, so it can
+        still be cancelled from another thread.
+
+        :param prev: <int> the previous proof
+        :param generation: <int> search generation
+        :return: <int> the current proof, or None if the search was cancelled
+        """
+        for start in count(0, self.chunk_size):
+            if self.generation.value != generation:
+                return None
+            result = search_range(prev, start, start + self.chunk_size,
+                generation, self.generation)
+            self.__count(start, result)
+            if result is not None:
+                return result
+
+    def __count(self, start, result):
+        """
+        Counts the hashes of a finished chunk: all of them, or up to the
+        proof found.
+        """
+        HASHES.inc(self.chunk_size if result is None else result - start + 1)
+
+    def __advance(self, generation):
+        """
+        Moves the generation past a finished search so that the chunks still
+        running in the pool stop early.
+
+        :param generation: <int> generation of the finished search
+        """
+        with self.generation.get_lock():
+            if self.generation.value == generation:
+                self.generation.value += 1
+
+    def __get_pool(self):
+        if self.__pool is None:
+            self.__pool = Pool(self.workers,
+                initializer=_init_worker,
+                initargs=(self.generation,))
+        return self.__pool
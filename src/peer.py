@@ -0,0 +1,214 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from threading import Lock
+from time import monotonic
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import constant
+import metrics
+
+# Not labelled by peer, as any address can be registered and every one
+# would keep its own series
+PEER_SECONDS = metrics.histogram('doubloon_peer_seconds',
+    'Time a peer took to answer a round, such as a resolve sync')
+PEER_FAILURES = metrics.counter('doubloon_peer_failures_total',
+    'Rounds a peer failed or missed the deadline of')
+
+class PeerHealth(object):
+    def __init__(self):
+        self.failures = 0
+        self.retry_at = 0
+        self.latency = None
+
+    @property
+    def healthy(self):
+        return monotonic() >= self.retry_at
+
+    def succeeded(self, latency):
+        self.failures = 0
+        self.retry_at = 0
+        self.latency = latency
+
+    def failed(self):
+        """
+        Backs the peer off exponentially: it is skipped until retry_at.
+        """
+        self.failures += 1
+        backoff = constant.PEER_BACKOFF * 2 ** (self.failures - 1)
+        self.retry_at = monotonic() + min(backoff, constant.PEER_BACKOFF_MAX)
+
+    @property
+    def dict(self):
+        """
+        Grabs a json-friendly representation of the peer's health
+
+        :return: <dict> for the peer
+        """
+        return {
+            'healthy': self.healthy,
+            'failures': self.failures,
+            'latency': self.latency
+        }
+
+class PeerClient(object):
+    """
+    Talks to peers concurrently over a shared keep-alive connection pool.
+    Every request has a per-peer timeout, every round an overall deadline,
+    and peers that fail are backed off before they are asked again. The
+    version changes whenever the health of peers is updated. Rounds run on
+    several threads at once, so the health map is only read or grown under
+    a lock.
+    """
+    def __init__(self, workers = None):
+        self.workers = workers or constant.PEER_WORKERS
+        self.health = {}
+        self.version = 0
+        self.__lock = Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.workers,
+            pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.__executor = None
+
+    def get(self, peer, path, **kwargs):
+        """
+        Sends a GET request to a peer through the shared session.
+
+        :param peer: <str> address of the peer
+        :param path: <str> path to request
+        :return: <Response> the peer's response
+        """
+        kwargs.setdefault('timeout', constant.PEER_TIMEOUT)
+        return self.session.get(f'http://{peer}{path}', **kwargs)
+
+    def post(self, peer, path, **kwargs):
+        """
+        Sends a POST request to a peer through the shared session.
+
+        :param peer: <str> address of the peer
+        :param path: <str> path to request
+        :return: <Response> the peer's response
+        """
+        kwargs.setdefault('timeout', constant.PEER_TIMEOUT)
+        return self.session.post(f'http://{peer}{path}', **kwargs)
+
+    def map(self, peers, fetch, deadline = None):
+        """
+        Runs fetch(peer) for every healthy peer at the same time. A peer
+        fails if fetch raises, returns None or does not finish before the
+        deadline.
+
+        :param peers: <iterable> addresses of the peers to ask
+        :param fetch: <callable> called with each peer address
+        :param deadline: (Optional) <float> seconds the whole round may take
+        :return: <dict> peer address to fetch result, for the peers that
+        succeeded
+        """
+        peers = [peer for peer in peers if self.__health(peer).healthy]
+        if not peers:
+            return {}
+
+        futures = {
+            self.__get_executor().submit(self.__timed, fetch, peer): peer
+            for peer in peers
+        }
+        done, _ = wait(futures, timeout=deadline or constant.PEER_DEADLINE)
+
+        results = {}
+        for future, peer in futures.items():
+            result = None
+            if future in done and future.exception() is None:
+                result, latency = future.result()
+
+            if result is None:
+                self.__health(peer).failed()
+                PEER_FAILURES.inc()
+            else:
+                self.__health(peer).succeeded(latency)
+                PEER_SECONDS.observe(latency)
+                results[peer] = result
+        self.__updated()
+        return results
+
+    def broadcast(self, peers, send):
+        """
+        Runs send(peer) for every healthy peer in the background, without
+        waiting for them. Peers are backed off as in map.
+
+        :param peers: <iterable> addresses of the peers to tell
+        :param send: <callable> called with each peer address
+        """
+        for peer in peers:
+            if self.__health(peer).healthy:
+                future = self.__get_executor().submit(self.__timed, send, peer)
+                future.add_done_callback(partial(self.__record, peer))
+
+    def report(self, peers):
+        """
+        Grabs the health and last latency of the given peers
+
+        :param peers: <iterable> addresses of the peers
+        :return: <dict> peer address to its health
+        """
+        return {peer: self.__health(peer).dict for peer in list(peers)}
+
+    def healthy_peers(self):
+        """
+        Grabs the peers that are not backed off
+
+        :return: <tuple> addresses of the healthy peers, sorted
+        """
+        with self.__lock:
+            health = list(self.health.items())
+        return tuple(sorted(peer for peer, peer_health in health
+            if peer_health.healthy))
+
+    def close(self):
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+        self.session.close()
+
+    @staticmethod
+    def __timed(fetch, peer):
+        """
+        Runs fetch(peer) and measures how long it took.
+
+        :return: <tuple> the result and the latency in seconds
+        """
+        start = monotonic()
+        result = fetch(peer)
+        return result, monotonic() - start
+
+    def __record(self, peer, future):
+        result = None
+        if future.exception() is None:
+            result, latency = future.result()
+
+        if result is None:
+            self.__health(peer).failed()
+        else:
+            self.__health(peer).succeeded(latency)
+        self.__updated()
+
+    def __updated(self):
+        with self.__lock:
+            self.version += 1
+
+    def __health(self, peer):
+        with self.__lock:
+            health = self.health.get(peer)
+            if health is None:
+                health = self.health[peer] = PeerHealth()
+            return health
+
+    def __get_executor(self):
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(self.workers)
+        return self.__executor
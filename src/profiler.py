@@ -0,0 +1,88 @@
+import sys
+from collections import Counter
+from threading import Event, Lock, Thread, get_ident
+
+import constant
+
+class SamplingProfiler(object):
+    """
+    Samples the stacks of every thread of the node at a fixed interval
+    while it is running. It can be started and stopped at any time and
+    costs nothing while stopped. The samples are rendered as collapsed
+    stacks, one "outer;inner count" line per distinct stack, which flame
+    graph tools read directly.
+    """
+    def __init__(self, interval = None, max_stacks = None):
+        self.interval = interval or constant.PROFILER_INTERVAL
+        self.max_stacks = max_stacks or constant.PROFILER_MAX_STACKS
+        self.samples = 0
+
+        self.__stacks = Counter()
+        self.__lock = Lock()
+        self.__stop = None
+        self.__thread = None
+
+    @property
+    def running(self):
+        return self.__thread is not None
+
+    def start(self, interval = None):
+        """
+        Starts sampling, or changes the interval if already running.
+
+        :param interval: (Optional) <float> seconds between samples
+        """
+        if interval:
+            self.interval = interval
+        with self.__lock:
+            if self.__thread is not None:
+                return
+            self.__stop = Event()
+            self.__thread = Thread(target=self.__run, args=(self.__stop,),
+                daemon=True)
+            self.__thread.start()
+
+    def stop(self):
+        with self.__lock:
+            if self.__thread is None:
+                return
+            self.__stop.set()
+            thread, self.__thread = self.__thread, None
+        thread.join()
+
+    def clear(self):
+        with self.__lock:
+            self.__stacks.clear()
+            self.samples = 0
+
+    def render(self):
+        """
+        Renders the samples as collapsed stacks, most frequent first
+
+        :return: <str> the stacks
+        """
+        with self.__lock:
+            stacks = self.__stacks.most_common()
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+    def __run(self, stop):
+        ident = get_ident()
+        while not stop.wait(self.interval):
+            stacks = [_collapse(frame)
+                for thread, frame in sys._current_frames().items()
+                if thread != ident]
+            with self.__lock:
+                for stack in stacks:
+                    if (stack in self.__stacks or
+                        len(self.__stacks) < self.max_stacks):
+                        self.__stacks[stack] += 1
+                self.samples += 1
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f'{module}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
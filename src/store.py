@@ -0,0 +1,218 @@
+import json
+import mmap
+import os
+import struct
+from zlib import crc32
+
+import codec
+from block import Block
+
+# Each record in the log is a header followed by the block in the binary
+# encoding of codec.py. Logs written before that hold the block's canonical
+# json serialization instead, which is still read. The index file holds the
+# log offset of every record.
+RECORD_HEADER = struct.Struct('>II')
+INDEX_ENTRY = struct.Struct('>Q')
+
+class ChainStore(object):
+    """
+    Append-only, file-backed store for sealed blocks. It behaves like the
+    list the in-memory Blockchain uses: len(), indexing, iteration, append
+    and truncation through del store[n:].
+
+    Opening a store only looks at the index and the tail of the log, and
+    blocks are decoded from a memory map of the log when they are read, so
+    neither restart time nor memory grows with the chain.
+    """
+    def __init__(self, path, sync = False):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.sync = sync
+
+        self.__log = open(path, 'a+b')
+        self.__index = open(self.index_path, 'a+b')
+        self.__map = None
+        self.__last = None
+
+        self.__length = self.__recover()
+
+    def __len__(self):
+        return self.__length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(self.__length))]
+
+        if key < 0:
+            key += self.__length
+        if not 0 <= key < self.__length:
+            raise IndexError('chain index out of range')
+
+        if key == self.__length - 1 and self.__last is not None:
+            return self.__last
+        return self.__decode(self.__read_record(self.__offset(key)))
+
+    def __delitem__(self, key):
+        if not isinstance(key, slice) or key.step or key.stop is not None:
+            raise TypeError('only del store[n:] is supported')
+        self.truncate(key.indices(self.__length)[0])
+
+    def __iter__(self):
+        for i in range(self.__length):
+            yield self[i]
+
+    def append(self, block):
+        """
+        Appends a sealed block. The record is written to the log before its
+        index entry, so a crash in between is repaired on the next open.
+
+        :param block: <Block> the sealed block to store
+        """
+        payload = codec.encode_block(block)
+        offset = self.__log_size()
+
+        self.__log.write(RECORD_HEADER.pack(len(payload), crc32(payload)))
+        self.__log.write(payload)
+        self.__flush(self.__log)
+
+        self.__index.write(INDEX_ENTRY.pack(offset))
+        self.__flush(self.__index)
+
+        self.__length += 1
+        self.__last = block
+
+    def truncate(self, length):
+        """
+        Drops every block from position length onwards.
+
+        :param length: <int> number of blocks to keep
+        """
+        if length >= self.__length:
+            return
+
+        log_size = self.__offset(length)
+        self.__close_map()
+        self.__log.truncate(log_size)
+        self.__index.truncate(length * INDEX_ENTRY.size)
+        self.__flush(self.__log)
+        self.__flush(self.__index)
+
+        self.__length = length
+        self.__last = None
+        if length:
+            self.__last = self[length - 1]
+
+    def close(self):
+        self.__close_map()
+        self.__log.close()
+        self.__index.close()
+
+    def __recover(self):
+        """
+        Brings the log and the index back in line after a crash. Index
+        entries pointing at missing or torn records are dropped, records
+        written after the last index entry are indexed, and any partly
+        written record at the end of the log is cut off. Only the tail of
+        the log is read.
+
+        :return: <int> the number of stored blocks
+        """
+        index_size = os.fstat(self.__index.fileno()).st_size
+        length = index_size // INDEX_ENTRY.size
+        log_size = self.__log_size()
+
+        end = 0
+        while length:
+            offset = self.__offset(length - 1)
+            record_end = self.__valid_record_end(offset, log_size)
+            if record_end is not None:
+                end = record_end
+                break
+            length -= 1
+
+        # Records that made it to the log but not to the index
+        self.__index.truncate(length * INDEX_ENTRY.size)
+        while True:
+            record_end = self.__valid_record_end(end, log_size)
+            if record_end is None:
+                break
+            self.__index.write(INDEX_ENTRY.pack(end))
+            end = record_end
+            length += 1
+
+        if end != log_size:
+            self.__log.truncate(end)
+        self.__flush(self.__log)
+        self.__flush(self.__index)
+
+        if length:
+            self.__last = self.__decode(self.__read_record(
+                self.__offset(length - 1)))
+        return length
+
+    def __valid_record_end(self, offset, log_size):
+        """
+        Checks there is a complete, uncorrupted record at offset.
+
+        :param offset: <int> log offset of the record
+        :param log_size: <int> current size of the log
+        :return: <int> offset just past the record, or None if it is invalid
+        """
+        if offset + RECORD_HEADER.size > log_size:
+            return None
+        header = os.pread(self.__log.fileno(), RECORD_HEADER.size, offset)
+        size, checksum = RECORD_HEADER.unpack(header)
+
+        end = offset + RECORD_HEADER.size + size
+        if end > log_size:
+            return None
+        payload = os.pread(self.__log.fileno(), size,
+            offset + RECORD_HEADER.size)
+        if crc32(payload) != checksum:
+            return None
+        return end
+
+    def __offset(self, position):
+        entry = os.pread(self.__index.fileno(), INDEX_ENTRY.size,
+            position * INDEX_ENTRY.size)
+        return INDEX_ENTRY.unpack(entry)[0]
+
+    def __read_record(self, offset):
+        view = self.__view(offset + RECORD_HEADER.size)
+        size, _ = RECORD_HEADER.unpack_from(view, offset)
+        start = offset + RECORD_HEADER.size
+        view = self.__view(start + size)
+        return view[start:start + size]
+
+    def __view(self, end):
+        """
+        Grabs a memory map of the log that covers at least end bytes. The
+        map is recreated when the log has grown past it.
+
+        :param end: <int> offset the map has to reach
+        :return: <mmap> the memory-mapped log
+        """
+        if self.__map is None or len(self.__map) < end:
+            self.__close_map()
+            self.__map = mmap.mmap(self.__log.fileno(), 0,
+                access=mmap.ACCESS_READ)
+        return self.__map
+
+    def __close_map(self):
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+
+    def __log_size(self):
+        return os.fstat(self.__log.fileno()).st_size
+
+    def __flush(self, file):
+        file.flush()
+        if self.sync:
+            os.fsync(file.fileno())
+
+    @staticmethod
+    def __decode(payload):
+        if payload[:1] == b'{':
+            return Block.from_dict(json.loads(payload)).seal()
+        return codec.decode_block(payload).seal()
@@ -1,38 +1,146 @@
+import hashlib
+import json
 from binascii import unhexlify
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
 
 from Crypto.Hash import SHA256
 from Crypto.PublicKey.RSA import importKey
 from Crypto.Signature.PKCS1_v1_5 import new
 
+import constant
+
+@lru_cache(maxsize=constant.KEY_CACHE_SIZE)
+def parse_key(key):
+    """
+    Parses a hex-encoded DER RSA key into a PKCS#1 v1.5 signature object.
+    The same few sender keys come up over and over, so parsed keys are kept
+    in a bounded LRU cache; see parse_key.cache_info() for hits and misses.
+
+    :param key: <str> the hexlified DER key
+    :return: <PKCS115_SigScheme> signature object for the key
+    """
+    return new(importKey(unhexlify(key)))
+
+class VerificationCache(object):
+    """
+    Bounded LRU cache of signature verification results, keyed by the
+    transaction digest and the signature, with hit and miss counters.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.__results = OrderedDict()
+        self.__lock = Lock()
+
+    def __len__(self):
+        return len(self.__results)
+
+    def get(self, key):
+        """
+        Grabs a cached result
+
+        :param key: <tuple> the verification key
+        :return: <bool> the cached result, or None on a miss
+        """
+        with self.__lock:
+            result = self.__results.get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.__results.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        with self.__lock:
+            self.__results[key] = result
+            self.__results.move_to_end(key)
+            if len(self.__results) > self.size:
+                self.__results.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__results.clear()
+            self.hits = 0
+            self.misses = 0
+
+verification_cache = VerificationCache(constant.VERIFICATION_CACHE_SIZE)
+
+# The fields of a transaction. The transaction id, and so a block's Merkle
+# root, covers exactly these, so blocks holding any other field are refused.
+TRANSACTION_FIELDS = frozenset(('sender', 'receiver', 'amount'))
+
 class Transaction(object):
     def __init__(self, sender, receiver, amount):
         self.sender = sender
         self.receiver = receiver
         self.amount = amount
 
+    @classmethod
+    def from_dict(cls, transaction_dict):
+        return cls(
+            transaction_dict['sender'],
+            transaction_dict['receiver'],
+            transaction_dict['amount'])
+
+    @property
+    def id(self):
+        """
+        Creates the content-addressed transaction id, an SHA-256 hash of the
+        canonical json representation
+
+        :return: <str> the transaction id
+        """
+        transaction_json = json.dumps(self.dict, sort_keys=True)
+        return hashlib.sha256(transaction_json.encode()).hexdigest()
+
     def verify_signature(self, signature):
         """
         Verifies the provided signature corresponds to the transaction 
-        object signed by the public key.
+        object signed by the public key. Results are cached, so checking
+        the same transaction and signature again skips the RSA work.
 
         :param signature: <str> signature to verify
         :return: <bool> true if the verification succeeds, false otherwise
         """
-        try:
-            private_key = importKey(unhexlify(signature))
-            public_key = importKey(unhexlify(self.sender))
+        key = self.verification_key(signature)
+        result = verification_cache.get(key)
+        if result is None:
+            result = self.__verify(signature)
+            verification_cache.put(key, result)
+        return result
 
-            signer = new(private_key)
-            verifier = new(public_key)
+    def verification_key(self, signature):
+        """
+        Creates the key verification results are cached under: the digest
+        of the transaction and a hash of the signature
 
-            digest = SHA256.new()
-            digest.update(str(self.dict).encode('utf8'))
+        :param signature: <str> signature to verify
+        :return: <tuple> the verification key
+        """
+        signature_hash = hashlib.sha256(str(signature).encode()).digest()
+        return self.__digest().digest(), signature_hash
+
+    def __verify(self, signature):
+        try:
+            signer = parse_key(signature)
+            verifier = parse_key(self.sender)
+
+            digest = self.__digest()
             sig = signer.sign(digest)
 
             return verifier.verify(digest, sig)
-        except TypeError:
+        except (TypeError, ValueError):
             return False
 
+    def __digest(self):
+        digest = SHA256.new()
+        digest.update(str(self.dict).encode('utf8'))
+        return digest
+
     @property
     def dict(self):
         return {
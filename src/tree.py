@@ -0,0 +1,64 @@
+class BlockTree(object):
+    """
+    Blocks on side branches of the chain, indexed by hash. Every block in
+    the tree has been checked against its parent, which is either in the
+    tree or in the chain. Blocks the chain switches away from come back
+    here, so a later reorganization can switch back without downloading
+    them again.
+    """
+    def __init__(self, depth):
+        self.depth = depth
+        self.__blocks = {}
+
+    def __len__(self):
+        return len(self.__blocks)
+
+    def __contains__(self, block_hash):
+        return block_hash in self.__blocks
+
+    def get(self, block_hash):
+        return self.__blocks.get(block_hash)
+
+    def add(self, block):
+        self.__blocks[block.hash] = block
+
+    def remove(self, block_hash):
+        self.__blocks.pop(block_hash, None)
+
+    def branch(self, block):
+        """
+        Walks back from a block to where its branch leaves the chain.
+
+        :param block: <Block> a block in the tree
+        :return: <list> the branch's blocks, from the first one after the
+        fork to the given block
+        """
+        branch = [block]
+        while branch[-1].prev_hash in self.__blocks:
+            branch.append(self.__blocks[branch[-1].prev_hash])
+        branch.reverse()
+        return branch
+
+    def prune(self, height):
+        """
+        Drops the branches leaving the chain too far below its tip to ever
+        be switched to. A branch goes as a whole, so no block is kept
+        without the blocks linking it to the chain.
+
+        :param height: <int> index of the chain's tip
+        """
+        roots = {}
+        stale = []
+        for block_hash, block in self.__blocks.items():
+            path = []
+            while (block.hash not in roots and
+                block.prev_hash in self.__blocks):
+                path.append(block.hash)
+                block = self.__blocks[block.prev_hash]
+            root = roots.get(block.hash, block)
+            for walked in path + [block.hash]:
+                roots[walked] = root
+            if root.index <= height - self.depth:
+                stale.append(block_hash)
+        for block_hash in stale:
+            del self.__blocks[block_hash]
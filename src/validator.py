@@ -0,0 +1,122 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+import constant
+from block import hash_header
+from miner import is_valid_proof
+
+def validate_headers(headers, trusted = 0):
+    """
+    Checks the hashes, links and proofs of a run of headers inside a worker
+    process.
+
+    :param headers: <list> (index, hash, prev_hash, proof, timestamp,
+    merkle_root) tuples
+    :param trusted: (Optional) <int> number of leading headers whose proofs
+    were already checked, as they link up to a checkpoint. Their hashes
+    and links are still checked.
+    :return: <bool> true if valid, false otherwise
+    """
+    for index, block_hash, prev_hash, proof, timestamp, root in headers:
+        if hash_header(index, timestamp, proof, prev_hash, root) != block_hash:
+            return False
+
+    for position, (prev, curr) in enumerate(zip(headers, headers[1:]), 1):
+        if curr[0] != prev[0] + 1:
+            return False
+
+        if curr[2] != prev[1]:
+            return False
+
+        if position >= trusted and not is_valid_proof(prev[3], curr[3]):
+            return False
+    return True
+
+class ChainValidator(object):
+    """
+    Validates candidate chains from their headers. Long runs are split in
+    overlapping chunks that are checked on a pool of worker processes. Once
+    the blocks behind validated headers have been checked against their
+    hashes, the headers can be remembered as checkpoints, so the proofs of
+    a later candidate are only checked from its last checkpoint on.
+    """
+    def __init__(self, workers = None, chunk_size = None, checkpoints = None):
+        self.workers = workers or constant.VALIDATOR_WORKERS or os.cpu_count()
+        self.chunk_size = chunk_size or constant.VALIDATOR_CHUNK_SIZE
+        self.max_checkpoints = checkpoints or constant.VALIDATOR_CHECKPOINTS
+
+        self.__checkpoints = OrderedDict()
+        self.__lock = Lock()
+        self.__executor = None
+
+    def validate(self, headers):
+        """
+        Determines a given run of block headers is valid
+
+        :param headers: <list> block headers, as returned by Block.header
+        :return: <bool> true if valid, false otherwise
+        """
+        try:
+            rows = [(h['index'], h['hash'], h['prev_hash'], h['proof'],
+                h['timestamp'], h['merkle_root']) for h in headers]
+        except KeyError:
+            return False
+        trusted = self.__last_checkpoint(headers) + 1
+
+        if len(rows) <= self.chunk_size:
+            valid = validate_headers(rows, trusted)
+        else:
+            # Consecutive chunks share a header so every link is checked
+            starts = range(0, len(rows) - 1, self.chunk_size)
+            chunks = [rows[i:i + self.chunk_size + 1] for i in starts]
+            valid = all(self.__get_executor().map(validate_headers, chunks,
+                [max(0, trusted - i) for i in starts]))
+        return valid
+
+    def remember(self, headers):
+        """
+        Keeps the hash of every chunk_size-th header and of the last one as
+        checkpoints, evicting the oldest ones past the limit.
+
+        :param headers: <list> validated headers of verified blocks
+        """
+        if not headers:
+            return
+
+        hashes = [h['hash'] for h in headers[::self.chunk_size]]
+        hashes.append(headers[-1]['hash'])
+        with self.__lock:
+            for block_hash in hashes:
+                self.__checkpoints[block_hash] = True
+                self.__checkpoints.move_to_end(block_hash)
+            while len(self.__checkpoints) > self.max_checkpoints:
+                self.__checkpoints.popitem(last=False)
+
+    def is_checkpoint(self, block_hash):
+        return block_hash in self.__checkpoints
+
+    def close(self):
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    def __last_checkpoint(self, headers):
+        """
+        Finds the last header that was already validated. Once the hashes
+        and links up to it check out, the headers before it are the ones
+        validated then, so their proofs need no second look.
+
+        :param headers: <list> block headers
+        :return: <int> position of the header, -1 if there is none
+        """
+        for position in range(len(headers) - 1, -1, -1):
+            if headers[position]['hash'] in self.__checkpoints:
+                return position
+        return -1
+
+    def __get_executor(self):
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(self.workers)
+        return self.__executor
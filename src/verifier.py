@@ -0,0 +1,89 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+import constant
+import metrics
+from transaction import Transaction, verification_cache
+
+SIGNATURES = metrics.counter('doubloon_signatures_total',
+    'Signatures checked by the verifier, by where the result came from')
+BATCH_SECONDS = metrics.histogram('doubloon_verifier_batch_seconds',
+    'Time to check the cache misses of a batch on the worker pool')
+
+def verify_batch(items):
+    """
+    Verifies a batch of signatures inside a worker process.
+
+    :param items: <list> (transaction dict, signature) pairs
+    :return: <list> <bool> result of each verification
+    """
+    return [Transaction.from_dict(transaction).verify_signature(signature)
+        for transaction, signature in items]
+
+class Verifier(object):
+    """
+    Checks transaction signatures on a pool of worker processes, so that
+    RSA work runs on every core instead of the request thread.
+    """
+    def __init__(self, workers = None, chunk_size = None):
+        self.workers = workers or constant.VERIFIER_WORKERS or os.cpu_count()
+        self.chunk_size = chunk_size or constant.VERIFIER_CHUNK_SIZE
+        self.__executor = None
+
+    def verify(self, transaction, signature):
+        """
+        Verifies a single signature on the worker pool.
+
+        :param transaction: <dict> the transaction
+        :param signature: <str> signature to verify
+        :return: <bool> true if the verification succeeds, false otherwise
+        """
+        return self.verify_many([(transaction, signature)])[0]
+
+    def verify_many(self, items):
+        """
+        Verifies many signatures, split in chunks across the worker pool.
+        Results already in the verification cache are answered without
+        going to the pool, and new results are added to it.
+
+        :param items: <list> (transaction dict, signature) pairs
+        :return: <list> <bool> result of each verification, in order
+        """
+        results = []
+        missing = []
+        for transaction, signature in items:
+            key = Transaction.from_dict(transaction).verification_key(
+                signature)
+            results.append(verification_cache.get(key))
+            if results[-1] is None:
+                missing.append((len(results) - 1, key))
+        SIGNATURES.inc(len(items) - len(missing), source='cache')
+        if not missing:
+            return results
+        SIGNATURES.inc(len(missing), source='pool')
+
+        misses = [items[position] for position, _ in missing]
+        chunks = [misses[i:i + self.chunk_size]
+            for i in range(0, len(misses), self.chunk_size)]
+
+        start = perf_counter()
+        verified = []
+        for chunk in self.__get_executor().map(verify_batch, chunks):
+            verified.extend(chunk)
+        BATCH_SECONDS.observe(perf_counter() - start)
+
+        for (position, key), result in zip(missing, verified):
+            verification_cache.put(key, result)
+            results[position] = result
+        return results
+
+    def close(self):
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    def __get_executor(self):
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(self.workers)
+        return self.__executor
@@ -2,12 +2,21 @@ from Crypto import Random
 from Crypto.PublicKey.RSA import generate
 from binascii import hexlify
 
+def new_key():
+    """
+    Generates a fresh RSA keypair. This is slow and its duration varies a
+    lot, see KeyPool for keeping keys ready ahead of time.
+
+    :return: <RSAobj> the private key
+    """
+    rng = Random.new().read
+    return generate(1024, rng)
+
 class Wallet(object):
-    def __init__(self, id):
+    def __init__(self, id, key = None):
         self.id = id
 
-        rng = Random.new().read
-        self.pri_key = generate(1024, rng)
+        self.pri_key = new_key() if key is None else key
         self.pub_key = self.pri_key.publickey()
 
     @property
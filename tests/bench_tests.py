@@ -0,0 +1,81 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from unittest import TestCase
+
+from bench.cluster import Cluster, topology
+from bench.runner import Settings, compare, measure, run_benchmarks
+
+def results(**per_op):
+    return {'results': {name: {'per_op': value}
+        for name, value in per_op.items()}}
+
+class BenchTests(TestCase):
+    def test_compare(self):
+        baseline = results(a=1.0, b=1.0, c=1.0, d=1.0)
+        current = results(a=1.05, b=1.5, c=0.5, e=1.0)
+
+        rows = {row[0]: row for row in compare(baseline, current, 0.1)}
+
+        self.assertEqual(rows['a'][4], 'ok')
+        self.assertEqual(rows['b'][4], 'regression')
+        self.assertAlmostEqual(rows['b'][3], 1.5)
+        self.assertEqual(rows['c'][4], 'improvement')
+        self.assertEqual(rows['d'][4], 'missing')
+        self.assertEqual(rows['e'][4], 'new')
+
+    def test_run_benchmarks(self):
+        settings = Settings(blocks=3, transactions=2, mempool=10)
+        self.addCleanup(settings.close)
+
+        report = run_benchmarks(settings, ['block_hash', 'resolve',
+            'mempool_select'], warmup=0, repeat=2)
+
+        self.assertEqual(report['settings'], settings.dict)
+        self.assertEqual(set(report['results']),
+            {'block_hash', 'resolve', 'mempool_select'})
+        resolve = report['results']['resolve']
+        self.assertEqual(resolve['repeat'], 2)
+        self.assertEqual(resolve['ops'], 4)
+        self.assertLessEqual(resolve['min'], resolve['median'])
+
+    def test_measure_cleans_up_every_run(self):
+        states = []
+        case = {
+            'run': lambda state: None,
+            'setup': lambda: len(states),
+            'cleanup': states.append
+        }
+
+        self.assertEqual(len(measure(case, warmup=1, repeat=2)), 2)
+        self.assertEqual(states, [0, 1, 2])
+
+class ClusterTests(TestCase):
+    def test_topology(self):
+        self.assertEqual(topology('full', 3), {(0, 1), (0, 2), (1, 2)})
+        self.assertEqual(topology('ring', 3), {(0, 1), (1, 2), (0, 2)})
+        self.assertEqual(topology('star', 3), {(0, 1), (0, 2)})
+        self.assertRaises(ValueError, topology, 'mesh', 3)
+
+        links = topology('random', 10, degree=3)
+        for node in range(10):
+            self.assertGreaterEqual(
+                sum(node in link for link in links), 3)
+
+    def test_run(self):
+        cluster = Cluster(3, 'ring')
+        try:
+            genesis = {app.blockchain.chain[0].hash for app in cluster.apps}
+            self.assertEqual(len(genesis), 1)
+            self.assertEqual(cluster.apps[0].blockchain.peers,
+                {'node1:80', 'node2:80'})
+
+            result = cluster.run(2, 2, timeout=10)
+        finally:
+            cluster.close()
+
+        self.assertEqual(result['unreached'], 0)
+        self.assertEqual(result['transactions']['accepted'], 4)
+        self.assertEqual(result['height'], 3)
+        self.assertIsNotNone(result['convergence'])
+        self.assertGreater(result['messages']['/blocks/receive'], 0)
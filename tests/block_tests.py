@@ -1,9 +1,13 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
 from unittest import TestCase
 
 import json
 import hashlib
 
 from src.block import Block
+from src.merkle import EMPTY_ROOT
 
 class BlockTests(TestCase):
     def setUp(self):
@@ -27,8 +31,83 @@ class BlockTests(TestCase):
         self.assertEqual(self.block.dict, block_dict)
 
     def test_hash(self):
-        block_data = json.dumps(self.block.dict, sort_keys=True).encode()
-        block_hash = hashlib.sha256(block_data).hexdigest()
+        header = {
+            'index': 1,
+            'timestamp': self.time,
+            'proof': 0,
+            'prev_hash': 100,
+            'merkle_root': EMPTY_ROOT
+        }
+        header_data = json.dumps(header, sort_keys=True).encode()
+        block_hash = hashlib.sha256(header_data).hexdigest()
 
         self.assertEqual(len(block_hash), 64)
-        self.assertEqual(block_hash, self.block.hash)
\ No newline at end of file
+        self.assertEqual(block_hash, self.block.hash)
+
+    def test_hash_covers_transactions_through_root(self):
+        transactions = [{'sender': 'a', 'receiver': 'b', 'amount': 1}]
+        block = Block(2, transactions, 5, self.block.hash, self.time)
+        block_hash = block.hash
+        root = block.merkle_root
+
+        transactions[0]['amount'] = 2
+        self.assertNotEqual(block.merkle_root, root)
+        self.assertNotEqual(block.hash, block_hash)
+        self.assertEqual(block.header['merkle_root'], block.merkle_root)
+
+    def test_seal_caches_hash(self):
+        block = Block(2, [{'sender': 'a', 'receiver': 'b', 'amount': 1}], 5,
+            self.block.hash)
+        block_hash = block.hash
+
+        self.assertIs(block.seal(), block)
+        self.assertTrue(block.sealed)
+        self.assertEqual(block.hash, block_hash)
+        self.assertEqual(block.serialized,
+            json.dumps(block.dict, sort_keys=True).encode())
+
+    def test_sealed_block_rejects_changes(self):
+        block = Block(2, [{'sender': 'a', 'receiver': 'b', 'amount': 1}], 5,
+            self.block.hash).seal()
+
+        with self.assertRaises(AttributeError):
+            block.proof = 6
+        with self.assertRaises(AttributeError):
+            block.transactions.append({})
+        with self.assertRaises(AttributeError):
+            del block.index
+        self.assertEqual(block.proof, 5)
+
+    def test_seal_copies_transactions(self):
+        transactions = [{'sender': 'a', 'receiver': 'b', 'amount': 1}]
+        block = Block(2, transactions, 5, self.block.hash).seal()
+        block_hash = block.hash
+
+        transactions[0]['amount'] = 100
+        transactions.append({})
+
+        self.assertEqual(block.dict['transactions'],
+            [{'sender': 'a', 'receiver': 'b', 'amount': 1}])
+        self.assertEqual(block.hash, block_hash)
+
+    def test_seal_rejects_other_fields(self):
+        transaction = {'sender': 'a', 'receiver': 'b', 'amount': 1}
+        for bad in (dict(transaction, memo='x'), {'sender': 'a',
+            'receiver': 'b'}):
+            with self.assertRaises(ValueError):
+                Block(2, [transaction, bad], 5, self.block.hash).seal()
+
+    def test_sealed_transactions_are_read_only(self):
+        block = Block(2, [{'sender': 'a', 'receiver': 'b', 'amount': 1}], 5,
+            self.block.hash).seal()
+        block_hash = block.hash
+        root = block.merkle_root
+
+        with self.assertRaises(TypeError):
+            block.transactions[0]['amount'] = 100
+        block.dict['transactions'][0]['amount'] = 100
+
+        self.assertEqual(block.transactions[0]['amount'], 1)
+        self.assertEqual(Block.from_dict(block.dict).seal().hash, block_hash)
+        self.assertEqual(block.merkle_root, root)
+        self.assertEqual(block.hash, block_hash)
\ No newline at end of file
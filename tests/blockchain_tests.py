@@ -1,17 +1,114 @@
 import sys
 sys.path.append(sys.path[0] + '/src')
 
+import json
+import os
+import pickle
+from tempfile import TemporaryDirectory
+from threading import Event
+from time import sleep
 from unittest import TestCase
 
-from src.blockchain import Blockchain
+from src.blockchain import (Blockchain, BLOCK_ACCEPTED, BLOCK_KNOWN,
+    BLOCK_ORPHAN, BLOCK_STALE, BLOCK_INVALID)
+from src.block import Block
+from src.transaction import Transaction
+from src.merkle import verify_proof
+from src.index import save_snapshot, snapshot_state
+from src.peer import PeerClient
+from src import codec
 from src import constant
 
 PUBLIC_KEY = '30819f300d06092a864886f70d010101050003818d0030818902818100d99c9347b6ecd418b1df48012201c5bd2869a707e45dee91a5c63027dc8020210aa4cf6e34e81fc200f29c893add94fefbf37594a964641fc52f8905280c4d93457d4cee5fb216a09a9e8688c62e26bc9e962357c019c5e6c73818f155b87ccaa70059cfa0698c85f5d982bef73bc84e6dfac540cf4f43308b799b8439c1011d0203010001'
 PRIVATE_KEY = '3082025b02010002818100d99c9347b6ecd418b1df48012201c5bd2869a707e45dee91a5c63027dc8020210aa4cf6e34e81fc200f29c893add94fefbf37594a964641fc52f8905280c4d93457d4cee5fb216a09a9e8688c62e26bc9e962357c019c5e6c73818f155b87ccaa70059cfa0698c85f5d982bef73bc84e6dfac540cf4f43308b799b8439c1011d02030100010281802b55c5f2a317f888ce6b33909e30122bc02f8206cd507360e7cd56eba93a8eab65ce3a4cad1688b47eb1d1c0764b880f5b273984185398a8c700d75d828328b34bffe18565d9145a0db7aef152a9452642acc0518ccfa224287ba38fabb93a51f0da4db17b82a0ca12b6b69ff1c7b172061ce60ae9665b064ee21490e5cd0215024100db115ac3a95d00bdeabb429f841100d2786ab0849753eed0e0208020e8fe2e5d7e171d69d7552a9adee2840e846e56a6b1452c3a7b7c330f02595b3479f815cf024100fe4c5fe8c71d1e746d83b9bd9021d1fd6027090382321421f432ffabc713fca58cf1d116108e493a7b98854be96c761300a891f281db40ffdb9edc09cb29e15302404ca9f3209c299ef3d7acb6f10a0fc540e2c13b8afb46754205dd79d98a90417b987fd05c54ee4a1daeb888cc67ce1166fe8c9da0cdcc36361f7553f4b6667a830240675e845e0b123b1ef8a5630b3b5b84108ad55344a9d7d1773bdcbf31046b8b7780238bea7c305a73fb69b445774d2f71ea029bd108182803d9326a1f51066521024052b9850ce79b3b2f2eeb481999d65426089fa3680fd35568e5010ba0121e37cf10c64ecc20843a26a09c5d5eefbb35a43061cd33b7adca63965d7dbfcedf6544'
 
+class FakeResponse(object):
+    def __init__(self, body, lines = None, content_type = 'application/json',
+        status_code = 200, etag = None):
+        self.status_code = status_code
+        self.body = body
+        self.lines = lines
+        self.headers = {'Content-Type': content_type}
+        if etag is not None:
+            self.headers['ETag'] = etag
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def json(self):
+        return self.body
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def iter_content(self, chunk_size):
+        data = b''.join(self.lines)
+        return (data[i:i + 7] for i in range(0, len(data), 7))
+
+class FakePeerClient(object):
+    """
+    Stands in for a PeerClient, answering /headers and /chain from another
+    Blockchain without a network.
+    """
+    def __init__(self, peer_chain, accept = None):
+        self.peer_chain = peer_chain
+        self.accept = accept
+        self.requests = []
+        self.announced = []
+        self.not_modified = 0
+
+    def map(self, peers, fetch):
+        results = {}
+        for peer in peers:
+            result = fetch(peer)
+            if result is not None:
+                results[peer] = result
+        return results
+
+    def broadcast(self, peers, send):
+        self.announced.extend(peers)
+
+    def close(self):
+        pass
+
+    def get(self, peer, path, params, headers = {}, stream = False):
+        self.requests.append((path, params['start']))
+        etag = f'"{self.peer_chain.last_block.hash}:{params["start"]}"'
+        if path == '/headers' and headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return FakeResponse(None, status_code=304)
+
+        blocks = list(self.peer_chain.blocks_from(params['start']))
+        body = {'length': len(self.peer_chain.chain)}
+        if path == '/headers':
+            body['headers'] = [block.header for block in blocks]
+            return FakeResponse(body, etag=etag)
+        elif self.accept == constant.BINARY:
+            return FakeResponse(None, [codec.encode_record(block) 
+                for block in blocks], constant.BINARY)
+        elif self.accept == constant.NDJSON:
+            return FakeResponse(None, [block.serialized for block in blocks],
+                constant.NDJSON)
+        else:
+            body['chain'] = [block.dict for block in blocks]
+        return FakeResponse(body)
+
+def mine(blockchain, count):
+    for _ in range(count):
+        proof = blockchain.proof_of_work(blockchain.last_block.proof)
+        blockchain.add_block(proof)
+
+def share_genesis(blockchain, other):
+    del blockchain.chain[0:]
+    blockchain.chain.append(other.chain[0])
+
 class BlockchainTest(TestCase):
     def setUp(self):
         self.blockchain = Blockchain()
+        self.addCleanup(self.blockchain.close)
 
 class BlockchainSetupTests(BlockchainTest):
     def test_init(self):
@@ -42,6 +139,27 @@ class BlockchainBlockTests(BlockchainTest):
         }
         self.assertEqual(result, block_dict)
 
+    def test_blocks_from(self):
+        self.blockchain.add_block(10, 20)
+        self.blockchain.add_block(11, 21)
+
+        self.assertEqual([b.index for b in self.blockchain.blocks_from(2)],
+            [2, 3])
+        self.assertEqual([b.index for b in self.blockchain.blocks_from(1, 2)],
+            [1, 2])
+        self.assertEqual(list(self.blockchain.blocks_from(4)), [])
+
+        blocks = self.blockchain.blocks_from(1, length=2)
+        self.blockchain.add_block(12, 22)
+        self.assertEqual([b.index for b in blocks], [1, 2])
+
+    def test_find_block(self):
+        self.blockchain.add_block(10)
+        block = self.blockchain.chain[0]
+
+        self.assertIs(self.blockchain.find_block(block.hash), block)
+        self.assertIsNone(self.blockchain.find_block('unknown'))
+
     def test_last_block_points_to_end(self):
         self.assertEqual(self.blockchain.last_block, 
             self.blockchain.chain[0])
@@ -62,11 +180,79 @@ class BlockchainTransactionTests(BlockchainTest):
             PRIVATE_KEY)
         self.assertEqual(result, 2)
 
+    def test_add_duplicate_transaction_fails(self):
+        self.blockchain.add_transaction(PUBLIC_KEY, 'receiver', 3,
+            PRIVATE_KEY)
+        result = self.blockchain.add_transaction(PUBLIC_KEY, 'receiver', 3,
+            PRIVATE_KEY)
+        self.assertEqual(result, -1)
+        self.assertEqual(len(self.blockchain.current_transactions), 1)
+
+    def test_add_transactions(self):
+        results = self.blockchain.add_transactions([
+            (PUBLIC_KEY, 'receiver', 1, PRIVATE_KEY),
+            (PUBLIC_KEY, 'receiver', 2, PUBLIC_KEY),
+            (constant.MINER_KEY, 'receiver', 3, ''),
+            (PUBLIC_KEY, 'receiver', 1, PRIVATE_KEY)])
+
+        self.assertEqual(results, [2, -1, 2, -1])
+        self.assertEqual(len(self.blockchain.current_transactions), 2)
+
+    def test_add_block_takes_pending_transactions(self):
+        self.blockchain.add_transaction(PUBLIC_KEY, 'receiver', 3,
+            PRIVATE_KEY)
+        block = self.blockchain.add_block(10)
+
+        self.assertEqual(len(block['transactions']), 1)
+        self.assertEqual(self.blockchain.current_transactions, [])
+
     def test_add_regular_transaction_with_invalid_private_key_fails(self):
         result = self.blockchain.add_transaction(PUBLIC_KEY, 'receiver', 3,
             PUBLIC_KEY)
         self.assertEqual(result, -1)
 
+    def test_add_block_updates_balances(self):
+        self.blockchain.add_transaction(constant.MINER_KEY, 'receiver', 3,
+            '')
+        self.blockchain.add_block(10)
+
+        self.assertEqual(self.blockchain.balances.get('receiver'), 3)
+
+    def test_find_transaction(self):
+        self.blockchain.add_transaction(constant.MINER_KEY, 'receiver', 3,
+            '')
+        self.blockchain.add_block(10)
+        transaction = Transaction(constant.MINER_KEY, 'receiver', 3)
+
+        self.assertEqual(self.blockchain.find_transaction(transaction.id),
+            [(2, 0, transaction.dict)])
+        self.assertEqual(self.blockchain.find_transaction('unknown'), [])
+
+    def test_transaction_proof(self):
+        for amount in range(3):
+            self.blockchain.add_transaction(constant.MINER_KEY, 'receiver',
+                amount, '')
+        self.blockchain.add_block(10)
+        transaction = Transaction(constant.MINER_KEY, 'receiver', 2)
+
+        proof = self.blockchain.transaction_proof(transaction.id)
+        self.assertEqual(proof['header'], self.blockchain.last_block.header)
+        self.assertTrue(verify_proof(transaction.id, proof['proof'],
+            proof['header']['merkle_root']))
+        self.assertIsNone(self.blockchain.transaction_proof(transaction.id, 1))
+        self.assertIsNone(self.blockchain.transaction_proof('unknown'))
+
+    def test_address_transactions(self):
+        for amount in range(3):
+            self.blockchain.add_transaction(constant.MINER_KEY, 'receiver',
+                amount, '')
+            self.blockchain.add_block(10)
+
+        page, total = self.blockchain.address_transactions('receiver', 1, 1)
+        self.assertEqual(total, 3)
+        self.assertEqual(page, [(3, 0, 
+            Transaction(constant.MINER_KEY, 'receiver', 1).dict)])
+
 class BlockchainPeerTests(BlockchainTest):
     def test_add_peer_succeeds(self):
         result1 = self.blockchain.add_peer('http://127.0.0.1:9000')
@@ -94,4 +280,414 @@ class BlockchainPeerTests(BlockchainTest):
 
 class BlockchainProofTests(BlockchainTest):
     def test_proof_of_work(self):
-        self.assertEqual(self.blockchain.proof_of_work(100), 33575)
\ No newline at end of file
+        self.assertEqual(self.blockchain.proof_of_work(100), 33575)
+
+class BlockchainResolveTests(BlockchainTest):
+    def setUp(self):
+        super().setUp()
+        self.blockchain.miner.workers = 1
+        self.peer_chain = Blockchain()
+        self.addCleanup(self.peer_chain.close)
+        self.peer_chain.miner.workers = 1
+        share_genesis(self.peer_chain, self.blockchain)
+
+        self.blockchain.peer_client = FakePeerClient(self.peer_chain)
+        self.blockchain.add_peer('http://127.0.0.1:9000')
+
+    def test_resolve_fetches_only_missing_blocks(self):
+        mine(self.peer_chain, 2)
+        self.assertTrue(self.blockchain.resolve())
+        self.assertEqual(self.blockchain.last_block.hash,
+            self.peer_chain.last_block.hash)
+
+        requests = self.blockchain.peer_client.requests
+        requests.clear()
+        mine(self.peer_chain, 1)
+
+        self.assertTrue(self.blockchain.resolve())
+        self.assertEqual(len(self.blockchain.chain), 4)
+        self.assertEqual(self.blockchain.last_block.hash,
+            self.peer_chain.last_block.hash)
+        self.assertIn(('/chain', 4), requests)
+        self.assertNotIn(('/chain', 1), requests)
+
+    def test_resolve_keeps_peer_not_ahead_healthy(self):
+        fake = self.blockchain.peer_client
+        client = PeerClient()
+        client.get = fake.get
+        self.blockchain.peer_client = client
+
+        self.assertFalse(self.blockchain.resolve())
+        health = client.report(self.blockchain.peers)['127.0.0.1:9000']
+        self.assertTrue(health['healthy'])
+        self.assertEqual(health['failures'], 0)
+        client.close()
+
+    def test_slow_download_outlasts_round_deadline(self):
+        mine(self.peer_chain, 2)
+        fake = self.blockchain.peer_client
+        client = PeerClient()
+        def get(peer, path, **kwargs):
+            if path == '/chain':
+                sleep(0.3)
+            return fake.get(peer, path, **kwargs)
+        client.get = get
+        round = client.map
+        client.map = lambda peers, fetch: round(peers, fetch, 0.2)
+        self.blockchain.peer_client = client
+
+        self.assertTrue(self.blockchain.resolve())
+        self.assertEqual(self.blockchain.last_block.hash,
+            self.peer_chain.last_block.hash)
+        health = client.report(self.blockchain.peers)['127.0.0.1:9000']
+        self.assertEqual(health['failures'], 0)
+        client.close()
+
+    def test_resolve_sends_conditional_requests(self):
+        self.assertFalse(self.blockchain.resolve())
+        self.assertFalse(self.blockchain.resolve())
+        self.assertEqual(self.blockchain.peer_client.not_modified, 1)
+
+        mine(self.peer_chain, 1)
+        self.assertTrue(self.blockchain.resolve())
+        self.assertEqual(self.blockchain.last_block.hash,
+            self.peer_chain.last_block.hash)
+
+    def test_resolve_reads_every_format(self):
+        mine(self.peer_chain, 2)
+        for accept in (constant.BINARY, constant.NDJSON, 'application/json'):
+            blockchain = Blockchain()
+            self.addCleanup(blockchain.close)
+            blockchain.miner.workers = 1
+            share_genesis(blockchain, self.blockchain)
+            blockchain.peer_client = FakePeerClient(self.peer_chain, accept)
+            blockchain.add_peer('http://127.0.0.1:9000')
+
+            self.assertTrue(blockchain.resolve())
+            self.assertEqual(blockchain.last_block.hash,
+                self.peer_chain.last_block.hash)
+
+    def test_resolve_replaces_fork(self):
+        mine(self.blockchain, 1)
+        self.peer_chain.add_transaction(constant.MINER_KEY, 'peer', 1, '')
+        mine(self.peer_chain, 2)
+
+        self.assertTrue(self.blockchain.resolve())
+        self.assertEqual([b.hash for b in self.blockchain.chain],
+            [b.hash for b in self.peer_chain.chain])
+
+    def test_resolve_rolls_balances_back(self):
+        self.blockchain.add_transaction(constant.MINER_KEY, 'us', 1, '')
+        mine(self.blockchain, 1)
+        self.assertEqual(self.blockchain.balances.get('us'), 1)
+
+        self.peer_chain.add_transaction(constant.MINER_KEY, 'peer', 1, '')
+        mine(self.peer_chain, 2)
+        self.blockchain.resolve()
+
+        self.assertEqual(self.blockchain.balances.get('us'), 0)
+        self.assertEqual(self.blockchain.balances.get('peer'), 1)
+
+    def test_resolve_returns_dropped_transactions_to_mempool(self):
+        self.blockchain.add_transaction(PUBLIC_KEY, 'receiver', 3,
+            PRIVATE_KEY)
+        mine(self.blockchain, 1)
+        mine(self.peer_chain, 2)
+
+        self.blockchain.resolve()
+        self.assertEqual(self.blockchain.current_transactions, [
+            Transaction(PUBLIC_KEY, 'receiver', 3).dict])
+
+    def test_resolve_keeps_longer_chain(self):
+        mine(self.blockchain, 2)
+        mine(self.peer_chain, 1)
+
+        self.assertFalse(self.blockchain.resolve())
+        self.assertEqual(len(self.blockchain.chain), 3)
+
+class BlockchainGossipTests(BlockchainTest):
+    def setUp(self):
+        super().setUp()
+        self.blockchain.miner.workers = 1
+        self.peer_chain = Blockchain()
+        self.addCleanup(self.peer_chain.close)
+        self.peer_chain.miner.workers = 1
+        share_genesis(self.peer_chain, self.blockchain)
+
+        self.blockchain.peer_client = FakePeerClient(self.peer_chain)
+        self.blockchain.add_peer('http://127.0.0.1:9000')
+        self.blockchain.add_peer('http://127.0.0.1:9001')
+
+    def test_receive_extends_tip(self):
+        mine(self.peer_chain, 1)
+        block = self.peer_chain.last_block.dict
+
+        self.assertEqual(self.blockchain.receive_block(block,
+            '127.0.0.1:9000'), BLOCK_ACCEPTED)
+        self.assertEqual(self.blockchain.last_block.hash,
+            self.peer_chain.last_block.hash)
+        self.assertEqual(self.blockchain.peer_client.requests, [])
+        self.assertEqual(self.blockchain.peer_client.announced,
+            ['127.0.0.1:9001'])
+
+        self.assertEqual(self.blockchain.receive_block(block), BLOCK_KNOWN)
+
+    def test_receive_rejects_bad_blocks(self):
+        self.peer_chain.add_transaction(constant.MINER_KEY, 'peer', 1, '')
+        mine(self.peer_chain, 1)
+        block = self.peer_chain.last_block.dict
+        block['proof'] += 1
+
+        self.assertEqual(self.blockchain.receive_block(block), BLOCK_INVALID)
+        self.assertEqual(self.blockchain.receive_block({'index': 2}),
+            BLOCK_INVALID)
+
+        # A field outside the transaction id is not covered by the hash
+        block = self.peer_chain.last_block.dict
+        block['transactions'][0]['memo'] = 'unsigned'
+        self.assertEqual(self.blockchain.receive_block(block), BLOCK_INVALID)
+        self.assertEqual(len(self.blockchain.chain), 1)
+
+    def test_receive_stale_block(self):
+        mine(self.blockchain, 1)
+        self.peer_chain.add_transaction(constant.MINER_KEY, 'peer', 1, '')
+        mine(self.peer_chain, 1)
+
+        self.assertEqual(self.blockchain.receive_block(
+            self.peer_chain.last_block.dict), BLOCK_STALE)
+
+    def test_longer_side_branch_reorganizes(self):
+        self.blockchain.add_transaction(constant.MINER_KEY, 'ours', 5, '')
+        mine(self.blockchain, 1)
+        ours = self.blockchain.last_block.hash
+        self.peer_chain.add_transaction(constant.MINER_KEY, 'peer', 1, '')
+        mine(self.peer_chain, 2)
+        blocks = [block.dict for block in self.peer_chain.chain[1:]]
+
+        self.assertEqual(self.blockchain.receive_block(blocks[0]),
+            BLOCK_STALE)
+        self.assertEqual(len(self.blockchain.tree), 1)
+        self.assertEqual(self.blockchain.last_block.hash, ours)
+
+        self.assertEqual(self.blockchain.receive_block(blocks[1]),
+            BLOCK_ACCEPTED)
+        self.assertEqual(self.blockchain.last_block.hash,
+            self.peer_chain.last_block.hash)
+        self.assertIn(ours, self.blockchain.tree)
+        self.assertIsNone(self.blockchain.find_block(ours))
+        self.assertEqual(self.blockchain.balances.get('ours'), 0)
+        self.assertEqual(self.blockchain.balances.get('peer'), 1)
+
+    def test_reorganizes_back_to_kept_branch(self):
+        mine(self.blockchain, 1)
+        ours = Block.from_dict(self.blockchain.last_block.dict).seal()
+        self.peer_chain.add_transaction(constant.MINER_KEY, 'peer', 1, '')
+        mine(self.peer_chain, 2)
+        for block in self.peer_chain.chain[1:]:
+            self.blockchain.receive_block(block.dict)
+        self.assertIn(ours.hash, self.blockchain.tree)
+
+        branch = Blockchain()
+        self.addCleanup(branch.close)
+        branch.miner.workers = 1
+        share_genesis(branch, self.blockchain)
+        branch.chain.append(ours)
+        mine(branch, 2)
+        for block in branch.chain[2:]:
+            self.blockchain.receive_block(block.dict)
+
+        self.assertEqual(self.blockchain.last_block.hash,
+            branch.last_block.hash)
+        self.assertEqual(self.blockchain.chain[1].hash, ours.hash)
+        self.assertEqual(len(self.blockchain.tree), 2)
+
+    def test_branch_not_reaching_chain_is_not_switched_to(self):
+        self.blockchain.peers.clear()
+        mine(self.peer_chain, 3)
+        blocks = self.peer_chain.chain[1:]
+
+        # A branch whose first block's parent is missing
+        self.blockchain.tree.add(Block.from_dict(blocks[1].dict).seal())
+        self.assertEqual(self.blockchain.receive_block(blocks[2].dict),
+            BLOCK_ORPHAN)
+        self.assertEqual(len(self.blockchain.chain), 1)
+        self.assertNotIn(blocks[2].hash, self.blockchain.tree)
+
+        self.assertEqual(self.blockchain.receive_block(blocks[0].dict),
+            BLOCK_ACCEPTED)
+        self.assertEqual(self.blockchain.last_block.hash, blocks[2].hash)
+
+    def test_orphans_connect_when_parent_arrives(self):
+        self.blockchain.peers.clear()
+        mine(self.peer_chain, 3)
+        blocks = [block.dict for block in self.peer_chain.chain[1:]]
+
+        self.assertEqual(self.blockchain.receive_block(blocks[2]),
+            BLOCK_ORPHAN)
+        self.assertEqual(self.blockchain.receive_block(blocks[1]),
+            BLOCK_ORPHAN)
+        self.assertEqual(self.blockchain.receive_block(blocks[0]),
+            BLOCK_ACCEPTED)
+        self.assertEqual(len(self.blockchain.chain), 4)
+        self.assertEqual(self.blockchain.last_block.hash,
+            self.peer_chain.last_block.hash)
+
+    def test_orphan_child_syncs_after_tie(self):
+        self.peer_chain.add_transaction(constant.MINER_KEY, 'peer', 1, '')
+        mine(self.peer_chain, 3)
+        blocks = [block.dict for block in self.peer_chain.chain[2:]]
+        mine(self.blockchain, 1)
+        peers = set(self.blockchain.peers)
+        self.blockchain.peers.clear()
+
+        self.assertEqual(self.blockchain.receive_block(blocks[0]),
+            BLOCK_ORPHAN)
+        mine(self.blockchain, 1)
+        self.blockchain.peers.update(peers)
+
+        self.assertEqual(self.blockchain.receive_block(blocks[1],
+            '127.0.0.1:9000'), BLOCK_ORPHAN)
+        self.blockchain.wait_for_syncs()
+        self.assertEqual(self.blockchain.last_block.hash,
+            self.peer_chain.last_block.hash)
+
+    def test_gap_syncs_with_announcing_peer(self):
+        mine(self.peer_chain, 3)
+
+        self.assertEqual(self.blockchain.receive_block(
+            self.peer_chain.last_block.dict, '127.0.0.1:9000'), BLOCK_ORPHAN)
+        self.blockchain.wait_for_syncs()
+        self.assertEqual(self.blockchain.last_block.hash,
+            self.peer_chain.last_block.hash)
+        self.assertIn(('/chain', 2), self.blockchain.peer_client.requests)
+        self.assertEqual(self.blockchain.peer_client.announced,
+            ['127.0.0.1:9001'])
+
+    def test_gap_from_unregistered_peer_does_not_sync(self):
+        mine(self.peer_chain, 3)
+
+        self.assertEqual(self.blockchain.receive_block(
+            self.peer_chain.last_block.dict, '10.0.0.1:80'), BLOCK_ORPHAN)
+        self.blockchain.wait_for_syncs()
+        self.assertEqual(self.blockchain.peer_client.requests, [])
+        self.assertEqual(len(self.blockchain.chain), 1)
+
+    def test_malformed_orphan_is_rejected(self):
+        mine(self.peer_chain, 3)
+        block = self.peer_chain.last_block.dict
+        for field, value in (('proof', 'x'), ('proof', -1),
+            ('index', 4.0), ('prev_hash', 'not a hash')):
+            self.assertEqual(self.blockchain.receive_block(
+                dict(block, **{field: value}), '127.0.0.1:9000'),
+                BLOCK_INVALID)
+        self.assertEqual(self.blockchain.peer_client.requests, [])
+
+    def test_one_sync_per_peer_at_a_time(self):
+        mine(self.peer_chain, 3)
+        release = Event()
+        fetch = self.blockchain.peer_client.map
+        started = []
+        def map(peers, sync):
+            started.append(peers)
+            release.wait(5)
+            return fetch(peers, sync)
+        self.blockchain.peer_client.map = map
+
+        # The second orphan does not hang off the first, so it finds a gap
+        for block in reversed(self.peer_chain.chain[2:]):
+            self.assertEqual(self.blockchain.receive_block(block.dict,
+                '127.0.0.1:9000'), BLOCK_ORPHAN)
+        release.set()
+        self.blockchain.wait_for_syncs()
+
+        self.assertEqual(started, [['127.0.0.1:9000']])
+        self.assertEqual(self.blockchain.last_block.hash,
+            self.peer_chain.last_block.hash)
+
+class BlockchainStoreTests(TestCase):
+    def test_chain_survives_restart(self):
+        with TemporaryDirectory() as data:
+            path = os.path.join(data, 'chain')
+            blockchain = Blockchain(path)
+            blockchain.add_transaction(constant.MINER_KEY, 'receiver', 3, '')
+            blockchain.add_block(10)
+            tip = blockchain.last_block.hash
+            blockchain.close()
+
+            restarted = Blockchain(path)
+            self.assertEqual(len(restarted.chain), 2)
+            self.assertEqual(restarted.balances.get('receiver'), 3)
+            self.assertEqual(restarted.last_block.hash, tip)
+            restarted.close()
+
+    def test_restart_loads_index_snapshot(self):
+        with TemporaryDirectory() as data:
+            path = os.path.join(data, 'chain')
+            blockchain = Blockchain(path)
+            blockchain.snapshot_interval = 2
+            blockchain.add_transaction(constant.MINER_KEY, 'receiver', 3, '')
+            blockchain.add_block(10)
+            blockchain.add_transaction(constant.MINER_KEY, 'receiver', 4, '')
+            blockchain.add_block(11)
+            second = blockchain.chain[1].hash
+            blockchain.close()
+            self.assertTrue(os.path.exists(path + '.indexes'))
+
+            # Only the block after the snapshot is replayed
+            blockchain.balances.balances['receiver'] = 100
+            save_snapshot(path + '.indexes', 2, second,
+                blockchain.balances, blockchain.lookup)
+            restarted = Blockchain(path)
+            self.assertEqual(restarted.balances.get('receiver'), 104)
+            self.assertEqual(restarted.find_block(
+                restarted.last_block.hash).index, 3)
+            restarted.close()
+
+    def test_index_snapshot_is_plain_json(self):
+        with TemporaryDirectory() as data:
+            path = os.path.join(data, 'chain')
+            blockchain = Blockchain(path)
+            blockchain.snapshot_interval = 2
+            blockchain.add_transaction(constant.MINER_KEY, 'receiver', 3, '')
+            blockchain.add_block(10)
+            blockchain.close()
+
+            with open(path + '.indexes') as file:
+                state = json.load(file)
+            self.assertEqual(state['height'], 2)
+            self.assertEqual(state['balances'], {'receiver': 3})
+
+            # A snapshot that is not json is ignored rather than run
+            with open(path + '.indexes', 'wb') as file:
+                pickle.dump({'height': 2}, file)
+            restarted = Blockchain(path)
+            self.assertEqual(restarted.balances.get('receiver'), 3)
+            restarted.close()
+
+    def test_index_snapshot_copies_the_indexes(self):
+        blockchain = Blockchain()
+        self.addCleanup(blockchain.close)
+        blockchain.add_transaction(constant.MINER_KEY, 'receiver', 3, '')
+        blockchain.add_block(10)
+        state = snapshot_state(2, blockchain.last_block.hash,
+            blockchain.balances, blockchain.lookup)
+
+        blockchain.add_transaction(constant.MINER_KEY, 'receiver', 4, '')
+        blockchain.add_block(11)
+        self.assertEqual(state['balances'], {'receiver': 3})
+        self.assertEqual(len(state['addresses']['receiver']), 1)
+
+    def test_restart_ignores_stale_index_snapshot(self):
+        with TemporaryDirectory() as data:
+            path = os.path.join(data, 'chain')
+            blockchain = Blockchain(path)
+            blockchain.add_transaction(constant.MINER_KEY, 'receiver', 3, '')
+            blockchain.add_block(10)
+            blockchain.close()
+            blockchain.balances.balances['receiver'] = 100
+            save_snapshot(path + '.indexes', 2, 'not in the chain',
+                blockchain.balances, blockchain.lookup)
+
+            restarted = Blockchain(path)
+            self.assertEqual(restarted.balances.get('receiver'), 3)
+            restarted.close()
@@ -0,0 +1,88 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from unittest import TestCase
+
+from src.app import create_app
+from src.blockchain import Blockchain
+from src.keypool import KeyPool
+from src.cache import ResponseCache, make_etag
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(max_bytes=10, max_entry_bytes=6)
+
+    def test_make_etag(self):
+        self.assertEqual(make_etag('chain', 'a', 1), make_etag('chain', 'a', 1))
+        self.assertNotEqual(make_etag('chain', 'a', 1),
+            make_etag('chain', 'b', 1))
+
+    def test_put_and_get(self):
+        self.cache.put('a', b'abc', 'application/json', {'X-Length': '1'})
+
+        self.assertEqual(self.cache.get('a'),
+            (b'abc', 'application/json', {'X-Length': '1'}))
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put('a', b'aaaa', 'text/plain')
+        self.cache.put('b', b'bbbb', 'text/plain')
+        self.cache.get('a')
+        self.cache.put('c', b'cccc', 'text/plain')
+
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.size, 8)
+
+    def test_tee_caches_complete_streams(self):
+        chunks = list(self.cache.tee('a', [b'ab', b'cd'], 'text/plain'))
+        self.assertEqual(chunks, [b'ab', b'cd'])
+        self.assertEqual(self.cache.get('a')[0], b'abcd')
+
+        list(self.cache.tee('b', [b'abcd', b'efgh'], 'text/plain'))
+        self.assertIsNone(self.cache.get('b'))
+
+        list(self.cache.tee('c', [b'ab'], 'text/plain', current=lambda: False))
+        self.assertIsNone(self.cache.get('c'))
+
+class ChainRouteTests(TestCase):
+    def test_chain_changed_while_streaming_is_not_cached(self):
+        app = create_app()
+        client = app.test_client()
+        self.addCleanup(app.blockchain.close)
+        self.addCleanup(app.key_pool.close)
+
+        response = client.get('/chain?format=ndjson')
+        etag = response.get_etag()[0]
+        app.blockchain.add_block(proof=1)
+        lines = response.get_data().splitlines()
+
+        self.assertEqual(response.headers['X-Length'], '1')
+        self.assertEqual(len(lines), 1)
+        self.assertIsNone(app.response_cache.get(etag))
+
+        response = client.get('/chain?format=ndjson')
+        self.assertEqual(response.headers['X-Length'], '2')
+        self.assertEqual(len(response.get_data().splitlines()), 2)
+        self.assertIsNotNone(app.response_cache.get(response.get_etag()[0]))
+
+    def test_peers_etag_follows_healthy_peers_only(self):
+        pool = KeyPool(size=1, workers=1)
+        app = create_app(Blockchain(), pool)
+        client = app.test_client()
+        peer_client = app.blockchain.peer_client
+        app.blockchain.peers.update(['a', 'b'])
+        self.addCleanup(pool.close)
+        self.addCleanup(app.blockchain.close)
+
+        peer_client.map(['a', 'b'], lambda peer: peer)
+        etag = client.get('/peers/get').get_etag()[0]
+
+        # A round that only moves latencies keeps the cached response
+        peer_client.map(['a', 'b'], lambda peer: peer)
+        self.assertEqual(client.get('/peers/get').get_etag()[0], etag)
+
+        peer_client.map(['a', 'b'], lambda peer: peer if peer == 'a' else None)
+        response = client.get('/peers/get')
+        self.assertNotEqual(response.get_etag()[0], etag)
+        self.assertFalse(response.get_json()['health']['b']['healthy'])
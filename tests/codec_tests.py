@@ -0,0 +1,105 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+import json
+from unittest import TestCase
+
+from src.block import Block
+from src import codec
+from tests.blockchain_tests import PUBLIC_KEY
+
+class CodecTests(TestCase):
+    def setUp(self):
+        self.block = Block(7, [
+            {'sender': PUBLIC_KEY, 'receiver': 'a1b2', 'amount': 5},
+            {'sender': 'BLOCKCHAIN MINER', 'receiver': 'Bob', 'amount': 1.5},
+            {'sender': 'ABCD', 'receiver': None, 'amount': True},
+            {'sender': [1, 'x'], 'receiver': '', 'amount': 2 ** 70}
+        ], 33575, 'f' * 64, 1700000000.25).seal()
+
+    def test_round_trip_keeps_hash(self):
+        decoded = codec.decode_block(codec.encode_block(self.block)).seal()
+
+        self.assertEqual(decoded.dict, self.block.dict)
+        self.assertEqual(decoded.hash, self.block.hash)
+
+    def test_round_trip_genesis(self):
+        genesis = Block(1, [], 100, 1, 1700000000).seal()
+        decoded = codec.decode_block(codec.encode_block(genesis)).seal()
+
+        self.assertEqual(decoded.hash, genesis.hash)
+        self.assertIs(type(decoded.timestamp), int)
+
+    def test_smaller_than_json(self):
+        block = Block(2, [{'sender': PUBLIC_KEY, 'receiver': PUBLIC_KEY,
+            'amount': 5}] * 10, 33575, 'f' * 64).seal()
+        self.assertLess(len(codec.encode_block(block)) * 1.8,
+            len(json.dumps(block.dict)))
+
+    def test_records(self):
+        blocks = [self.block, Block(1, [], 100, 1).seal()]
+        stream = b''.join(codec.encode_record(block) for block in blocks)
+        chunks = [stream[i:i + 5] for i in range(0, len(stream), 5)]
+
+        decoded = [block.seal().hash for block in codec.iter_records(chunks)]
+        self.assertEqual(decoded, [block.hash for block in blocks])
+
+    def test_truncated_stream(self):
+        stream = codec.encode_record(self.block)
+        with self.assertRaises(ValueError):
+            list(codec.iter_records([stream[:-1]]))
+
+    def test_decodes_version_1(self):
+        parts = [codec.BLOCK_HEAD.pack(1, self.block.index)]
+        for value in (self.block.timestamp, self.block.proof,
+            self.block.prev_hash):
+            parts.append(codec._encode_value(value))
+        parts.append(codec.COUNT.pack(len(self.block.transactions)))
+        for transaction in self.block.transactions:
+            for key in ('sender', 'receiver', 'amount'):
+                parts.append(codec._encode_value(transaction[key]))
+
+        decoded = codec.decode_block(b''.join(parts)).seal()
+        self.assertEqual(decoded.hash, self.block.hash)
+
+    def test_bad_value_id(self):
+        data = bytearray(codec.encode_block(self.block))
+        # The sender id of the last transaction record
+        data[-codec.TRANSACTION.size:-codec.TRANSACTION.size + 4] = \
+            codec.COUNT.pack(1000)
+        with self.assertRaises(ValueError):
+            codec.decode_block(bytes(data))
+
+    def test_negative_value_id(self):
+        data = bytearray(codec.encode_block(self.block))
+        # The amount of the last transaction record points into the table
+        data[-codec.INT.size:] = codec.INT.pack(-1)
+        with self.assertRaises(ValueError):
+            codec.decode_block(bytes(data))
+
+    def test_truncated_block(self):
+        data = codec.encode_block(self.block)
+        for end in range(len(data)):
+            with self.assertRaises(ValueError):
+                codec.decode_block(data[:end])
+
+    def test_truncated_version_1_block(self):
+        parts = [codec.BLOCK_HEAD.pack(1, self.block.index)]
+        for value in (self.block.timestamp, self.block.proof, 'ab'):
+            parts.append(codec._encode_value(value))
+        parts.append(codec.COUNT.pack(1))
+        for value in ('cd', 'Bob', 1.5):
+            parts.append(codec._encode_value(value))
+        data = b''.join(parts)
+
+        self.assertEqual(codec.decode_block(data).transactions,
+            [{'sender': 'cd', 'receiver': 'Bob', 'amount': 1.5}])
+        for end in range(len(data)):
+            with self.assertRaises(ValueError):
+                codec.decode_block(data[:end])
+
+    def test_unknown_version(self):
+        data = bytearray(codec.encode_block(self.block))
+        data[0] = 99
+        with self.assertRaises(ValueError):
+            codec.decode_block(bytes(data))
@@ -0,0 +1,124 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from unittest import TestCase
+
+from src import codec
+from src.block import Block
+from src.compact import CompactChain, BlockView
+
+class CompactChainTest(TestCase):
+    def setUp(self):
+        self.chain = CompactChain()
+
+    def add_blocks(self, count):
+        blocks = []
+        prev_hash = 1
+        for i in range(count):
+            block = Block(i + 1, [
+                {'sender': 'aa', 'receiver': 'bb', 'amount': i},
+                {'sender': '0', 'receiver': 'bb', 'amount': 1}
+            ], i, prev_hash).seal()
+            self.chain.append(block)
+            blocks.append(block)
+            prev_hash = block.hash
+        return blocks
+
+class CompactChainAccessTests(CompactChainTest):
+    def test_empty(self):
+        self.assertEqual(len(self.chain), 0)
+        self.assertFalse(self.chain)
+        with self.assertRaises(IndexError):
+            self.chain[-1]
+
+    def test_views_match_blocks(self):
+        blocks = self.add_blocks(3)
+
+        self.assertEqual(len(self.chain), 3)
+        for view, block in zip(self.chain, blocks):
+            self.assertEqual(view.dict, block.dict)
+            self.assertEqual(view.hash, block.hash)
+            self.assertEqual(view.header, block.header)
+            self.assertEqual(view.serialized, block.serialized)
+            self.assertTrue(view.sealed)
+
+        self.assertIsInstance(self.chain[-1], BlockView)
+        self.assertEqual(self.chain[-1].transactions[1],
+            blocks[-1].transactions[1])
+        self.assertEqual(codec.encode_block(self.chain[1]),
+            codec.encode_block(blocks[1]))
+
+    def test_unpackable_blocks_are_kept_whole(self):
+        blocks = self.add_blocks(2)
+        odd = Block(3, [{'sender': 'aa', 'receiver': 'bb', 'amount': [1]}],
+            7, blocks[-1].hash, 12).seal()
+        self.chain.append(odd)
+
+        self.assertIs(self.chain[0], blocks[0])
+        self.assertIs(self.chain[2], odd)
+        self.assertEqual(self.chain[1].dict, blocks[1].dict)
+
+    def test_truncate(self):
+        blocks = self.add_blocks(4)
+
+        del self.chain[2:]
+        self.assertEqual(len(self.chain), 2)
+        self.assertEqual(self.chain[-1].hash, blocks[1].hash)
+
+        replacement = Block(3, [{'sender': 'cc', 'receiver': 'dd',
+            'amount': 5}], 9, blocks[1].hash).seal()
+        self.chain.append(replacement)
+        self.assertEqual(self.chain[-1].dict, replacement.dict)
+        self.assertEqual(len(self.chain[-1].transactions), 1)
+
+    def test_truncate_frees_unused_transactions(self):
+        self.add_blocks(4)
+        self.assertEqual(self.chain.table_size, 4)
+
+        del self.chain[2:]
+        self.assertEqual(self.chain.table_size, 2)
+        self.assertEqual(self.chain[1].transactions[0]['amount'], 1)
+
+        del self.chain[0:]
+        self.assertEqual(self.chain.table_size, 0)
+        self.add_blocks(2)
+        self.assertEqual(self.chain.table_size, 2)
+        self.assertEqual(self.chain[1].transactions[0]['amount'], 1)
+
+    def test_unpackable_block_leaves_table_alone(self):
+        blocks = self.add_blocks(2)
+        odd = Block(3, [{'sender': 'cc', 'receiver': 'dd', 'amount': 1},
+            {'sender': 'ee', 'receiver': 'ff', 'amount': [1]}],
+            7, blocks[-1].hash, 12).seal()
+        self.chain.append(odd)
+
+        self.assertIs(self.chain[2], odd)
+        self.assertEqual(self.chain.table_size, 2)
+
+    def test_serialized_is_kept_per_position(self):
+        blocks = self.add_blocks(3)
+        view = self.chain[2]
+
+        self.assertEqual(view.serialized, blocks[2].serialized)
+        self.assertIs(self.chain[2].serialized, self.chain[2].serialized)
+
+        del self.chain[2:]
+        replacement = Block(3, [{'sender': 'cc', 'receiver': 'dd',
+            'amount': 5}], 9, blocks[1].hash).seal()
+        self.chain.append(replacement)
+        self.assertEqual(view.serialized, replacement.serialized)
+
+    def test_serialized_cache_is_bounded(self):
+        blocks = self.add_blocks(4)
+        self.chain.serialized_bytes = 2 * len(blocks[1].serialized)
+
+        first = self.chain[1].serialized
+        for view in self.chain[2:]:
+            view.serialized
+        self.assertIsNot(self.chain[1].serialized, first)
+        self.assertEqual(self.chain[1].serialized, blocks[1].serialized)
+
+    def test_views_are_read_only(self):
+        self.add_blocks(2)
+        with self.assertRaises(AttributeError):
+            self.chain[1].proof = 5
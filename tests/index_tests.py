@@ -0,0 +1,95 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from unittest import TestCase
+
+from src.block import Block
+from src.index import BalanceIndex, LookupIndex
+from src.transaction import Transaction
+from src import constant
+
+def transaction(sender, receiver, amount):
+    return {'sender': sender, 'receiver': receiver, 'amount': amount}
+
+class IndexTest(TestCase):
+    def setUp(self):
+        self.reward = Block(2, [
+            transaction(constant.MINER_KEY, 'alice', 5)], 0, 1).seal()
+        self.payment = Block(3, [
+            transaction('alice', 'bob', 2),
+            transaction('bob', 'carol', 1)], 0, 1).seal()
+
+class BalanceIndexTests(IndexTest):
+    def setUp(self):
+        super().setUp()
+        self.index = BalanceIndex()
+
+    def test_apply(self):
+        self.index.apply(self.reward)
+        self.index.apply(self.payment)
+
+        self.assertEqual(self.index.get('alice'), 3)
+        self.assertEqual(self.index.get('bob'), 1)
+        self.assertEqual(self.index.get('carol'), 1)
+        self.assertEqual(self.index.get(constant.MINER_KEY), 0)
+        self.assertEqual(self.index.get('unknown'), 0)
+
+    def test_revert(self):
+        self.index.apply(self.reward)
+        self.index.apply(self.payment)
+        self.index.revert(self.payment)
+
+        self.assertEqual(self.index.get('alice'), 5)
+        self.assertEqual(self.index.get('bob'), 0)
+
+        self.index.revert(self.reward)
+        self.assertEqual(self.index.balances, {})
+
+    def test_non_numeric_amounts_are_ignored(self):
+        block = Block(2, [transaction('alice', 'bob', 'ten')], 0, 1).seal()
+        self.index.apply(block)
+
+        self.assertEqual(self.index.balances, {})
+
+
+class LookupIndexTests(IndexTest):
+    def setUp(self):
+        super().setUp()
+        self.index = LookupIndex()
+        self.index.apply(self.reward)
+        self.index.apply(self.payment)
+
+    def test_block_index(self):
+        self.assertEqual(self.index.block_index(self.payment.hash), 3)
+        self.assertIsNone(self.index.block_index('unknown'))
+
+    def test_transaction_locations(self):
+        payment = Transaction('alice', 'bob', 2)
+        self.assertEqual(self.index.transaction_locations(payment.id),
+            [(3, 0)])
+        self.assertEqual(self.index.transaction_locations('unknown'), [])
+
+    def test_repeated_transaction_keeps_every_location(self):
+        reward = Block(4, [
+            transaction(constant.MINER_KEY, 'alice', 5)], 0, 1).seal()
+        self.index.apply(reward)
+
+        reward_id = Transaction(constant.MINER_KEY, 'alice', 5).id
+        self.assertEqual(self.index.transaction_locations(reward_id),
+            [(2, 0), (4, 0)])
+
+    def test_address_locations(self):
+        self.assertEqual(self.index.address_locations('bob'),
+            ([(3, 0), (3, 1)], 2))
+        self.assertEqual(self.index.address_locations('alice', 1, 1),
+            ([(3, 0)], 2))
+        self.assertEqual(self.index.address_locations('unknown'), ([], 0))
+
+    def test_revert(self):
+        self.index.revert(self.payment)
+
+        self.assertIsNone(self.index.block_index(self.payment.hash))
+        self.assertEqual(self.index.address_locations('alice'),
+            ([(2, 0)], 1))
+        self.assertNotIn('bob', self.index.addresses)
+        self.assertEqual(len(self.index.transactions), 1)
\ No newline at end of file
@@ -0,0 +1,176 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from threading import Event
+from unittest import TestCase
+
+from src.app import create_app
+from src.blockchain import Blockchain
+from src.jobs import (MiningJobs, JOB_RUNNING, JOB_MINED, JOB_CANCELLED)
+from src.miner import Miner
+from src.transaction import Transaction
+from src import constant
+
+class Generation(object):
+    value = 0
+
+class FakeMiner(object):
+    """
+    Holds every search until it is released, then searches for real.
+    """
+    def __init__(self):
+        self.generation = Generation()
+        self.searching = Event()
+        self.released = Event()
+        self.miner = Miner(workers=1)
+
+    def search(self, prev, generation = None):
+        self.searching.set()
+        while not self.released.wait(0.01):
+            if self.generation.value != generation:
+                self.searching.clear()
+                return None
+        return self.miner.search(prev)
+
+    def cancel(self):
+        self.generation.value += 1
+
+    def close(self):
+        self.miner.close()
+
+class MiningJobsTests(TestCase):
+    def setUp(self):
+        self.blockchain = Blockchain()
+        self.blockchain.miner = FakeMiner()
+        self.addCleanup(self.blockchain.close)
+        self.jobs = MiningJobs(self.blockchain, 'node')
+
+    def wait_searching(self):
+        self.assertTrue(self.blockchain.miner.searching.wait(5))
+
+    def test_mines_block(self):
+        job, started = self.jobs.start()
+        self.blockchain.miner.released.set()
+
+        self.assertTrue(started)
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.status, JOB_MINED)
+        self.assertEqual(len(self.blockchain.chain), 2)
+        self.assertEqual(job.block['index'], 2)
+        self.assertEqual(job.block['transactions'][0]['sender'],
+            constant.MINER_KEY)
+        self.assertEqual(job.block['transactions'][0]['receiver'], 'node')
+        self.assertIsNone(self.jobs.current)
+        self.assertEqual(self.jobs.get(job.id), job)
+
+    def test_joins_running_job(self):
+        job, _ = self.jobs.start()
+        joined, started = self.jobs.start()
+        self.blockchain.miner.released.set()
+        job.wait(5)
+
+        self.assertFalse(started)
+        self.assertIs(joined, job)
+        self.assertEqual(len(self.blockchain.chain), 2)
+
+    def test_finished_job_is_no_longer_current(self):
+        job, _ = self.jobs.start()
+        current = []
+        finish = job.finish
+        def record(*args, **kwargs):
+            current.append(self.jobs.current)
+            finish(*args, **kwargs)
+        job.finish = record
+
+        self.blockchain.miner.released.set()
+        self.assertTrue(job.wait(5))
+        self.assertEqual(current, [None])
+
+        second, started = self.jobs.start()
+        self.assertTrue(started)
+        self.assertIsNot(second, job)
+        second.wait(5)
+
+    def test_snapshots_transactions(self):
+        first = Transaction('a', 'b', 5).dict
+        second = Transaction('a', 'b', 6).dict
+        self.blockchain.mempool.add(first)
+
+        job, _ = self.jobs.start()
+        self.wait_searching()
+        self.blockchain.mempool.add(second)
+        self.blockchain.miner.released.set()
+        job.wait(5)
+
+        self.assertEqual(job.block['transactions'][1:], [first])
+        self.assertEqual(self.blockchain.current_transactions, [second])
+
+    def test_retargets_on_new_tip(self):
+        job, _ = self.jobs.start()
+        self.wait_searching()
+        self.assertEqual(job.target, self.blockchain.last_block.hash)
+
+        with self.blockchain.lock:
+            self.blockchain.miner.searching.clear()
+            self.blockchain.add_block(proof=1)
+            self.blockchain.miner.cancel()
+        tip = self.blockchain.last_block.hash
+        self.wait_searching()
+        self.blockchain.miner.released.set()
+        job.wait(5)
+
+        self.assertEqual(job.status, JOB_MINED)
+        self.assertEqual(job.retargets, 1)
+        self.assertEqual(job.block['index'], 3)
+        self.assertEqual(job.block['prev_hash'], tip)
+
+    def test_cancel(self):
+        job, _ = self.jobs.start()
+        self.wait_searching()
+
+        self.assertIs(self.jobs.cancel(job.id), job)
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.status, JOB_CANCELLED)
+        self.assertEqual(len(self.blockchain.chain), 1)
+        self.assertIsNone(self.jobs.cancel('unknown'))
+
+class MiningRouteTests(TestCase):
+    def setUp(self):
+        blockchain = Blockchain()
+        blockchain.miner = FakeMiner()
+        self.app = create_app(blockchain)
+        self.client = self.app.test_client()
+        self.addCleanup(blockchain.close)
+        self.addCleanup(self.app.key_pool.close)
+
+    def test_mine_returns_job(self):
+        response = self.client.get('/mine')
+        job = response.get_json()['job']
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(job['status'], JOB_RUNNING)
+        self.assertEqual(response.headers['Location'], f"/mine/jobs/{job['id']}")
+        self.assertEqual(self.client.get('/mine').get_json()['job']['id'],
+            job['id'])
+
+        self.app.blockchain.miner.released.set()
+        response = self.client.get('/mine?wait=5')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['index'], 2)
+
+        status = self.client.get(f"/mine/jobs/{job['id']}").get_json()
+        self.assertEqual(status['status'], JOB_MINED)
+        self.assertEqual(self.client.get('/mine/jobs/unknown').status_code, 404)
+
+    def test_cancel_job(self):
+        job = self.client.get('/mine').get_json()['job']
+        self.app.blockchain.miner.searching.wait(5)
+
+        response = self.client.post(f"/mine/jobs/{job['id']}/cancel")
+        self.assertIn(response.status_code, (200, 202))
+        self.app.mining.get(job['id']).wait(5)
+
+        status = self.client.get(f"/mine/jobs/{job['id']}").get_json()
+        self.assertEqual(status['status'], JOB_CANCELLED)
+        self.assertEqual(
+            self.client.post('/mine/jobs/unknown/cancel').status_code, 404)
@@ -0,0 +1,73 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from time import monotonic, sleep
+from unittest import TestCase
+
+from src.app import create_app
+from src.blockchain import Blockchain
+from src.keypool import KeyPool
+
+class KeyPoolTests(TestCase):
+    def setUp(self):
+        self.pool = KeyPool(size=3, workers=1)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def wait_full(self):
+        deadline = monotonic() + 30
+        while len(self.pool) < self.pool.size and monotonic() < deadline:
+            sleep(0.05)
+
+    def test_fill_and_take(self):
+        self.pool.fill()
+        self.wait_full()
+        self.assertEqual(len(self.pool), 3)
+
+        keys = self.pool.take(2)
+        self.assertEqual(len(keys), 2)
+        self.assertTrue(all(key.has_private() for key in keys))
+        self.assertNotEqual(keys[0].n, keys[1].n)
+
+        self.wait_full()
+        self.assertEqual(len(self.pool), 3)
+
+    def test_take_from_short_pool_takes_nothing(self):
+        self.assertIsNone(self.pool.take(4))
+
+        self.wait_full()
+        self.assertIsNone(self.pool.take(4))
+        self.assertEqual(len(self.pool), 3)
+        self.assertEqual(len(self.pool.take(3)), 3)
+
+class KeyPoolRouteTests(TestCase):
+    def setUp(self):
+        self.pool = KeyPool(size=2, workers=1)
+        self.app = create_app(Blockchain(), self.pool)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.pool.close()
+        self.app.blockchain.close()
+
+    def test_create_app_fills_pool(self):
+        deadline = monotonic() + 30
+        while len(self.pool) < 2 and monotonic() < deadline:
+            sleep(0.05)
+
+        response = self.client.post('/wallet/batch', json={'count': 2})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.get_json()['wallets']), 2)
+
+    def test_bulk_request_is_capped_at_pool_size(self):
+        response = self.client.post('/wallet/batch', json={'count': 3})
+        self.assertEqual(response.status_code, 413)
+
+    def test_dry_pool_asks_to_retry(self):
+        self.pool.take = lambda count = 1: None
+
+        for response in (self.client.get('/wallet/new'),
+            self.client.post('/wallet/batch', json={'count': 2})):
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '1')
@@ -0,0 +1,103 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+import json
+from threading import Thread
+from unittest import TestCase
+
+from src.block import Block
+from src.mempool import Mempool
+from src.transaction import Transaction
+from src import constant
+
+def transaction(sender, receiver, amount):
+    return {'sender': sender, 'receiver': receiver, 'amount': amount}
+
+class MempoolTests(TestCase):
+    def setUp(self):
+        self.mempool = Mempool()
+
+    def test_add_rejects_duplicates(self):
+        self.assertTrue(self.mempool.add(transaction('a', 'b', 1)))
+        self.assertFalse(self.mempool.add(transaction('a', 'b', 1)))
+        self.assertEqual(len(self.mempool), 1)
+        self.assertIn(Transaction('a', 'b', 1).id, self.mempool)
+
+    def test_count_cap_evicts_lowest_priority(self):
+        mempool = Mempool(max_count=2)
+        mempool.add(transaction('a', 'b', 5))
+        mempool.add(transaction('c', 'b', 1))
+
+        self.assertTrue(mempool.add(transaction('d', 'b', 3)))
+        self.assertEqual(mempool.page(), [transaction('a', 'b', 5),
+            transaction('d', 'b', 3)])
+
+        self.assertFalse(mempool.add(transaction('e', 'b', 2)))
+        self.assertEqual(len(mempool), 2)
+
+    def test_size_cap(self):
+        size = len(json.dumps(transaction('a', 'b', 1)))
+        mempool = Mempool(max_bytes=2 * size)
+        for amount in range(1, 5):
+            mempool.add(transaction('a', 'b', amount))
+
+        self.assertEqual(len(mempool), 2)
+        self.assertLessEqual(mempool.size, 2 * size)
+        self.assertEqual(mempool.page(), [transaction('a', 'b', 3),
+            transaction('a', 'b', 4)])
+
+    def test_select_orders_by_priority_within_sender_order(self):
+        self.mempool.add(transaction('a', 'x', 1))
+        self.mempool.add(transaction('a', 'x', 9))
+        self.mempool.add(transaction('b', 'x', 5))
+        self.mempool.add(transaction(constant.MINER_KEY, 'x', 1))
+
+        self.assertEqual(self.mempool.select(), [
+            transaction(constant.MINER_KEY, 'x', 1),
+            transaction('b', 'x', 5),
+            transaction('a', 'x', 1),
+            transaction('a', 'x', 9)])
+        self.assertEqual(len(self.mempool.select(2)), 2)
+
+    def test_page(self):
+        for amount in range(5):
+            self.mempool.add(transaction('a', 'b', amount))
+
+        self.assertEqual(self.mempool.page(1, 2), [transaction('a', 'b', 1),
+            transaction('a', 'b', 2)])
+        self.assertEqual(self.mempool.page(5), [])
+
+    def test_apply_and_revert(self):
+        payment = transaction('a', 'b', 1)
+        reward = transaction(constant.MINER_KEY, 'b', 1)
+        self.mempool.add(payment)
+        self.mempool.add(reward)
+        block = Block(2, [reward, payment], 0, 1).seal()
+
+        self.mempool.apply(block)
+        self.assertEqual(len(self.mempool), 0)
+        self.assertEqual(self.mempool.size, 0)
+
+        self.mempool.revert(block)
+        self.assertEqual(self.mempool.page(), [payment])
+
+    def test_concurrent_add_and_select(self):
+        errors = []
+
+        def add():
+            try:
+                for amount in range(1, 5001):
+                    self.mempool.add(transaction(f's{amount % 50}', 'r',
+                        amount))
+            except Exception as e:
+                errors.append(e)
+
+        thread = Thread(target=add)
+        thread.start()
+        while thread.is_alive():
+            self.mempool.select(100)
+            self.mempool.page()
+        thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.mempool), 5000)
@@ -0,0 +1,40 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+import hashlib
+from unittest import TestCase
+
+from src.merkle import merkle_root, merkle_proof, verify_proof, EMPTY_ROOT
+
+def leaf(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+class MerkleTests(TestCase):
+    def test_empty_and_single(self):
+        self.assertEqual(merkle_root([]), EMPTY_ROOT)
+        self.assertEqual(merkle_root([leaf(0)]), leaf(0))
+        self.assertEqual(merkle_proof([leaf(0)], 0), [])
+
+    def test_root_depends_on_order(self):
+        leaves = [leaf(i) for i in range(4)]
+        self.assertNotEqual(merkle_root(leaves),
+            merkle_root(list(reversed(leaves))))
+
+    def test_proofs_verify_for_every_leaf(self):
+        for count in (2, 3, 5, 8, 13):
+            leaves = [leaf(i) for i in range(count)]
+            root = merkle_root(leaves)
+            for position in range(count):
+                proof = merkle_proof(leaves, position)
+                self.assertTrue(verify_proof(leaves[position], proof, root))
+
+    def test_bad_proofs_fail(self):
+        leaves = [leaf(i) for i in range(5)]
+        root = merkle_root(leaves)
+        proof = merkle_proof(leaves, 2)
+
+        self.assertFalse(verify_proof(leaf(9), proof, root))
+        self.assertFalse(verify_proof(leaves[2], proof[1:], root))
+        self.assertFalse(verify_proof(leaves[2], [{'hash': 'zz'}], root))
+        with self.assertRaises(IndexError):
+            merkle_proof(leaves, 5)
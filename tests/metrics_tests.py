@@ -0,0 +1,53 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from unittest import TestCase
+
+from src.metrics import Counter, Gauge, Histogram, Registry
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter(self):
+        counter = self.registry.register(Counter('hashes_total', 'Hashes'))
+        counter.inc()
+        counter.inc(4)
+        counter.inc(2, peer='a')
+
+        self.assertEqual(counter.get(), 5)
+        self.assertEqual(counter.get(peer='a'), 2)
+        self.assertIs(self.registry.register(Counter('hashes_total', 'x')),
+            counter)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('seconds', 'Latency', buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 2):
+            histogram.observe(value, route='/chain')
+
+        samples = {(name, labels): value
+            for name, labels, value in histogram.samples()}
+        route = (('route', '/chain'),)
+        self.assertEqual(samples[('seconds_bucket', route + (('le', '0.1'),))],
+            1)
+        self.assertEqual(samples[('seconds_bucket', route + (('le', '1'),))],
+            3)
+        self.assertEqual(samples[('seconds_bucket',
+            route + (('le', '+Inf'),))], 4)
+        self.assertEqual(samples[('seconds_sum', route)], 3.05)
+        self.assertEqual(histogram.count(route='/chain'), 4)
+
+    def test_time(self):
+        histogram = Histogram('seconds', 'Latency')
+        with histogram.time(outcome='found'):
+            pass
+        self.assertEqual(histogram.count(outcome='found'), 1)
+
+    def test_render(self):
+        self.registry.register(Gauge('mempool', 'Pending', lambda: 3))
+        counter = self.registry.register(Counter('requests_total', 'Calls'))
+        counter.inc(route='/a"b')
+
+        text = self.registry.render()
+        self.assertIn('# TYPE mempool gauge\nmempool 3\n', text)
+        self.assertIn('requests_total{route="/a\\"b"} 1\n', text)
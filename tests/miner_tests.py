@@ -0,0 +1,38 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+import hashlib
+from threading import Timer
+from unittest import TestCase
+
+from src.miner import Miner, is_valid_proof, search_range
+
+class MinerTests(TestCase):
+    def setUp(self):
+        self.miner = Miner(workers=2, chunk_size=5000)
+
+    def tearDown(self):
+        self.miner.close()
+
+    def test_is_valid_proof_matches_hex_check(self):
+        for nonce in range(70000):
+            guess = hashlib.sha256(f'100{nonce}'.encode()).hexdigest()
+            self.assertEqual(is_valid_proof(100, nonce),
+                guess[-4:] == '0000')
+
+    def test_search_range_finds_lowest_proof(self):
+        self.assertEqual(search_range(100, 0, 40000, 0), 33575)
+        self.assertIsNone(search_range(100, 0, 30000, 0))
+
+    def test_parallel_search_matches_serial(self):
+        serial = Miner(workers=1, chunk_size=5000)
+        for prev in (100, 33575, 7):
+            proof = self.miner.search(prev)
+            self.assertEqual(proof, serial.search(prev))
+            self.assertTrue(is_valid_proof(prev, proof))
+
+    def test_cancel_stops_search(self):
+        # The proof for 20 is 307181, so the search is still running when
+        # the cancel arrives.
+        Timer(0.01, self.miner.cancel).start()
+        self.assertIsNone(self.miner.search(20))
@@ -0,0 +1,80 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from time import monotonic, sleep
+from unittest import TestCase
+
+from src.peer import PeerClient
+
+class PeerClientTests(TestCase):
+    def setUp(self):
+        self.client = PeerClient(workers=4)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_map_runs_peers_concurrently(self):
+        def fetch(peer):
+            sleep(0.2)
+            return peer.upper()
+
+        start = monotonic()
+        results = self.client.map(['a', 'b', 'c', 'd'], fetch)
+
+        self.assertLess(monotonic() - start, 0.6)
+        self.assertEqual(results, {'a': 'A', 'b': 'B', 'c': 'C', 'd': 'D'})
+        self.assertGreaterEqual(self.client.report(['a'])['a']['latency'],
+            0.2)
+
+    def test_failed_peers_are_backed_off(self):
+        calls = []
+        def fetch(peer):
+            calls.append(peer)
+            if peer == 'bad':
+                raise ConnectionError(peer)
+            return None if peer == 'empty' else peer
+
+        results = self.client.map(['good', 'bad', 'empty'], fetch)
+        self.assertEqual(results, {'good': 'good'})
+
+        report = self.client.report(['good', 'bad', 'empty'])
+        self.assertTrue(report['good']['healthy'])
+        self.assertFalse(report['bad']['healthy'])
+        self.assertEqual(report['bad']['failures'], 1)
+        self.assertFalse(report['empty']['healthy'])
+        self.assertEqual(self.client.healthy_peers(), ('good',))
+
+        calls.clear()
+        self.client.map(['good', 'bad', 'empty'], fetch)
+        self.assertEqual(calls, ['good'])
+
+    def test_deadline_bounds_round(self):
+        def fetch(peer):
+            sleep(0.5 if peer == 'slow' else 0)
+            return peer
+
+        start = monotonic()
+        results = self.client.map(['slow', 'fast'], fetch, deadline=0.1)
+
+        self.assertLess(monotonic() - start, 0.4)
+        self.assertEqual(results, {'fast': 'fast'})
+        self.assertFalse(self.client.report(['slow'])['slow']['healthy'])
+
+    def test_broadcast_does_not_wait(self):
+        sent = []
+        def send(peer):
+            sleep(0.2)
+            sent.append(peer)
+            if peer == 'bad':
+                raise ConnectionError(peer)
+            return True
+
+        start = monotonic()
+        self.client.broadcast(['good', 'bad'], send)
+        self.assertLess(monotonic() - start, 0.1)
+
+        sleep(0.4)
+        self.assertEqual(sorted(sent), ['bad', 'good'])
+        report = self.client.report(['good', 'bad'])
+        self.assertTrue(report['good']['healthy'])
+        self.assertFalse(report['bad']['healthy'])
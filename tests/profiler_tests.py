@@ -0,0 +1,34 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from threading import Event, Thread
+from time import sleep
+from unittest import TestCase
+
+from src.profiler import SamplingProfiler
+
+def spin(stop):
+    while not stop.is_set():
+        pass
+
+class SamplingProfilerTests(TestCase):
+    def test_samples_running_threads(self):
+        profiler = SamplingProfiler(interval=0.005)
+        stop = Event()
+        worker = Thread(target=spin, args=(stop,))
+        worker.start()
+        try:
+            profiler.start()
+            self.assertTrue(profiler.running)
+            sleep(0.1)
+            profiler.stop()
+        finally:
+            stop.set()
+            worker.join()
+
+        self.assertFalse(profiler.running)
+        self.assertGreater(profiler.samples, 0)
+        self.assertIn('profiler_tests:spin ', profiler.render())
+
+        profiler.clear()
+        self.assertEqual(profiler.render(), '')
@@ -0,0 +1,121 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from zlib import crc32
+
+from src.block import Block
+from src.store import ChainStore, RECORD_HEADER, INDEX_ENTRY
+
+class ChainStoreTest(TestCase):
+    def setUp(self):
+        self.dir = TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'chain')
+        self.store = ChainStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def add_blocks(self, count):
+        blocks = []
+        prev_hash = 1
+        for i in range(count):
+            block = Block(i + 1, [{'sender': 'a', 'receiver': 'b',
+                'amount': i}], i, prev_hash).seal()
+            self.store.append(block)
+            blocks.append(block)
+            prev_hash = block.hash
+        return blocks
+
+    def reopen(self):
+        self.store.close()
+        self.store = ChainStore(self.path)
+
+class ChainStoreAccessTests(ChainStoreTest):
+    def test_empty(self):
+        self.assertEqual(len(self.store), 0)
+        with self.assertRaises(IndexError):
+            self.store[-1]
+
+    def test_append_and_read(self):
+        blocks = self.add_blocks(3)
+
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual([b.hash for b in self.store],
+            [b.hash for b in blocks])
+        self.assertEqual(self.store[0].dict, blocks[0].dict)
+        self.assertEqual(self.store[-1].hash, blocks[-1].hash)
+        self.assertTrue(self.store[1].sealed)
+
+    def test_reads_json_records(self):
+        block = Block(1, [], 100, 1).seal()
+        payload = block.serialized
+        self.store.close()
+        with open(self.path, 'ab') as log:
+            log.write(RECORD_HEADER.pack(len(payload), crc32(payload)))
+            log.write(payload)
+        with open(self.path + '.idx', 'ab') as index:
+            index.write(INDEX_ENTRY.pack(0))
+
+        self.store = ChainStore(self.path)
+        self.assertEqual(self.store[0].hash, block.hash)
+
+    def test_truncate(self):
+        blocks = self.add_blocks(4)
+
+        del self.store[2:]
+
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store[-1].hash, blocks[1].hash)
+
+        self.reopen()
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store[-1].hash, blocks[1].hash)
+
+class ChainStoreRecoveryTests(ChainStoreTest):
+    def test_reopen_keeps_blocks(self):
+        blocks = self.add_blocks(3)
+        self.reopen()
+
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual(self.store[-1].hash, blocks[-1].hash)
+        self.assertEqual(self.store[0].hash, blocks[0].hash)
+
+    def test_partial_record_is_truncated(self):
+        blocks = self.add_blocks(2)
+        size = os.path.getsize(self.path)
+        self.store.close()
+
+        with open(self.path, 'ab') as log:
+            log.write(RECORD_HEADER.pack(500, 0) + b'{"index": 3')
+        self.store = ChainStore(self.path)
+
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store[-1].hash, blocks[-1].hash)
+        self.assertEqual(os.path.getsize(self.path), size)
+
+    def test_torn_record_with_index_entry_is_dropped(self):
+        blocks = self.add_blocks(3)
+        self.store.close()
+
+        with open(self.path, 'r+b') as log:
+            log.truncate(os.path.getsize(self.path) - 5)
+        self.store = ChainStore(self.path)
+
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store[-1].hash, blocks[1].hash)
+        self.assertEqual(os.path.getsize(self.path + '.idx'), 2 * 8)
+
+    def test_unindexed_record_is_recovered(self):
+        blocks = self.add_blocks(3)
+        self.store.close()
+
+        with open(self.path + '.idx', 'r+b') as index:
+            index.truncate(8)
+        self.store = ChainStore(self.path)
+
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual(self.store[-1].hash, blocks[-1].hash)
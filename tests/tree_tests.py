@@ -0,0 +1,51 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from unittest import TestCase
+
+from src.block import Block
+from src.tree import BlockTree
+
+def build_branch(prev_hash, start, count, proof = 0):
+    blocks = []
+    for index in range(start, start + count):
+        blocks.append(Block(index, [], proof, prev_hash).seal())
+        prev_hash = blocks[-1].hash
+    return blocks
+
+class BlockTreeTests(TestCase):
+    def setUp(self):
+        self.tree = BlockTree(depth=3)
+
+    def test_branch_stops_at_chain(self):
+        blocks = build_branch('chain', 5, 3)
+        for block in blocks:
+            self.tree.add(block)
+
+        self.assertEqual([b.hash for b in self.tree.branch(blocks[-1])],
+            [b.hash for b in blocks])
+        self.assertEqual(self.tree.branch(blocks[0]), [blocks[0]])
+
+    def test_remove_and_prune(self):
+        blocks = build_branch('chain', 5, 3)
+        for block in blocks:
+            self.tree.add(block)
+
+        self.tree.remove(blocks[2].hash)
+        self.assertNotIn(blocks[2].hash, self.tree)
+
+        self.tree.prune(7)
+        self.assertEqual(len(self.tree), 2)
+        self.tree.prune(8)
+        self.assertEqual(len(self.tree), 0)
+
+    def test_prune_drops_whole_branches(self):
+        # A long branch forking low and a short one forking high
+        low = build_branch('chain', 3, 6)
+        high = build_branch('chain', 7, 1, proof=1)
+        for block in low + high:
+            self.tree.add(block)
+
+        self.tree.prune(6)
+        self.assertEqual(len(self.tree), 1)
+        self.assertIn(high[0].hash, self.tree)
@@ -0,0 +1,76 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from unittest import TestCase
+
+from src.block import Block
+from src.miner import search_range
+from src.validator import ChainValidator
+
+def build_headers(count):
+    blocks = [Block(1, [], 100, 1).seal()]
+    for index in range(2, count + 1):
+        prev = blocks[-1]
+        proof = search_range(prev.proof, 0, 10 ** 7, 0)
+        blocks.append(Block(index, [], proof, prev.hash).seal())
+    return [block.header for block in blocks]
+
+HEADERS = build_headers(12)
+
+class ChainValidatorTests(TestCase):
+    def setUp(self):
+        self.validator = ChainValidator(workers=2, chunk_size=4)
+
+    def tearDown(self):
+        self.validator.close()
+
+    def test_valid_chain(self):
+        self.assertTrue(self.validator.validate(HEADERS))
+        self.assertTrue(self.validator.validate(HEADERS[:3]))
+        self.assertTrue(self.validator.validate([]))
+
+    def test_broken_link_in_any_chunk(self):
+        for position in (1, 4, 5, 11):
+            headers = [dict(h) for h in HEADERS]
+            headers[position]['prev_hash'] = 'forged'
+            self.assertFalse(ChainValidator(workers=2,
+                chunk_size=4).validate(headers))
+
+    def test_bad_proof(self):
+        headers = [dict(h) for h in HEADERS]
+        headers[6]['proof'] += 1
+        self.assertFalse(self.validator.validate(headers))
+
+    def test_header_not_matching_hash(self):
+        headers = [dict(h) for h in HEADERS]
+        headers[3]['merkle_root'] = headers[2]['merkle_root'][::-1]
+        self.assertFalse(self.validator.validate(headers))
+
+    def test_index_gap(self):
+        self.assertFalse(self.validator.validate(HEADERS[:3] + HEADERS[4:]))
+
+    def test_checkpoints_skip_validated_prefix(self):
+        self.assertTrue(self.validator.validate(HEADERS[:9]))
+        self.assertFalse(self.validator.is_checkpoint(HEADERS[8]['hash']))
+        self.validator.remember(HEADERS[:9])
+        self.assertTrue(self.validator.is_checkpoint(HEADERS[8]['hash']))
+        self.assertTrue(self.validator.is_checkpoint(HEADERS[4]['hash']))
+
+        headers = [dict(h) for h in HEADERS]
+        self.assertTrue(self.validator.validate(headers))
+        headers[10]['proof'] = -1
+        self.assertFalse(self.validator.validate(headers))
+
+    def test_checkpoint_does_not_cover_forged_prefix(self):
+        self.validator.remember(HEADERS[:9])
+
+        # Unmined headers leading up to a real checkpoint are still rejected
+        forged = [Block(1, [], 100, 1).seal()]
+        for index in range(2, 9):
+            forged.append(Block(index, [], 0, forged[-1].hash).seal())
+        self.assertFalse(self.validator.validate(
+            [block.header for block in forged] + HEADERS[8:]))
+
+        headers = [dict(h) for h in HEADERS]
+        headers[2]['proof'] = -1
+        self.assertFalse(self.validator.validate(headers))
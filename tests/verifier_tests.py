@@ -0,0 +1,35 @@
+import sys
+sys.path.append(sys.path[0] + '/src')
+
+from unittest import TestCase
+
+from src.verifier import Verifier
+from tests.blockchain_tests import PUBLIC_KEY, PRIVATE_KEY
+
+class VerifierTests(TestCase):
+    def setUp(self):
+        self.verifier = Verifier(workers=2, chunk_size=2)
+        self.transaction = {
+            'sender': PUBLIC_KEY,
+            'receiver': 'receiver',
+            'amount': 5
+        }
+
+    def tearDown(self):
+        self.verifier.close()
+
+    def test_verify(self):
+        self.assertTrue(self.verifier.verify(self.transaction, PRIVATE_KEY))
+        self.assertFalse(self.verifier.verify(self.transaction, PUBLIC_KEY))
+
+    def test_verify_many_keeps_order(self):
+        items = [
+            (self.transaction, PRIVATE_KEY),
+            (self.transaction, PUBLIC_KEY),
+            (self.transaction, 'not hex'),
+            (self.transaction, PRIVATE_KEY),
+            (dict(self.transaction, sender='not a key'), PRIVATE_KEY)
+        ]
+        self.assertEqual(self.verifier.verify_many(items),
+            [True, False, False, True, False])
+        self.assertEqual(self.verifier.verify_many([]), [])
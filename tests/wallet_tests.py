@@ -14,6 +14,12 @@ class WalletTests(TestCase):
         self.assertEqual(len(str(self.acct.pri_key)), 48)
         self.assertEqual(len(str(self.acct.pub_key)), 32)
 
+    def test_init_with_key(self):
+        wallet = Wallet(2, self.acct.pri_key)
+
+        self.assertIs(wallet.pri_key, self.acct.pri_key)
+        self.assertEqual(wallet.pub_key, self.acct.pub_key)
+
     def test_dict(self):
         wallet_dict = {
             'id': 1,